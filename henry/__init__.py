@@ -3,7 +3,8 @@ Henry is the high-level client for hippo. Lower-level functions are available
 in `hippoclient`.
 """
 
+from .aio import AsyncHenry
 from .core import Henry
 from .source import LocalSource
 
-__all__ = ["Henry", "LocalSource"]
+__all__ = ["AsyncHenry", "Henry", "LocalSource"]
@@ -0,0 +1,91 @@
+"""
+The async counterpart to ``Henry``, built on ``hippoclient.aio``.
+"""
+
+import httpx
+from rich.console import Console
+
+from hippoclient.aio import AsyncMultiCache
+from hippoclient.core import ClientSettings
+from hippoclient.hashing import Hasher
+from hippoclient.uploading import Uploader
+
+from .collection import LocalCollection
+from .core import Henry
+from .product import LocalProduct, RemoteProduct
+
+
+class AsyncHenry:
+    """
+    Like ``Henry``, but ``push`` and ``pull_product`` are coroutines, and all
+    requests share a single pooled ``httpx.AsyncClient``. Products and child
+    collections within a collection are pushed concurrently.
+
+    Use it as an async context manager so that its connections are closed:
+
+    .. code-block::python
+
+        async with AsyncHenry() as henry:
+            products = await asyncio.gather(
+                *(henry.pull_product(id) for id in product_ids)
+            )
+    """
+
+    settings: ClientSettings
+    client: httpx.AsyncClient
+    console: Console
+    cache: AsyncMultiCache
+    uploader: Uploader
+    hasher: Hasher
+
+    def __init__(
+        self,
+        *,
+        settings: ClientSettings | None = None,
+        console: Console | None = None,
+    ):
+        self.settings = settings or ClientSettings()
+        self.console = console or Console(quiet=(not self.settings.verbose))
+        self.client = self.settings.async_client
+        self.cache = self.settings.async_cache
+        self.uploader = self.settings.uploader
+        self.hasher = self.settings.hasher
+        self.readers = self.settings.default_readers
+        self.writers = self.settings.default_writers
+
+    new_product = Henry.new_product
+    new_collection = Henry.new_collection
+
+    async def push(
+        self, item: LocalProduct | LocalCollection, skip_preflight: bool = False
+    ) -> str:
+        return await item._aupload(
+            client=self.client,
+            console=self.console,
+            skip_preflight=skip_preflight,
+            readers=self.readers,
+            writers=self.writers,
+            uploader=self.uploader,
+            hasher=self.hasher,
+        )
+
+    async def pull_product(
+        self, product_id: str, realize_sources: bool = True
+    ) -> RemoteProduct:
+        return await RemoteProduct.apull(
+            product_id=product_id,
+            client=self.client,
+            cache=self.cache,
+            console=self.console,
+            realize_sources=realize_sources,
+        )
+
+    async def aclose(self):
+        await self.client.aclose()
+        self.cache.close()
+
+    async def __aenter__(self) -> "AsyncHenry":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
@@ -1,3 +1,4 @@
+import asyncio
 from itertools import chain
 from typing import Iterable
 
@@ -7,6 +8,10 @@ from rich.console import Console
 
 from henry.product import ProductInstance
 from hippoclient import collections, relationships
+from hippoclient.aio import collections as aio_collections
+from hippoclient.aio import relationships as aio_relationships
+from hippoclient.hashing import Hasher
+from hippoclient.uploading import Uploader
 
 from .exceptions import PreflightFailedError
 
@@ -146,6 +151,8 @@ class LocalCollection(CollectionInstance):
         skip_preflight: bool = False,
         readers: list[str] | None = None,
         writers: list[str] | None = None,
+        uploader: Uploader | None = None,
+        hasher: Hasher | None = None,
     ):
         if self.collection_id:
             # We've already been uploaded!
@@ -171,6 +178,8 @@ class LocalCollection(CollectionInstance):
                 readers=readers,
                 writers=writers,
                 skip_preflight=True,
+                uploader=uploader,
+                hasher=hasher,
             )
             for x in self.products
         ]
@@ -191,6 +200,8 @@ class LocalCollection(CollectionInstance):
                 skip_preflight=True,
                 readers=readers,
                 writers=writers,
+                uploader=uploader,
+                hasher=hasher,
             )
             for x in self.collections
         ]
@@ -204,3 +215,86 @@ class LocalCollection(CollectionInstance):
             )
 
         return self.collection_id
+
+    async def _aupload(
+        self,
+        client: httpx.AsyncClient,
+        console: Console,
+        skip_preflight: bool = False,
+        readers: list[str] | None = None,
+        writers: list[str] | None = None,
+        uploader: Uploader | None = None,
+        hasher: Hasher | None = None,
+    ):
+        if self.collection_id:
+            # We've already been uploaded!
+            return self.collection_id
+
+        if not skip_preflight:
+            # This runs _all_ preflight checks - for all connected collecitons and products.
+            self.preflight()
+
+        self.collection_id = await aio_collections.create(
+            client=client,
+            name=self.name,
+            description=self.description,
+            readers=readers,
+            writers=writers,
+            console=console,
+        )
+
+        # Products and child collections are independent of one another, so
+        # they are all pushed at once.
+        product_ids_to_connect, child_collection_ids_to_connect = await asyncio.gather(
+            asyncio.gather(
+                *(
+                    x._aupload(
+                        client=client,
+                        console=console,
+                        readers=readers,
+                        writers=writers,
+                        skip_preflight=True,
+                        uploader=uploader,
+                        hasher=hasher,
+                    )
+                    for x in self.products
+                )
+            ),
+            asyncio.gather(
+                *(
+                    x._aupload(
+                        client=client,
+                        console=console,
+                        skip_preflight=True,
+                        readers=readers,
+                        writers=writers,
+                        uploader=uploader,
+                        hasher=hasher,
+                    )
+                    for x in self.collections
+                )
+            ),
+        )
+
+        await asyncio.gather(
+            *(
+                aio_collections.add(
+                    client=client,
+                    id=self.collection_id,
+                    product=product_id,
+                    console=console,
+                )
+                for product_id in product_ids_to_connect
+            ),
+            *(
+                aio_relationships.add_child_collection(
+                    client=client,
+                    parent=self.collection_id,
+                    child=collection_id,
+                    console=console,
+                )
+                for collection_id in child_collection_ids_to_connect
+            ),
+        )
+
+        return self.collection_id
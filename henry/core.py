@@ -5,6 +5,8 @@ from henry.source import LocalSource
 from hippoclient.caching import MultiCache
 from hippoclient.core import Client as AuthenticatedClient
 from hippoclient.core import ClientSettings
+from hippoclient.hashing import Hasher
+from hippoclient.uploading import Uploader
 from hippometa import ALL_METADATA_TYPE
 
 from .collection import CollectionInstance, LocalCollection
@@ -16,6 +18,8 @@ class Henry:
     client: Client
     console: Console
     cache: MultiCache
+    uploader: Uploader
+    hasher: Hasher
 
     def __init__(
         self,
@@ -29,6 +33,8 @@ class Henry:
             host=self.settings.host, token_tag=self.settings.token_tag
         )
         self.cache = self.settings.cache
+        self.uploader = self.settings.uploader
+        self.hasher = self.settings.hasher
         self.readers = self.settings.default_readers
         self.writers = self.settings.default_writers
 
@@ -68,6 +74,8 @@ class Henry:
             skip_preflight=skip_preflight,
             readers=self.readers,
             writers=self.writers,
+            uploader=self.uploader,
+            hasher=self.hasher,
         )
 
     def pull_product(
@@ -7,8 +7,13 @@ from rich.console import Console
 
 from henry.source import LocalSource, RemoteSource
 from hippoclient import product as product_client
+from hippoclient.aio import AsyncMultiCache
+from hippoclient.aio import product as aio_product_client
 from hippoclient.caching import MultiCache
+from hippoclient.hashing import Hasher
+from hippoclient.uploading import Uploader
 from hippometa import ALL_METADATA_TYPE
+from hipposerve.wire import ProductMetadata
 
 from .exceptions import InvalidSlugError, PreflightFailedError
 
@@ -205,6 +210,8 @@ class LocalProduct(ProductInstance):
         skip_preflight: bool = False,
         readers: list[str] | None = None,
         writers: list[str] | None = None,
+        uploader: Uploader | None = None,
+        hasher: Hasher | None = None,
     ) -> str:
         if self.product_id:
             # We've already been uploaded
@@ -222,6 +229,41 @@ class LocalProduct(ProductInstance):
             source_descriptions={x: y.description for x, y in self.sources.items()},
             readers=readers,
             writers=writers,
+            uploader=uploader,
+            hasher=hasher,
+            console=console,
+        )
+        self.product_id = remote_id
+        return remote_id
+
+    async def _aupload(
+        self,
+        client: httpx.AsyncClient,
+        console: Console,
+        skip_preflight: bool = False,
+        readers: list[str] | None = None,
+        writers: list[str] | None = None,
+        uploader: Uploader | None = None,
+        hasher: Hasher | None = None,
+    ) -> str:
+        if self.product_id:
+            # We've already been uploaded
+            return self.product_id
+
+        if not skip_preflight:
+            self.preflight()
+
+        remote_id = await aio_product_client.create(
+            client=client,
+            name=self.name,
+            description=self.description,
+            metadata=self.metadata,
+            sources={x: y.path for x, y in self.sources.items()},
+            source_descriptions={x: y.description for x, y in self.sources.items()},
+            readers=readers,
+            writers=writers,
+            uploader=uploader,
+            hasher=hasher,
             console=console,
         )
         self.product_id = remote_id
@@ -280,6 +322,50 @@ class RemoteProduct(ProductInstance):
                 console=console,
             )
 
+        return cls._from_metadata(
+            product_id=product_id,
+            product_metadata=product_metadata,
+            cache=cache,
+            realize_sources=realize_sources,
+        )
+
+    @classmethod
+    async def apull(
+        cls,
+        product_id: str,
+        client: httpx.AsyncClient,
+        cache: AsyncMultiCache,
+        console: Console,
+        realize_sources: bool = True,
+    ) -> "RemoteProduct":
+        product_metadata = await aio_product_client.read(
+            client=client, id=product_id, console=console
+        )
+
+        if realize_sources:
+            # Ensure it's cached
+            await aio_product_client.cache(
+                client=client,
+                cache=cache,
+                id=product_id,
+                console=console,
+            )
+
+        return cls._from_metadata(
+            product_id=product_id,
+            product_metadata=product_metadata,
+            cache=cache.cache,
+            realize_sources=realize_sources,
+        )
+
+    @classmethod
+    def _from_metadata(
+        cls,
+        product_id: str,
+        product_metadata: ProductMetadata,
+        cache: MultiCache,
+        realize_sources: bool,
+    ) -> "RemoteProduct":
         # Convert the sources
         sources = {
             x: RemoteSource(
@@ -394,6 +480,12 @@ class RemoteProduct(ProductInstance):
         """
         return self.product_id
 
+    async def _aupload(self, *args, **kwargs) -> str:
+        """
+        Upload is not supported for RemoteProduct, as it is a read-only object.
+        """
+        return self.product_id
+
 
 class RevisionProduct(ProductInstance):
     """
@@ -675,6 +767,41 @@ class RevisionProduct(ProductInstance):
         skip_preflight: bool = False,
         readers: list[str] | None = None,
         writers: list[str] | None = None,
+        uploader: Uploader | None = None,
+        hasher: Hasher | None = None,
+    ) -> str:
+        # Readers/writers are not used!
+
+        if self.product_id:
+            # We've already been uploaded
+            return self.product_id
+
+        if not skip_preflight:
+            self.preflight()
+
+        remote_id = product_client.update(
+            client=client,
+            id=self.revision_of.product_id,
+            level=self.revision_level,
+            **self._update_arguments(),
+            uploader=uploader,
+            hasher=hasher,
+            console=console,
+        )
+
+        self.product_id = remote_id
+
+        return remote_id
+
+    async def _aupload(
+        self,
+        client: httpx.AsyncClient,
+        console: Console,
+        skip_preflight: bool = False,
+        readers: list[str] | None = None,
+        writers: list[str] | None = None,
+        uploader: Uploader | None = None,
+        hasher: Hasher | None = None,
     ) -> str:
         # Readers/writers are not used!
 
@@ -685,6 +812,25 @@ class RevisionProduct(ProductInstance):
         if not skip_preflight:
             self.preflight()
 
+        remote_id = await aio_product_client.update(
+            client=client,
+            id=self.revision_of.product_id,
+            level=self.revision_level,
+            **self._update_arguments(),
+            uploader=uploader,
+            hasher=hasher,
+            console=console,
+        )
+
+        self.product_id = remote_id
+
+        return remote_id
+
+    def _update_arguments(self) -> dict:
+        """
+        The arguments to ``product.update`` that apply this revision.
+        """
+
         diff = self._calculate_diff()
 
         # Break out new and replace sources into paths and descriptions
@@ -700,14 +846,4 @@ class RevisionProduct(ProductInstance):
             x: y.description for x, y in replace_sources.items()
         }
 
-        remote_id = product_client.update(
-            client=client,
-            id=self.revision_of.product_id,
-            level=self.revision_level,
-            **diff,
-            console=console,
-        )
-
-        self.product_id = remote_id
-
-        return remote_id
+        return diff
@@ -7,11 +7,24 @@ Host can be stored in the hippo_HOST environment variable.
 
 __all__ = [
     "Client",
+    "aio",
     "collections",
     "product",
     "relationships",
     "caching",
+    "downloading",
+    "hashing",
+    "uploading",
 ]
 
-from . import caching, collections, product, relationships
+from . import (
+    aio,
+    caching,
+    collections,
+    downloading,
+    hashing,
+    product,
+    relationships,
+    uploading,
+)
 from .core import Client
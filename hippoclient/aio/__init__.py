@@ -0,0 +1,22 @@
+"""
+An async mirror of the hippo client, built on ``httpx.AsyncClient``.
+
+The functions in ``hippoclient.aio.product``, ``hippoclient.aio.collections``
+and ``hippoclient.aio.relationships`` take the same arguments as their
+synchronous counterparts, but must be awaited, and take an ``AsyncClient``
+(and, where relevant, an ``AsyncMultiCache``). Use a single client for all
+requests so that they share its connection pool.
+"""
+
+__all__ = [
+    "AsyncClient",
+    "AsyncMultiCache",
+    "caching",
+    "collections",
+    "product",
+    "relationships",
+]
+
+from . import caching, collections, product, relationships
+from .caching import AsyncMultiCache
+from .core import AsyncClient
@@ -0,0 +1,106 @@
+"""
+Async access to the hippo client caches.
+
+The caches themselves are SQLite databases and files on disk, so there is
+nothing to gain from making them natively async. Instead, cache operations
+(and the downloads they trigger) run on a small thread pool. SQLite
+connections cannot be shared between threads, so each worker thread opens its
+own connection to every cache; the leases held in the cache databases make
+sure that two workers never fetch the same source.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from ..caching import MultiCache
+
+
+class AsyncMultiCache(BaseModel):
+    """
+    An async interface to a ``MultiCache``. At most ``workers`` sources are
+    fetched at once.
+    """
+
+    cache: MultiCache
+    workers: int = 4
+    "The maximum number of cache operations (and hence downloads) run at once"
+
+    _executor: ThreadPoolExecutor
+    _local: threading.local
+
+    def model_post_init(self, __context):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(self.workers, 1), thread_name_prefix="hippo-cache"
+        )
+        self._local = threading.local()
+
+    def _thread_cache(self) -> MultiCache:
+        """
+        The ``MultiCache`` belonging to the current worker thread.
+        """
+
+        cache = getattr(self._local, "cache", None)
+
+        if cache is None:
+            cache = self.cache.clone()
+            self._local.cache = cache
+
+        return cache
+
+    async def _run(self, method: str, *args, **kwargs):
+        def call():
+            return getattr(self._thread_cache(), method)(*args, **kwargs)
+
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+    async def available(self, id: str, touch: bool = True) -> Path:
+        """
+        Check if a source is available in any cache with id ``id``.
+        See ``MultiCache.available``.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the source is not available in the cache
+        """
+
+        return await self._run("available", id, touch=touch)
+
+    async def get(
+        self, id: str, path: str, checksum: str, size: int, presigned_url: str
+    ) -> Path:
+        """
+        Get and store an item in the cache. See ``MultiCache.get``.
+
+        Raises
+        ------
+        CacheNotWriteableError
+            If no caches are writeable
+        """
+
+        return await self._run(
+            "get",
+            id=id,
+            path=path,
+            checksum=checksum,
+            size=size,
+            presigned_url=presigned_url,
+        )
+
+    async def remove(self, id: str):
+        """
+        Remove a source from all caches.
+        """
+
+        return await self._run("remove", id)
+
+    def close(self):
+        """
+        Shut down the worker threads.
+        """
+
+        self._executor.shutdown(wait=True)
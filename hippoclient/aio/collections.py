@@ -0,0 +1,396 @@
+"""
+Async methods for interacting with the collections layer of the hippo API.
+These mirror ``hippoclient.collections``.
+"""
+
+import asyncio
+from pathlib import Path
+from typing import AsyncIterator
+
+from httpx import AsyncClient
+from rich.console import Console
+
+from hipposerve.wire import (
+    ReadCollectionProductResponse,
+    ReadCollectionProductsResponse,
+    ReadCollectionResponse,
+    SearchCollectionsResponse,
+)
+
+from ..product import PAGE_SIZE
+from .caching import AsyncMultiCache
+from .product import cache as cache_product
+from .product import uncache as uncache_product
+
+
+async def create(
+    client: AsyncClient,
+    name: str,
+    description: str,
+    readers: list[str] | None = None,
+    writers: list[str] | None = None,
+    console: Console | None = None,
+) -> str:
+    """
+    Create a new collection in hippo. See ``hippoclient.collections.create``.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    content = {"description": description}
+
+    if readers is not None:
+        content["readers"] = readers
+    if writers is not None:
+        content["writers"] = writers
+
+    response = await client.put(f"/relationships/collection/{name}", json=content)
+
+    response.raise_for_status()
+
+    if console:
+        console.print(f"Successfully created collection {name}.", style="bold green")
+
+    return response.json()
+
+
+async def read(
+    client: AsyncClient, id: str, console: Console | None = None
+) -> ReadCollectionResponse:
+    """
+    Read a collection from hippo. See ``hippoclient.collections.read``.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    response = await client.get(f"/relationships/collection/{id}")
+
+    response.raise_for_status()
+
+    model = ReadCollectionResponse.model_validate_json(response.content)
+
+    # Large collections return only their first page of products.
+    if model.next_cursor is not None:
+        model.products += [
+            x async for x in iterate_products(client, id, cursor=model.next_cursor)
+        ]
+        model.next_cursor = None
+
+    if console:
+        console.print(f"Successfully read collection {model.name} ({id})")
+
+    return model
+
+
+async def iterate_products(
+    client: AsyncClient,
+    id: str,
+    page_size: int = PAGE_SIZE,
+    cursor: str | None = None,
+) -> AsyncIterator[ReadCollectionProductResponse]:
+    """
+    Read the products in a collection, a page at a time.
+    See ``hippoclient.collections.iterate_products``.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    params = {"limit": page_size}
+
+    while True:
+        if cursor is not None:
+            params["cursor"] = cursor
+
+        response = await client.get(
+            f"/relationships/collection/{id}/products", params=params
+        )
+
+        response.raise_for_status()
+
+        page = ReadCollectionProductsResponse.model_validate(response.json())
+
+        for model in page.results:
+            yield model
+
+        if page.next_cursor is None:
+            return
+
+        cursor = page.next_cursor
+
+
+async def _update_groups(client: AsyncClient, id: str, change: str, group: str) -> str:
+    response = await client.post(
+        f"/relationships/collection/{id}", json={change: [group]}
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def add_reader(
+    client: AsyncClient, id: str, group: str, console: Console | None = None
+) -> str:
+    this_collection_id = await _update_groups(client, id, "add_readers", group)
+    if console:
+        console.print(f"Successfully added {group} to collection {id} readers.")
+    return this_collection_id
+
+
+async def remove_reader(
+    client: AsyncClient, id: str, group: str, console: Console | None = None
+) -> str:
+    this_collection_id = await _update_groups(client, id, "remove_readers", group)
+    if console:
+        console.print(f"Successfully removed {group} from collection {id} readers.")
+    return this_collection_id
+
+
+async def add_writer(
+    client: AsyncClient, id: str, group: str, console: Console | None = None
+) -> str:
+    this_collection_id = await _update_groups(client, id, "add_writers", group)
+    if console:
+        console.print(f"Successfully added {group} to collection {id} writers.")
+    return this_collection_id
+
+
+async def remove_writer(
+    client: AsyncClient, id: str, group: str, console: Console | None = None
+) -> str:
+    this_collection_id = await _update_groups(client, id, "remove_writers", group)
+    if console:
+        console.print(f"Successfully removed {group} from collection {id} writers.")
+    return this_collection_id
+
+
+async def iterate_search(
+    client: AsyncClient, name: str, page_size: int = PAGE_SIZE
+) -> AsyncIterator[ReadCollectionResponse]:
+    """
+    Search for collections in hippo, reading the results a page at a time.
+    See ``hippoclient.collections.iterate_search``.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    params = {"limit": page_size}
+
+    while True:
+        response = await client.get(
+            f"/relationships/collection/search/{name}", params=params
+        )
+
+        response.raise_for_status()
+
+        page = SearchCollectionsResponse.model_validate(response.json())
+
+        for model in page.results:
+            yield model
+
+        if page.next_cursor is None:
+            return
+
+        params["cursor"] = page.next_cursor
+
+
+async def search(
+    client: AsyncClient,
+    name: str,
+    console: Console | None = None,
+    limit: int | None = None,
+) -> list[ReadCollectionResponse]:
+    """
+    Search for collections in hippo. See ``hippoclient.collections.search``.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    page_size = PAGE_SIZE if limit is None else min(limit, PAGE_SIZE)
+    models = []
+
+    async for model in iterate_search(client, name, page_size=page_size):
+        models.append(model)
+
+        if len(models) == limit:
+            break
+
+    if console:
+        console.print(f"Successfully searched for collection {name}")
+
+    return models
+
+
+async def add(
+    client: AsyncClient, id: str, product: str, console: Console | None = None
+) -> bool:
+    """
+    Add a product to a collection in hippo. See ``hippoclient.collections.add``.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    response = await client.put(f"/relationships/collection/{id}/{product}")
+
+    response.raise_for_status()
+
+    if console:
+        console.print(
+            f"Successfully added product {product} to collection {id}.",
+            style="bold green",
+        )
+
+    return True
+
+
+async def remove(
+    client: AsyncClient, id: str, product: str, console: Console | None = None
+) -> bool:
+    """
+    Remove a product from a collection in hippo.
+    See ``hippoclient.collections.remove``.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    response = await client.delete(f"/relationships/collection/{id}/{product}")
+
+    response.raise_for_status()
+
+    if console:
+        console.print(
+            f"Successfully removed product {product} from collection {id}.",
+            style="bold green",
+        )
+
+    return True
+
+
+async def delete(client: AsyncClient, id: str, console: Console | None = None) -> bool:
+    """
+    Delete a collection from hippo. See ``hippoclient.collections.delete``.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    response = await client.delete(f"/relationships/collection/{id}")
+
+    response.raise_for_status()
+
+    if console:
+        console.print(f"Successfully deleted collection {id}.", style="bold green")
+
+    return True
+
+
+async def _product_ids(
+    client: AsyncClient, id: str, recursive: bool, console: Console | None = None
+) -> list[str]:
+    """
+    The IDs of the products in a collection and, if ``recursive``, in all of
+    its descendant collections. Each generation of collections is read at once.
+    """
+
+    product_ids = {}
+    to_read = [id]
+    seen = set()
+
+    while to_read:
+        seen.update(to_read)
+
+        collections = await asyncio.gather(
+            *(read(client, x, console=console) for x in to_read)
+        )
+
+        to_read = []
+
+        for collection in collections:
+            product_ids.update({str(x.id): None for x in collection.products or []})
+
+            if recursive:
+                to_read += [
+                    str(x.id)
+                    for x in collection.child_collections or []
+                    if str(x.id) not in seen
+                ]
+
+        to_read = list(dict.fromkeys(to_read))
+
+    return list(product_ids)
+
+
+async def cache(
+    client: AsyncClient,
+    cache: AsyncMultiCache,
+    id: str,
+    console: Console | None = None,
+    recursive: bool = False,
+) -> list[Path]:
+    """
+    Cache a collection from hippo. See ``hippoclient.collections.cache``.
+    All products are cached concurrently, up to the cache's ``workers``.
+
+    Returns
+    -------
+    list[Path]
+        The paths to the cached files.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    CacheNotWriteableError
+        If the cache is not writeable
+    """
+
+    product_ids = await _product_ids(client, id, recursive=recursive, console=console)
+
+    paths = await asyncio.gather(
+        *(cache_product(client, cache, product_id) for product_id in product_ids)
+    )
+
+    return [path for product_paths in paths for path in product_paths]
+
+
+async def uncache(
+    client: AsyncClient,
+    cache: AsyncMultiCache,
+    id: str,
+    console: Console | None = None,
+) -> None:
+    """
+    Remove a collection from local caches. See ``hippoclient.collections.uncache``.
+
+    Raises
+    ------
+    CacheNotWriteableError
+        If the cache is not writeable
+    """
+
+    collection = await read(client, id)
+
+    await asyncio.gather(
+        *(uncache_product(client, cache, product.id) for product in collection.products)
+    )
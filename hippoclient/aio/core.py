@@ -0,0 +1,56 @@
+"""
+Core async client object for interacting with the hippo API.
+"""
+
+import importlib.util
+
+import httpx
+
+
+def AsyncClient(
+    host: str,
+    token_tag: str | None,
+    timeout: int | None = None,
+    max_connections: int = 100,
+    max_keepalive_connections: int = 20,
+    http2: bool = True,
+) -> httpx.AsyncClient:
+    """
+    Create an async client for the hippo API. All requests made through the
+    client share one connection pool, so create a single client and re-use
+    it rather than creating one per request.
+
+    Arguments
+    ---------
+    host : str
+        The hostname of the HIPPO service.
+    token_tag : str, optional
+        The tag associated with the API key to authenticate with.
+    timeout : int, optional
+        The timeout for each request in seconds. Defaults to 60.
+    max_connections : int
+        The maximum number of concurrent connections to the service.
+    max_keepalive_connections : int
+        The maximum number of idle connections kept open for re-use.
+    http2 : bool
+        Whether to use HTTP/2, which multiplexes requests over a single
+        connection. Only used if the ``h2`` package is installed.
+    """
+
+    auth = None
+
+    if token_tag:
+        from soauth.toolkit.client import SOAuth
+
+        auth = SOAuth(token_tag)
+
+    return httpx.AsyncClient(
+        base_url=host,
+        auth=auth,
+        timeout=httpx.Timeout(timeout or 60),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        ),
+        http2=http2 and importlib.util.find_spec("h2") is not None,
+    )
@@ -0,0 +1,720 @@
+"""
+Async methods for interacting with the product layer of the hippo API.
+These mirror ``hippoclient.product``.
+
+Checksumming and uploading sources is CPU and disk bound, and the parts go
+straight to the object store rather than to hippo, so those steps still use
+the (threaded) ``Hasher`` and ``Uploader``; they are run in a worker thread so
+that the event loop stays free.
+"""
+
+import asyncio
+from pathlib import Path
+from typing import AsyncIterator
+
+import httpx
+from httpx import AsyncClient, Response
+from rich.console import Console
+
+from hippometa import ALL_METADATA_TYPE
+from hippometa.simple import SimpleMetadata
+from hipposerve.wire import (
+    MetadataPredicate,
+    MultipartUpload,
+    PostUploadFile,
+    PreUploadFile,
+    ProductMetadata,
+    ProductQuery,
+    ReadPartsResponse,
+    ReadProductResponse,
+    ResumeProductResponse,
+    SearchProductsResponse,
+    UploadedPart,
+)
+
+from ..hashing import Hasher
+from ..product import PAGE_SIZE, _resume_sources, _validate_sources
+from ..uploading import Uploader, UploadFailedError
+from .caching import AsyncMultiCache
+
+
+async def _upload_parts(
+    client: AsyncClient,
+    sources: dict[str, Path],
+    this_product_id: str,
+    upload_urls: dict[str, list[str] | dict[int, str]],
+    uploads: dict[str, MultipartUpload],
+    uploader: Uploader | None = None,
+    console: Console | None = None,
+    uploaded: dict[str, list[UploadedPart]] | None = None,
+) -> dict[str, list[dict[str, str]]]:
+    uploader = uploader or Uploader()
+    slugs = {Path(path).name: slug for slug, path in sources.items()}
+    loop = asyncio.get_running_loop()
+
+    async def read_parts(name: str, start: int, count: int) -> list[str]:
+        response = await client.get(
+            f"/product/{this_product_id}/parts",
+            params={"slug": slugs[name], "from": start, "count": count},
+        )
+
+        response.raise_for_status()
+
+        return ReadPartsResponse.model_validate(response.json()).urls
+
+    def fetch_urls(name: str, start: int, count: int) -> list[str]:
+        # Called from the upload threads; the client belongs to the loop.
+        return asyncio.run_coroutine_threadsafe(
+            read_parts(name, start, count), loop
+        ).result()
+
+    def upload():
+        # Pre-signed URLs carry their own credentials.
+        with httpx.Client(timeout=uploader.timeout) as storage:
+            return uploader.upload(
+                client=storage,
+                sources=list(sources.values()),
+                upload_urls=upload_urls,
+                console=console,
+                uploads=uploads,
+                fetch_urls=fetch_urls,
+                uploaded=uploaded,
+            )
+
+    try:
+        headers, sizes = await asyncio.to_thread(upload)
+    except UploadFailedError as e:
+        e.product_id = this_product_id
+
+        if console:
+            console.print(
+                f"Upload of product {this_product_id} failed; resume it with "
+                "hippoclient.aio.product.resume.",
+                style="bold red",
+            )
+
+        raise
+
+    # Close out the upload.
+    response = await client.post(
+        f"/product/{this_product_id}/complete",
+        json={"headers": headers, "sizes": sizes},
+    )
+
+    response.raise_for_status()
+
+    return response.json()
+
+
+async def _upload_sources(
+    initial_response: Response,
+    client: AsyncClient,
+    sources: dict[str, PreUploadFile],
+    this_product_id: str,
+    uploader: Uploader | None = None,
+    console: Console | None = None,
+) -> dict[str, list[dict[str, str]]]:
+    initial = initial_response.json()
+
+    return await _upload_parts(
+        client=client,
+        sources=sources,
+        this_product_id=this_product_id,
+        upload_urls=initial["upload_urls"],
+        uploads={
+            x: MultipartUpload.model_validate(y)
+            for x, y in initial.get("uploads", {}).items()
+        },
+        uploader=uploader,
+        console=console,
+    )
+
+
+async def create(
+    client: AsyncClient,
+    name: str,
+    description: str,
+    metadata: ALL_METADATA_TYPE,
+    sources: dict[str, Path],
+    source_descriptions: dict[str, str | None],
+    readers: list[str] | None = None,
+    writers: list[str] | None = None,
+    uploader: Uploader | None = None,
+    hasher: Hasher | None = None,
+    console: Console | None = None,
+) -> str:
+    """
+    Create a product in hippo. See ``hippoclient.product.create``.
+
+    Returns
+    -------
+    str
+        The ID of the product created.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    assert len(sources) == len(source_descriptions)
+
+    sources = {x: Path(y) for x, y in sources.items()}
+
+    source_metadata = await asyncio.to_thread(
+        _validate_sources,
+        sources=sources,
+        source_descriptions=source_descriptions,
+        hasher=hasher,
+        console=console,
+    )
+
+    if metadata is None:
+        metadata = SimpleMetadata()
+
+    content = {
+        "name": name,
+        "description": description,
+        "metadata": metadata.model_dump(mode="json"),
+        "sources": source_metadata,
+        "multipart_batch_size": (uploader or Uploader()).part_size,
+        "part_url_limit": (uploader or Uploader()).url_page_size,
+    }
+
+    if readers is not None:
+        content["product_readers"] = readers
+    if writers is not None:
+        content["product_writers"] = writers
+
+    response = await client.put("/product/new", json=content)
+
+    response.raise_for_status()
+
+    this_product_id = response.json()["id"]
+
+    await _upload_sources(
+        initial_response=response,
+        client=client,
+        sources=sources,
+        this_product_id=this_product_id,
+        uploader=uploader,
+        console=console,
+    )
+
+    if console:
+        console.print(
+            f"Successfully created product {this_product_id} in remote database."
+        )
+
+    response = await client.post(f"/product/{this_product_id}/confirm")
+
+    response.raise_for_status()
+
+    if console:
+        console.print(f"Successfully completed upload of {name}.", style="bold green")
+
+    return this_product_id
+
+
+async def read_with_versions(
+    client: AsyncClient, id: str, console: Console | None = None
+) -> ReadProductResponse:
+    """
+    Read a product, and information about its versions, from hippo by ID.
+    See ``hippoclient.product.read_with_versions``.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    response = await client.get(f"/product/{id}")
+
+    response.raise_for_status()
+
+    model = ReadProductResponse.model_validate_json(response.content)
+
+    if console:
+        console.print(f"Successfully read product {id}")
+
+    return model
+
+
+async def read(
+    client: AsyncClient, id: str, console: Console | None = None
+) -> ProductMetadata:
+    """
+    Read a product from hippo by ID. See ``hippoclient.product.read``.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    model = await read_with_versions(client, id)
+
+    model = model.versions[model.requested]
+
+    if console:
+        console.print(f"Successfully read product ({model.name})")
+
+    return model
+
+
+async def update(
+    client: AsyncClient,
+    id: str,
+    name: str | None,
+    description: str | None,
+    level: int,
+    metadata: ALL_METADATA_TYPE | None,
+    new_sources: dict[str, Path] | None = None,
+    new_source_descriptions: dict[str, str | None] | None = None,
+    replace_sources: dict[str, Path] | None = None,
+    replace_source_descriptions: dict[str, str | None] | None = None,
+    drop_sources: list[str] | None = None,
+    add_readers: list[str] | None = None,
+    remove_readers: list[str] | None = None,
+    add_writers: list[str] | None = None,
+    remove_writers: list[str] | None = None,
+    uploader: Uploader | None = None,
+    hasher: Hasher | None = None,
+    console: Console | None = None,
+) -> str:
+    """
+    Update a product in hippo. See ``hippoclient.product.update``.
+
+    Returns
+    -------
+    str
+        The ID of the updated product.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    new_source_metadata = await asyncio.to_thread(
+        _validate_sources,
+        sources={x: Path(y) for x, y in (new_sources or {}).items()},
+        source_descriptions=new_source_descriptions or {},
+        hasher=hasher,
+        console=console,
+    )
+
+    replace_source_metadata = await asyncio.to_thread(
+        _validate_sources,
+        sources={x: Path(y) for x, y in (replace_sources or {}).items()},
+        source_descriptions=replace_source_descriptions or {},
+        hasher=hasher,
+        console=console,
+    )
+
+    response = await client.post(
+        f"/product/{id}/update",
+        json={
+            "name": name,
+            "description": description,
+            "level": level,
+            "metadata": metadata.model_dump() if metadata else None,
+            "new_sources": new_source_metadata,
+            "replace_sources": replace_source_metadata,
+            "drop_sources": drop_sources or [],
+            "add_readers": add_readers or [],
+            "remove_readers": remove_readers or [],
+            "add_writers": add_writers or [],
+            "remove_writers": remove_writers or [],
+            "part_url_limit": (uploader or Uploader()).url_page_size,
+        },
+    )
+
+    response.raise_for_status()
+
+    this_product_id = response.json()["id"]
+
+    await _upload_sources(
+        initial_response=response,
+        client=client,
+        sources={**(new_sources or {}), **(replace_sources or {})},
+        this_product_id=this_product_id,
+        uploader=uploader,
+        console=console,
+    )
+
+    if console:
+        console.print(f"Successfully updated product {id}.", style="bold green")
+
+    return this_product_id
+
+
+async def resume(
+    client: AsyncClient,
+    id: str,
+    sources: dict[str, Path],
+    uploader: Uploader | None = None,
+    hasher: Hasher | None = None,
+    console: Console | None = None,
+) -> str:
+    """
+    Resume the interrupted upload of a product's sources. See
+    ``hippoclient.product.resume``.
+
+    Raises
+    ------
+    ValueError
+        If a source that is still being uploaded is not given, or does not
+        match its local file.
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    uploader = uploader or Uploader()
+
+    response = await client.get(
+        f"/product/{id}/resume", params={"count": uploader.url_page_size}
+    )
+
+    response.raise_for_status()
+
+    resumed = ResumeProductResponse.model_validate(response.json())
+    sources = await asyncio.to_thread(
+        _resume_sources, resumed=resumed, sources=sources, hasher=hasher
+    )
+
+    if console:
+        for name, upload in resumed.uploads.items():
+            console.print(
+                f"Resuming {name}: {len(upload.parts)} of {upload.number_of_parts} "
+                "parts already uploaded."
+            )
+
+    await _upload_parts(
+        client=client,
+        sources=sources,
+        this_product_id=id,
+        upload_urls={x: y.upload_urls for x, y in resumed.uploads.items()},
+        uploads={
+            x: MultipartUpload(part_size=y.part_size, number_of_parts=y.number_of_parts)
+            for x, y in resumed.uploads.items()
+        },
+        uploader=uploader,
+        console=console,
+        uploaded={x: y.parts for x, y in resumed.uploads.items()},
+    )
+
+    if console:
+        console.print(
+            f"Successfully resumed upload of product {id}.", style="bold green"
+        )
+
+    return id
+
+
+async def delete(client: AsyncClient, id: str, console: Console | None = None) -> bool:
+    """
+    Delete a product from hippo. See ``hippoclient.product.delete``.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    response = await client.delete(f"/product/{id}")
+
+    response.raise_for_status()
+
+    if console:
+        console.print(f"Successfully deleted product {id}.", style="bold green")
+
+    return True
+
+
+async def iterate_search(
+    client: AsyncClient, text: str, page_size: int = PAGE_SIZE
+) -> AsyncIterator[ProductMetadata]:
+    """
+    Search for text information in products (primarily names), reading the
+    results a page at a time. See ``hippoclient.product.iterate_search``.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    params = {"limit": page_size}
+
+    while True:
+        response = await client.get(f"/product/search/{text}", params=params)
+
+        response.raise_for_status()
+
+        page = SearchProductsResponse.model_validate(response.json())
+
+        for model in page.results:
+            yield model
+
+        if page.next_cursor is None:
+            return
+
+        params["cursor"] = page.next_cursor
+
+
+async def search(
+    client: AsyncClient,
+    text: str,
+    console: Console | None = None,
+    limit: int | None = None,
+) -> list[ProductMetadata]:
+    """
+    Search for text information in products (primarily names).
+    See ``hippoclient.product.search``.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    page_size = PAGE_SIZE if limit is None else min(limit, PAGE_SIZE)
+    models = []
+
+    async for model in iterate_search(client, text, page_size=page_size):
+        models.append(model)
+
+        if len(models) == limit:
+            break
+
+    if console:
+        console.print(f"Successfully searched for products matching {text}")
+
+    return models
+
+
+async def iterate_query(
+    client: AsyncClient,
+    metadata_type: str,
+    predicates: dict[str, MetadataPredicate] | None = None,
+    page_size: int = PAGE_SIZE,
+) -> AsyncIterator[ProductMetadata]:
+    """
+    Query for products by their metadata, reading the results a page at a
+    time. See ``hippoclient.product.iterate_query``.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    body = ProductQuery(
+        metadata_type=metadata_type, predicates=predicates or {}
+    ).model_dump(mode="json")
+    params = {"limit": page_size}
+
+    while True:
+        response = await client.post("/product/query", json=body, params=params)
+
+        response.raise_for_status()
+
+        page = SearchProductsResponse.model_validate(response.json())
+
+        for model in page.results:
+            yield model
+
+        if page.next_cursor is None:
+            return
+
+        params["cursor"] = page.next_cursor
+
+
+async def query(
+    client: AsyncClient,
+    metadata_type: str,
+    predicates: dict[str, MetadataPredicate] | None = None,
+    console: Console | None = None,
+    limit: int | None = None,
+) -> list[ProductMetadata]:
+    """
+    Query for products by their metadata. See ``hippoclient.product.query``.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    page_size = PAGE_SIZE if limit is None else min(limit, PAGE_SIZE)
+    models = []
+
+    async for model in iterate_query(
+        client, metadata_type, predicates, page_size=page_size
+    ):
+        models.append(model)
+
+        if len(models) == limit:
+            break
+
+    if console:
+        console.print(f"Successfully queried for {metadata_type} products")
+
+    return models
+
+
+async def cache(
+    client: AsyncClient,
+    cache: AsyncMultiCache,
+    id: str,
+    console: Console | None = None,
+) -> list[Path]:
+    """
+    Cache a product from hippo. See ``hippoclient.product.cache``. The sources
+    of the product are fetched concurrently, up to the cache's ``workers``.
+
+    Returns
+    -------
+    list[Path]
+        The list of paths to the cached sources.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    CacheNotWriteableError
+        If the cache is not writeable
+    """
+
+    response = await client.get(f"/product/{id}/files")
+
+    response.raise_for_status()
+
+    post_upload_files = {
+        x: PostUploadFile.model_validate(y) for x, y in response.json()["files"].items()
+    }
+
+    if console:
+        console.print(f"Successfully read product {id}")
+
+    async def cache_file(file: PostUploadFile) -> Path:
+        try:
+            cached = await cache.available(file.uuid)
+
+            if console:
+                console.print(f"Found cached file {file.name}", style="green")
+
+            return cached
+        except FileNotFoundError:
+            if console:
+                console.print(
+                    f"File {file.name} ({file.uuid}) not found in cache", style="red"
+                )
+
+        cached = await cache.get(
+            id=file.uuid,
+            path=file.object_name,
+            checksum=file.checksum,
+            size=file.size,
+            presigned_url=file.url,
+        )
+
+        if console:
+            console.print(f"Cached file {file.name} ({file.uuid})", style="yellow")
+
+        return cached
+
+    return list(
+        await asyncio.gather(*(cache_file(x) for x in post_upload_files.values()))
+    )
+
+
+async def uncache(
+    client: AsyncClient,
+    cache: AsyncMultiCache,
+    id: str,
+    console: Console | None = None,
+) -> None:
+    """
+    Clear the cache of a product. See ``hippoclient.product.uncache``.
+    """
+
+    product = await read(client, id)
+
+    for source in product.sources.values():
+        await cache.remove(source.uuid)
+
+        if console:
+            console.print(f"Removed file {source.name} ({source.uuid}) from cache")
+
+    return
+
+
+async def _update_groups(client: AsyncClient, id: str, change: str, group: str) -> str:
+    response = await client.post(
+        f"/product/{id}/update",
+        json={
+            "level": None,
+            change: [group],
+        },
+    )
+
+    response.raise_for_status()
+
+    return response.json()["id"]
+
+
+async def product_add_reader(
+    client: AsyncClient, id: str, group: str, console: Console | None = None
+) -> str:
+    this_product_id = await _update_groups(client, id, "add_readers", group)
+
+    if console:
+        console.print(
+            f"Successfully added {group} to product {id} readers.", style="bold green"
+        )
+
+    return this_product_id
+
+
+async def product_remove_reader(
+    client: AsyncClient, id: str, group: str, console: Console | None = None
+) -> str:
+    this_product_id = await _update_groups(client, id, "remove_readers", group)
+
+    if console:
+        console.print(
+            f"Successfully removed {group} from product {id} readers.",
+            style="bold green",
+        )
+
+    return this_product_id
+
+
+async def product_add_writer(
+    client: AsyncClient, id: str, group: str, console: Console | None = None
+) -> str:
+    this_product_id = await _update_groups(client, id, "add_writers", group)
+
+    if console:
+        console.print(
+            f"Successfully added {group} to product {id} writers.", style="bold green"
+        )
+
+    return this_product_id
+
+
+async def product_remove_writer(
+    client: AsyncClient, id: str, group: str, console: Console | None = None
+) -> str:
+    this_product_id = await _update_groups(client, id, "remove_writers", group)
+
+    if console:
+        console.print(
+            f"Successfully removed {group} from product {id} writers.",
+            style="bold green",
+        )
+
+    return this_product_id
@@ -0,0 +1,93 @@
+"""
+Async methods for adding and removing child relationships between products.
+These mirror ``hippoclient.relationships``.
+"""
+
+from httpx import AsyncClient
+from rich.console import Console
+
+
+async def add_child(
+    client: AsyncClient, parent: str, child: str, console: Console | None = None
+) -> bool:
+    """
+    Add a child relationship between two products.
+    See ``hippoclient.relationships.add_child``.
+    """
+
+    response = await client.put(f"/relationships/product/{child}/child_of/{parent}")
+
+    response.raise_for_status()
+
+    if console:
+        console.print(
+            f"Successfully added child relationship between {parent} and {child}.",
+            style="bold green",
+        )
+
+    return True
+
+
+async def remove_child(
+    client: AsyncClient, parent: str, child: str, console: Console | None = None
+) -> bool:
+    """
+    Remove a child relationship between two products.
+    See ``hippoclient.relationships.remove_child``.
+    """
+
+    response = await client.delete(f"/relationships/product/{child}/child_of/{parent}")
+
+    response.raise_for_status()
+
+    if console:
+        console.print(
+            f"Successfully removed child relationship between {parent} and {child}.",
+            style="bold green",
+        )
+
+    return True
+
+
+async def add_child_collection(
+    client: AsyncClient, parent: str, child: str, console: Console | None = None
+) -> bool:
+    """
+    Add a child relationship between a collection and another collection.
+    See ``hippoclient.relationships.add_child_collection``.
+    """
+
+    response = await client.put(f"/relationships/collection/{parent}/child_of/{child}")
+
+    response.raise_for_status()
+
+    if console:
+        console.print(
+            f"Successfully added child relationship between {parent} and {child}.",
+            style="bold green",
+        )
+
+    return True
+
+
+async def remove_child_collection(
+    client: AsyncClient, parent: str, child: str, console: Console | None = None
+) -> bool:
+    """
+    Remove a child relationship between a collection and another collection.
+    See ``hippoclient.relationships.remove_child_collection``.
+    """
+
+    response = await client.delete(
+        f"/relationships/collection/{child}/child_of/{parent}"
+    )
+
+    response.raise_for_status()
+
+    if console:
+        console.print(
+            f"Successfully removed child relationship between {parent} and {child}.",
+            style="bold green",
+        )
+
+    return True
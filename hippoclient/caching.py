@@ -11,16 +11,46 @@ c) A SQLite database that stores metadata about the files
 Because marshalling is so simple here we do not use
 SQLAlchemy or any other ORM. We just use the built-in
 Python sqlite3 module.
+
+Many processes (e.g. the tasks of an array job) may share a single cache.
+The database is opened in WAL mode so that readers never block the writer,
+and downloads are de-duplicated with leases stored in the database itself:
+
+a) Before fetching a source, a process takes out a lease on its ID. Only
+   one process can hold the lease at a time; taking it is a single
+   ``BEGIN IMMEDIATE`` transaction.
+b) The holder renews the lease from a background thread while it downloads,
+   and releases it once the source is available (or the download failed).
+c) Everyone else polls until the source becomes available, or until the
+   lease is released or goes stale, in which case they try to take it out
+   themselves. A lease is stale if it has not been renewed within
+   ``lease_timeout``, or if its holder was on this host and is no longer
+   running, so the leases of crashed workers are reclaimed.
+
+A cache may be given a ``quota`` in bytes. Every hit updates the source's
+last access time and hit count, and when fetching a new source would take the
+cache over its quota, available sources are evicted (least recently used, or
+least frequently used, first) to make room. Pinned sources are never evicted.
 """
 
 import os
+import socket
 import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Literal
 
-import httpx
 from pydantic import BaseModel
 
-from hipposerve.database import FileMetadata
+from hipposerve.wire import FileMetadata
+
+from .downloading import Downloader
+
+# SQLite limits the number of parameters in a single statement.
+SQLITE_BATCH_SIZE = 500
 
 
 class CacheNotWriteableError(Exception):
@@ -32,6 +62,61 @@ class CacheNotWriteableError(Exception):
         super().__init__("The cache is not writeable")
 
 
+class CacheQuotaExceededError(Exception):
+    """
+    Raised when a source cannot fit in the cache, even after evicting
+    everything that can be evicted.
+    """
+
+    def __init__(self, size: int, quota: int):
+        super().__init__(
+            f"A source of {size} bytes does not fit within the cache quota of {quota} bytes"
+        )
+
+
+class CacheStats(BaseModel):
+    """
+    Usage statistics for a single cache.
+    """
+
+    path: Path
+    quota: int | None
+    entries: int
+    pinned: int
+    bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    evicted_bytes: int
+
+    @property
+    def hit_rate(self) -> float | None:
+        """
+        The fraction of requests served from the cache, or None if there have
+        been none.
+        """
+
+        requests = self.hits + self.misses
+
+        return self.hits / requests if requests > 0 else None
+
+
+def _process_running(pid: int) -> bool:
+    """
+    Check whether a process with this pid is running on this host.
+    """
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running, but owned by someone else.
+        return True
+
+    return True
+
+
 class Cache(BaseModel):
     """
     A cache for sources used by the hippo client. All sources are labelled by their
@@ -85,32 +170,72 @@ class Cache(BaseModel):
 
     path: Path
     database_name: str = "cache.db"
+    journal_mode: str = "WAL"
+    "The SQLite journal mode; use DELETE for caches on filesystems without shared memory support"
+    database_timeout: float = 60.0
+    "How long to wait for another process to release the database, in seconds"
+    lease_timeout: float = 60.0
+    "How long a download lease lasts without being renewed, in seconds"
+    poll_interval: float = 1.0
+    "How often to check on a source that another process is fetching, in seconds"
+    quota: int | None = None
+    "The maximum number of bytes stored in this cache; None for no limit"
+    eviction_policy: Literal["lru", "lfu"] = "lru"
+    "Evict the least recently (lru) or least frequently (lfu) used sources first"
 
     _database: Path
     _connection: sqlite3.Connection
+    _owner: str
 
     def model_post_init(self, __context):
         self._database = self.path / self.database_name
+        self._owner = uuid.uuid4().hex
         self._connection = self._initialize_database()
 
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._database, timeout=self.database_timeout)
+
     def _initialize_database(self) -> sqlite3.Connection:
         """
-        Initialize the cache database.
+        Initialize the cache database. This is safe to run from many processes
+        at once.
         """
 
-        if self._database.exists():
-            return sqlite3.connect(self._database)
-        else:
-            # Create the database
-            connection = sqlite3.connect(self._database)
+        if self._database.exists() and not self.writeable:
+            return self._connect()
 
-            cursor = connection.cursor()
-            cursor.execute(
-                "CREATE TABLE sources (id PRIMARY KEY, path, checksum, size, available)"
-            )
-            connection.commit()
+        connection = self._connect()
 
-            return connection
+        cursor = connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        # Other processes may be initializing the same database right now.
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(
+            "CREATE TABLE IF NOT EXISTS sources "
+            "(id PRIMARY KEY, path, checksum, size, available)"
+        )
+        cursor.execute(
+            "CREATE TABLE IF NOT EXISTS leases (id PRIMARY KEY, owner, host, pid, expires)"
+        )
+        cursor.execute("CREATE TABLE IF NOT EXISTS stats (name PRIMARY KEY, value)")
+
+        # Caches created before usage tracking was added lack these columns.
+        cursor.execute("PRAGMA table_info(sources)")
+        columns = {row[1] for row in cursor.fetchall()}
+
+        for column, default in [
+            ("last_access", 0.0),
+            ("hit_count", 0),
+            ("pinned", False),
+        ]:
+            if column not in columns:
+                cursor.execute(
+                    f"ALTER TABLE sources ADD COLUMN {column} DEFAULT {default!r}"
+                )
+
+        connection.commit()
+
+        return connection
 
     @property
     def writeable(self) -> bool:
@@ -123,13 +248,18 @@ class Cache(BaseModel):
     def _add(self, id: str, path: str, checksum: str, size: int):
         """
         Add a source to the cache. Initially marks it as unavailable. This should
-        be called _before_ downloading the actual source.
+        be called _before_ downloading the actual source. Re-adding a source
+        (e.g. after an interrupted download) resets it to unavailable.
         """
 
         cursor = self._connection.cursor()
         cursor.execute(
-            "INSERT INTO sources (id, path, checksum, size, available) VALUES (?, ?, ?, ?, ?)",
-            (str(id), str(path), str(checksum), int(size), False),
+            "INSERT INTO sources (id, path, checksum, size, available, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET "
+            "path = excluded.path, checksum = excluded.checksum, "
+            "size = excluded.size, available = excluded.available, "
+            "last_access = excluded.last_access",
+            (str(id), str(path), str(checksum), int(size), False, time.time()),
         )
         self._connection.commit()
 
@@ -157,6 +287,241 @@ class Cache(BaseModel):
         )
         self._connection.commit()
 
+    def _acquire_lease(self, id: str) -> bool:
+        """
+        Try to take out the download lease for a source. Returns False if
+        another process holds a lease that is still live.
+        """
+
+        host = socket.gethostname()
+        now = time.time()
+
+        cursor = self._connection.cursor()
+        # Take the write lock up front so that check-then-set is atomic.
+        cursor.execute("BEGIN IMMEDIATE")
+
+        try:
+            cursor.execute(
+                "SELECT owner, host, pid, expires FROM leases WHERE id = ?",
+                (str(id),),
+            )
+
+            result = cursor.fetchone()
+
+            if result is not None and result[0] != self._owner:
+                _, holder_host, holder_pid, expires = result
+
+                live = expires > now and not (
+                    holder_host == host and not _process_running(holder_pid)
+                )
+
+                if live:
+                    self._connection.rollback()
+                    return False
+
+            cursor.execute(
+                "INSERT OR REPLACE INTO leases (id, owner, host, pid, expires) VALUES (?, ?, ?, ?, ?)",
+                (str(id), self._owner, host, os.getpid(), now + self.lease_timeout),
+            )
+            self._connection.commit()
+        except BaseException:
+            self._connection.rollback()
+            raise
+
+        return True
+
+    def _release_lease(self, id: str):
+        """
+        Release our download lease for a source, if we hold it.
+        """
+
+        cursor = self._connection.cursor()
+        cursor.execute(
+            "DELETE FROM leases WHERE id = ? AND owner = ?",
+            (str(id), self._owner),
+        )
+        self._connection.commit()
+
+    @contextmanager
+    def _lease(self, id: str):
+        """
+        Hold the (already acquired) lease for a source, renewing it in the
+        background until the block exits, and then release it.
+        """
+
+        stop = threading.Event()
+
+        def renew():
+            # sqlite3 connections cannot be shared between threads.
+            connection = self._connect()
+
+            try:
+                while not stop.wait(self.lease_timeout / 3):
+                    connection.execute(
+                        "UPDATE leases SET expires = ? WHERE id = ? AND owner = ?",
+                        (time.time() + self.lease_timeout, str(id), self._owner),
+                    )
+                    connection.commit()
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=renew, daemon=True)
+        thread.start()
+
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+            self._release_lease(id)
+
+    def _count(self, name: str, amount: int = 1):
+        """
+        Add ``amount`` to one of the usage counters in the stats table. This
+        does not commit.
+        """
+
+        self._connection.execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def _touch(self, id: str):
+        """
+        Record a hit on a source. Read-only caches do not track usage.
+        """
+
+        if not self.writeable:
+            return
+
+        self._connection.execute(
+            "UPDATE sources SET last_access = ?, hit_count = hit_count + 1 WHERE id = ?",
+            (time.time(), str(id)),
+        )
+        self._count("hits")
+        self._connection.commit()
+
+    def _reserve(self, id: str, path: str, checksum: str, size: int):
+        """
+        Add a source (as unavailable) to reserve its space while it is fetched.
+        If the cache has a quota, available, unpinned, sources are first
+        evicted until it fits.
+
+        Raises
+        ------
+        CacheQuotaExceededError
+            If the source cannot fit even after evicting everything we can.
+        """
+
+        if self.eviction_policy == "lfu":
+            order = "hit_count ASC, last_access ASC"
+        else:
+            order = "last_access ASC"
+
+        cursor = self._connection.cursor()
+        # Check the quota, choose and remove the victims, and reserve the space
+        # in one transaction, so that two processes fetching at once do not
+        # both fit into (or evict for) the same bytes.
+        cursor.execute("BEGIN IMMEDIATE")
+        victims = []
+
+        try:
+            if self.quota is not None:
+                # Sources that are still being fetched have reserved their space.
+                cursor.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM sources WHERE id != ?",
+                    (str(id),),
+                )
+                used = cursor.fetchone()[0]
+
+                cursor.execute(
+                    f"SELECT id, path, size FROM sources WHERE id != ? "
+                    f"AND available = ? AND NOT pinned ORDER BY {order}",
+                    (str(id), True),
+                )
+
+                for victim in cursor.fetchall():
+                    if used + size <= self.quota:
+                        break
+
+                    victims.append(victim)
+                    used -= victim[2]
+
+                if used + size > self.quota:
+                    raise CacheQuotaExceededError(size=size, quota=self.quota)
+
+                cursor.executemany(
+                    "DELETE FROM sources WHERE id = ?", [(x[0],) for x in victims]
+                )
+                self._count("evictions", len(victims))
+                self._count("evicted_bytes", sum(x[2] for x in victims))
+
+            self._count("misses")
+            # Commits the transaction.
+            self._add(id=id, path=path, checksum=checksum, size=size)
+        except BaseException:
+            self._connection.rollback()
+            raise
+
+        for _, victim_path, _ in victims:
+            (self.path / Path(victim_path)).unlink(missing_ok=True)
+
+    def pin(self, id: str, pinned: bool = True):
+        """
+        Pin (or unpin) a source so that it is never evicted from this cache.
+
+        Parameters
+        ----------
+        id : str
+            The ID of the source
+        pinned : bool
+            Whether the source should be pinned.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the source is not in this cache.
+        """
+
+        cursor = self._connection.cursor()
+        cursor.execute(
+            "UPDATE sources SET pinned = ? WHERE id = ?", (bool(pinned), str(id))
+        )
+        self._connection.commit()
+
+        if cursor.rowcount == 0:
+            raise FileNotFoundError
+
+    @property
+    def stats(self) -> CacheStats:
+        """
+        Usage statistics for this cache.
+        """
+
+        cursor = self._connection.cursor()
+        cursor.execute(
+            "SELECT COUNT(*), COALESCE(SUM(pinned), 0), COALESCE(SUM(size), 0) "
+            "FROM sources WHERE available = ?",
+            (True,),
+        )
+        entries, pinned, stored = cursor.fetchone()
+
+        cursor.execute("SELECT name, value FROM stats")
+        counters = dict(cursor.fetchall())
+
+        return CacheStats(
+            path=self.path,
+            quota=self.quota,
+            entries=entries,
+            pinned=pinned,
+            bytes=stored,
+            hits=counters.get("hits", 0),
+            misses=counters.get("misses", 0),
+            evictions=counters.get("evictions", 0),
+            evicted_bytes=counters.get("evicted_bytes", 0),
+        )
+
     def _get(self, id: str) -> Path | None:
         """
         Get a source from the cache. Or, if it's not available, return None.
@@ -196,7 +561,13 @@ class Cache(BaseModel):
         self._connection.commit()
 
     def _fetch(
-        self, id: str, path: str, checksum: str, size: int, presigned_url: str
+        self,
+        id: str,
+        path: str,
+        checksum: str,
+        size: int,
+        presigned_url: str,
+        downloader: Downloader | None = None,
     ) -> Path:
         """
         Fetch a source from the presigned URL we are provided, store it in
@@ -214,6 +585,9 @@ class Cache(BaseModel):
             The size of the source
         presigned_url : str
             The presigned URL to fetch the source from
+        downloader : Downloader, optional
+            The (segmented) downloader to fetch the source with. Defaults to
+            a ``Downloader`` with default settings.
 
         Returns
         -------
@@ -224,28 +598,50 @@ class Cache(BaseModel):
         ------
         CacheNotWriteableError
             If the cache is not writeable
+        CacheQuotaExceededError
+            If the source does not fit within the cache's quota
+        DownloadFailedError
+            If the source could not be downloaded
+        ChecksumMismatchError
+            If the downloaded source does not match ``checksum``
         """
 
         if not self.writeable:
             raise CacheNotWriteableError
 
-        self._add(id=id, path=path, checksum=checksum, size=size)
+        self._reserve(id=id, path=path, checksum=checksum, size=size)
 
         # Download the file
         destination_path = self.path / Path(path)
-        destination_path.parent.mkdir(parents=True, exist_ok=True)
 
-        with httpx.stream("GET", presigned_url) as response:
-            with open(destination_path, "wb") as f:
-                for chunk in response.iter_bytes():
-                    f.write(chunk)
+        try:
+            destination_path.parent.mkdir(parents=True, exist_ok=True)
+
+            # Downloads go to a temporary file, resume if interrupted, and are
+            # only moved into place once their checksum has been verified.
+            (downloader or Downloader()).download(
+                url=presigned_url,
+                destination=destination_path,
+                size=size,
+                checksum=checksum,
+            )
+        except BaseException:
+            # Give back the space we reserved; it can never be evicted.
+            self._remove(id)
+            raise
 
         self._mark_available(id)
 
         return destination_path
 
     def get(
-        self, id: str, path: str, checksum: str, size: int, presigned_url: str
+        self,
+        id: str,
+        path: str,
+        checksum: str,
+        size: int,
+        presigned_url: str,
+        downloader: Downloader | None = None,
     ) -> Path:
         """
         Get a source from the cache. If it's not available, fetch it from the
@@ -263,22 +659,47 @@ class Cache(BaseModel):
             The size of the source
         presigned_url : str
             The presigned URL to fetch the source from, if it not in the cache.
-        """
+        downloader : Downloader, optional
+            The (segmented) downloader to fetch the source with.
+
+        Notes
+        -----
+        If another process is already fetching this source into the same
+        cache, we wait for it to finish rather than downloading it again.
+        """
+
+        while True:
+            cached = self._get(id)
+
+            if cached is not None:
+                self._touch(id)
+                return cached
+
+            if not self.writeable:
+                raise CacheNotWriteableError
+
+            if self._acquire_lease(id):
+                with self._lease(id):
+                    # The previous holder may have finished just before we
+                    # took the lease.
+                    cached = self._get(id)
+
+                    if cached is not None:
+                        self._touch(id)
+                        return cached
+
+                    return self._fetch(
+                        id=id,
+                        path=path,
+                        checksum=checksum,
+                        size=size,
+                        presigned_url=presigned_url,
+                        downloader=downloader,
+                    )
 
-        cached = self._get(id)
+            time.sleep(self.poll_interval)
 
-        if cached is not None:
-            return cached
-        else:
-            return self._fetch(
-                id=id,
-                path=path,
-                checksum=checksum,
-                size=size,
-                presigned_url=presigned_url,
-            )
-
-    def available(self, id: str) -> Path:
+    def available(self, id: str, touch: bool = True) -> Path:
         """
         Check if a source is available in the cache with id ``id``.
         If it is, we return the Path. If not, we raise a FileNotFoundError.
@@ -287,6 +708,9 @@ class Cache(BaseModel):
         ----------
         id : str
             The ID of the source
+        touch : bool
+            Whether to record this as a use of the source, for eviction and
+            statistics. Set this to False if you are only displaying status.
 
         Returns
         -------
@@ -304,8 +728,55 @@ class Cache(BaseModel):
         if path is None:
             raise FileNotFoundError
 
+        if touch:
+            self._touch(id)
+
         return path
 
+    def available_many(self, ids: list[str], touch: bool = True) -> dict[str, Path]:
+        """
+        Check which of many sources are available in the cache, with a single
+        query (per batch of ``SQLITE_BATCH_SIZE`` ids) rather than one per source.
+
+        Parameters
+        ----------
+        ids : list[str]
+            The IDs of the sources
+        touch : bool
+            Whether to record this as a use of the sources that were found.
+
+        Returns
+        -------
+        dict[str, Path]
+            The paths to the sources that are available, keyed by ID. Sources
+            that are not available are left out.
+        """
+
+        ids = [str(x) for x in ids]
+        found = {}
+
+        cursor = self._connection.cursor()
+
+        for start in range(0, len(ids), SQLITE_BATCH_SIZE):
+            batch = ids[start : start + SQLITE_BATCH_SIZE]
+            cursor.execute(
+                f"SELECT id, path FROM sources WHERE available = ? "
+                f"AND id IN ({', '.join('?' * len(batch))})",
+                (True, *batch),
+            )
+            found.update({id: self.path / Path(path) for id, path in cursor})
+
+        if touch and found and self.writeable:
+            now = time.time()
+            self._connection.executemany(
+                "UPDATE sources SET last_access = ?, hit_count = hit_count + 1 WHERE id = ?",
+                [(now, id) for id in found],
+            )
+            self._count("hits", len(found))
+            self._connection.commit()
+
+        return found
+
     @property
     def complete_id_list(self) -> list[str]:
         """
@@ -328,8 +799,9 @@ class MultiCache(BaseModel):
     """
 
     caches: list[Cache]
+    downloader: Downloader | None = None
 
-    def available(self, id: str) -> Path:
+    def available(self, id: str, touch: bool = True) -> Path:
         """
         Check if a source is available in any cache with id ``id``.
         If it is, we return the Path. If not, we raise a FileNotFoundError.
@@ -338,6 +810,9 @@ class MultiCache(BaseModel):
         ----------
         id : str
             The ID of the source
+        touch : bool
+            Whether to record this as a use of the source, for eviction and
+            statistics.
 
         Returns
         -------
@@ -352,12 +827,54 @@ class MultiCache(BaseModel):
 
         for cache in self.caches:
             try:
-                return cache.available(id)
+                return cache.available(id, touch=touch)
             except FileNotFoundError:
                 continue
 
         raise FileNotFoundError
 
+    def available_many(self, ids: list[str], touch: bool = True) -> dict[str, Path]:
+        """
+        Check which of many sources are available in any cache. Each cache is
+        only asked about the sources not found in the caches before it.
+
+        Parameters
+        ----------
+        ids : list[str]
+            The IDs of the sources
+        touch : bool
+            Whether to record this as a use of the sources that were found.
+
+        Returns
+        -------
+        dict[str, Path]
+            The paths to the sources that are available, keyed by ID.
+        """
+
+        found = {}
+
+        for cache in self.caches:
+            missing = [x for x in ids if x not in found]
+
+            if not missing:
+                break
+
+            found.update(cache.available_many(missing, touch=touch))
+
+        return found
+
+    def clone(self) -> "MultiCache":
+        """
+        A copy of this MultiCache with its own database connections. SQLite
+        connections cannot be shared between threads, so each thread that
+        uses the caches needs its own clone.
+        """
+
+        return MultiCache(
+            caches=[Cache(**x.model_dump()) for x in self.caches],
+            downloader=self.downloader,
+        )
+
     def get(self, id: str, path: str, checksum: str, size: int, presigned_url: str):
         """
         Get and store an item in the cache. You should likely use this only after
@@ -385,19 +902,50 @@ class MultiCache(BaseModel):
         ------
         CacheNotWriteableError
             If no caches are writeable
+        CacheQuotaExceededError
+            If the source does not fit within the quota of any writeable cache
         """
 
+        quota_error = None
+
         for cache in self.caches:
             if cache.writeable:
-                return cache.get(
-                    id=id,
-                    path=path,
-                    checksum=checksum,
-                    size=size,
-                    presigned_url=presigned_url,
-                )
+                try:
+                    return cache.get(
+                        id=id,
+                        path=path,
+                        checksum=checksum,
+                        size=size,
+                        presigned_url=presigned_url,
+                        downloader=self.downloader,
+                    )
+                except CacheQuotaExceededError as e:
+                    quota_error = e
+                    continue
+
+        raise quota_error or CacheNotWriteableError
 
-        raise CacheNotWriteableError
+    def pin(self, id: str, pinned: bool = True):
+        """
+        Pin (or unpin) a source in every writeable cache that holds it.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the source is not in any writeable cache
+        """
+
+        found = False
+
+        for cache in filter(lambda c: c.writeable, self.caches):
+            try:
+                cache.pin(id, pinned=pinned)
+                found = True
+            except FileNotFoundError:
+                continue
+
+        if not found:
+            raise FileNotFoundError
 
     def remove(self, id: str):
         """
@@ -11,8 +11,8 @@ import hippoclient as sc
 
 from . import helper
 from .core import ClientSettings, MultiCache
-from .textedit import edit_product
 
+SETTINGS: ClientSettings
 CLIENT: sc.Client
 CACHE: MultiCache
 CONSOLE: rich.console.Console
@@ -98,7 +98,13 @@ def product_cache(id: str):
     """
     global CLIENT, CACHE
 
-    response = sc.product.cache(client=CLIENT, cache=CACHE, id=id, console=CONSOLE)
+    response = sc.product.cache(
+        client=CLIENT,
+        cache=CACHE,
+        id=id,
+        console=CONSOLE,
+        workers=SETTINGS.cache_workers,
+    )
 
     CONSOLE.print(f"Cached product {id} including {len(response)} files")
 
@@ -122,6 +128,9 @@ def product_edit(id: str):
     """
     global CLIENT
 
+    # textual is slow to import; only load it for the editor.
+    from .textedit import edit_product
+
     edit_product(client=CLIENT, id=id)
 
 
@@ -235,13 +244,25 @@ def collection_search(name: str):
 
 
 @collection_app.command("cache")
-def collection_cache(id: str):
+def collection_cache(
+    id: str,
+    recursive: Annotated[
+        bool, typer.Option(help="Also cache the products of all child collections")
+    ] = False,
+):
     """
     Cache a collection by its name.
     """
     global CLIENT, CACHE
 
-    response = sc.collections.cache(client=CLIENT, cache=CACHE, id=id, console=CONSOLE)
+    response = sc.collections.cache(
+        client=CLIENT,
+        cache=CACHE,
+        id=id,
+        console=CONSOLE,
+        recursive=recursive,
+        workers=SETTINGS.cache_workers,
+    )
 
     CONSOLE.print(f"Cached collection {id} including {len(response)} files")
 
@@ -392,6 +413,38 @@ def cache_clear_all():
             CONSOLE.print(f"Cleared cache {cache.path}")
 
 
+@cache_app.command("stats")
+def cache_stats():
+    """
+    Show the hit rate, size, and evictions of each cache.
+    """
+    global CACHE
+
+    CONSOLE.print(helper.render_cache_stats([cache.stats for cache in CACHE.caches]))
+
+
+@cache_app.command("pin")
+def cache_pin(uuid: str):
+    """
+    Pin a file, labelled by its UUID, so that it is never evicted from the cache.
+    """
+    global CACHE
+
+    CACHE.pin(uuid)
+    CONSOLE.print(f"Pinned {uuid}")
+
+
+@cache_app.command("unpin")
+def cache_unpin(uuid: str):
+    """
+    Unpin a file, labelled by its UUID, so that it can be evicted from the cache.
+    """
+    global CACHE
+
+    CACHE.pin(uuid, pinned=False)
+    CONSOLE.print(f"Unpinned {uuid}")
+
+
 @dev_app.command("serve")
 def dev_serve(
     port: Annotated[int, typer.Option(help="Port to run the server on")] = 8000,
@@ -488,11 +541,48 @@ def dev_run(
     return
 
 
+@dev_app.command("audit-indexes")
+def dev_audit_indexes(
+    mongo_uri: Annotated[
+        str, typer.Option(envvar="MONGO_URI", help="URI of the hippo database")
+    ],
+    database: Annotated[str, typer.Option(help="Name of the database")] = "account",
+    create: Annotated[
+        bool,
+        typer.Option(help="Create any missing indexes (as the server does) first"),
+    ] = False,
+):
+    """
+    Report which of the server's queries are not covered by an index.
+    """
+
+    import asyncio
+
+    from beanie import init_beanie
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from hipposerve.database import BEANIE_MODELS
+    from hipposerve.database.indexes import audit
+
+    async def run():
+        db = AsyncIOMotorClient(mongo_uri)[database]
+        await init_beanie(db, document_models=BEANIE_MODELS, skip_indexes=not create)
+        return await audit(db)
+
+    results = asyncio.run(run())
+
+    CONSOLE.print(helper.render_index_audit(results))
+
+    if not all(result.covered for result in results):
+        raise typer.Exit(code=1)
+
+
 def main():
     settings = ClientSettings()
 
-    global CLIENT, APP, CACHE, CONSOLE
+    global SETTINGS, CLIENT, APP, CACHE, CONSOLE
 
+    SETTINGS = settings
     CLIENT = settings.client
     CACHE = settings.cache
     CONSOLE = rich.console.Console(quiet=not settings.verbose)
@@ -2,15 +2,23 @@
 Methods for interacting with the collections layer of the hippo API
 """
 
+from itertools import islice
 from pathlib import Path
+from typing import Iterator
 
 from httpx import Client
 from rich.console import Console
 
-from hipposerve.api.models.relationships import ReadCollectionResponse
+from hipposerve.wire import (
+    ReadCollectionProductResponse,
+    ReadCollectionProductsResponse,
+    ReadCollectionResponse,
+    SearchCollectionsResponse,
+)
 
 from .core import MultiCache
-from .product import cache as cache_product
+from .product import PAGE_SIZE
+from .product import cache_many as cache_products
 from .product import uncache as uncache_product
 
 
@@ -100,12 +108,65 @@ def read(
 
     model = ReadCollectionResponse.model_validate_json(response.content)
 
+    # Large collections return only their first page of products.
+    if model.next_cursor is not None:
+        model.products += iterate_products(client, id, cursor=model.next_cursor)
+        model.next_cursor = None
+
     if console:
         console.print(f"Successfully read collection {model.name} ({id})")
 
     return model
 
 
+def iterate_products(
+    client: Client, id: str, page_size: int = PAGE_SIZE, cursor: str | None = None
+) -> Iterator[ReadCollectionProductResponse]:
+    """
+    Read the products in a collection, a page at a time as they are consumed.
+
+    Arguments
+    ---------
+    client: Client
+        The client to use for interacting with the hippo API.
+    id : str
+        The id of the collection to read the products of.
+    page_size : int, optional
+        The number of products to request at a time.
+    cursor : str, optional
+        Where to start from; the ``next_cursor`` of a previous read.
+
+    Yields
+    ------
+    ReadCollectionProductResponse
+        The products in the collection.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    params = {"limit": page_size}
+
+    while True:
+        if cursor is not None:
+            params["cursor"] = cursor
+
+        response = client.get(f"/relationships/collection/{id}/products", params=params)
+
+        response.raise_for_status()
+
+        page = ReadCollectionProductsResponse.model_validate(response.json())
+
+        yield from page.results
+
+        if page.next_cursor is None:
+            return
+
+        cursor = page.next_cursor
+
+
 def add_reader(
     client: Client, id: str, group: str, console: Console | None = None
 ) -> str:
@@ -158,8 +219,55 @@ def remove_writer(
     return this_collection_id
 
 
+def iterate_search(
+    client: Client, name: str, page_size: int = PAGE_SIZE
+) -> Iterator[ReadCollectionResponse]:
+    """
+    Search for collections in hippo, reading the results from the API a page
+    at a time as they are consumed.
+
+    Arguments
+    ---------
+    client: Client
+        The client to use for interacting with the hippo API.
+    name : str
+        The name of the collection to search for.
+    page_size : int, optional
+        The number of results to request at a time.
+
+    Yields
+    ------
+    ReadCollectionResponse
+        The collections that match the search, best matches first.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    params = {"limit": page_size}
+
+    while True:
+        response = client.get(f"/relationships/collection/search/{name}", params=params)
+
+        response.raise_for_status()
+
+        page = SearchCollectionsResponse.model_validate(response.json())
+
+        yield from page.results
+
+        if page.next_cursor is None:
+            return
+
+        params["cursor"] = page.next_cursor
+
+
 def search(
-    client: Client, name: str, console: Console | None = None
+    client: Client,
+    name: str,
+    console: Console | None = None,
+    limit: int | None = None,
 ) -> list[ReadCollectionResponse]:
     """
     Search for collections in hippo.
@@ -172,6 +280,9 @@ def search(
         The name of the collection to search for.
     console: Console, optional
         The rich console to print to.
+    limit : int, optional
+        The maximum number of collections to return. By default, all matches
+        are returned; see ``iterate_search`` to read them lazily.
 
     Returns
     -------
@@ -184,11 +295,8 @@ def search(
         If a request to the API fails
     """
 
-    response = client.get(f"/relationships/collection/search/{name}")
-
-    response.raise_for_status()
-
-    models = [ReadCollectionResponse.model_validate(x) for x in response.json()]
+    page_size = PAGE_SIZE if limit is None else min(limit, PAGE_SIZE)
+    models = list(islice(iterate_search(client, name, page_size=page_size), limit))
 
     if console:
         console.print(f"Successfully searched for collection {name}")
@@ -295,11 +403,47 @@ def delete(client: Client, id: str, console: Console | None = None) -> bool:
     return True
 
 
+def _product_ids(
+    client: Client, id: str, recursive: bool, console: Console | None = None
+) -> list[str]:
+    """
+    The IDs of the products in a collection and, if ``recursive``, in all of
+    its descendant collections.
+    """
+
+    product_ids = {}
+    to_read = [id]
+    seen = set()
+
+    while to_read:
+        current = to_read.pop(0)
+
+        if current in seen:
+            continue
+
+        seen.add(current)
+
+        collection = read(client, current, console=console)
+
+        product_ids.update({str(x.id): None for x in collection.products or []})
+
+        if recursive:
+            to_read += [str(x.id) for x in collection.child_collections or []]
+
+    return list(product_ids)
+
+
 def cache(
-    client: Client, cache: MultiCache, id: str, console: Console | None = None
+    client: Client,
+    cache: MultiCache,
+    id: str,
+    console: Console | None = None,
+    recursive: bool = False,
+    workers: int = 4,
 ) -> list[Path]:
     """
-    Cache a collection from hippo.
+    Cache a collection from hippo. Products are cached concurrently; see
+    ``hippoclient.product.cache_many``.
 
     Arguments
     ---------
@@ -311,6 +455,11 @@ def cache(
         The id of the collection to cache.
     console: Console, optional
         The rich console to print to.
+    recursive : bool
+        Whether to also cache the products of all child collections (and
+        their children, and so on).
+    workers : int
+        The maximum number of requests, and of downloads, in flight at once.
 
     Returns
     -------
@@ -325,14 +474,13 @@ def cache(
         If the cache is not writeable
     """
 
-    collection = read(client, id)
-
-    paths = []
+    product_ids = _product_ids(client, id, recursive=recursive, console=console)
 
-    for product in collection.products:
-        paths += cache_product(client, cache, product.id)
+    paths = cache_products(
+        client=client, cache=cache, ids=product_ids, console=console, workers=workers
+    )
 
-    return paths
+    return [path for product_id in product_ids for path in paths[product_id]]
 
 
 def uncache(
@@ -2,6 +2,9 @@
 Core client object for interacting with the hippo API.
 """
 
+from pathlib import Path
+from typing import TYPE_CHECKING
+
 import httpx
 from pydantic_settings import (
     BaseSettings,
@@ -10,9 +13,14 @@ from pydantic_settings import (
     SettingsConfigDict,
 )
 from rich.console import Console
-from soauth.toolkit.client import SOAuth
 
 from .caching import Cache, MultiCache
+from .downloading import DOWNLOAD_SEGMENT_SIZE, Downloader
+from .hashing import HashCache, Hasher
+from .uploading import Uploader
+
+if TYPE_CHECKING:
+    from .aio import AsyncMultiCache
 
 console = Console()
 
@@ -22,7 +30,13 @@ def Client(
     token_tag: str | None,
     timeout: int | None = None,
 ) -> httpx.Client:
-    auth = SOAuth(token_tag) if token_tag else None
+    auth = None
+
+    if token_tag:
+        from soauth.toolkit.client import SOAuth
+
+        auth = SOAuth(token_tag)
+
     return httpx.Client(base_url=host, auth=auth, timeout=httpx.Timeout(timeout or 60))
 
 
@@ -46,6 +60,32 @@ class ClientSettings(BaseSettings):
     client_timeout: int = 60
     "The timeout for the client in seconds. Default is 60 seconds (up from the httpx default of 5)"
 
+    max_connections: int = 100
+    "The maximum number of concurrent connections the async client opens to the service"
+    max_keepalive_connections: int = 20
+    "The maximum number of idle connections the async client keeps open for re-use"
+    http2: bool = True
+    "Use HTTP/2 for the async client, if the h2 package is installed"
+    cache_workers: int = 4
+    "The maximum number of sources (and product source lists) fetched into the cache at once"
+
+    upload_workers: int = 4
+    "The maximum number of parts uploaded at once, across all files. Each in-flight part is held in memory"
+    upload_workers_per_file: int = 4
+    "The maximum number of parts of a single file uploaded at once"
+    upload_retries: int = 3
+    "The number of times a failed part upload is retried (with exponential backoff)"
+
+    download_connections: int = 4
+    "The maximum number of concurrent connections (byte ranges) used to download a single source"
+    download_segment_size: int = DOWNLOAD_SEGMENT_SIZE
+    "The size of each byte range in bytes. Sources smaller than this use a single connection"
+
+    hash_workers: int = 4
+    "The maximum number of sources checksummed at once (in separate processes)"
+    hash_cache: Path | None = Path("~/.hippo_hashes.db")
+    "Path to the persistent checksum cache. Set to null to always re-hash sources"
+
     default_readers: list[str] = []
     "Default readers for new collections and products"
     default_writers: list[str] = []
@@ -79,7 +119,38 @@ class ClientSettings(BaseSettings):
         """
         Return a MultiCache object for the caches.
         """
-        return MultiCache(caches=self.caches)
+        return MultiCache(caches=self.caches, downloader=self.downloader)
+
+    @property
+    def downloader(self) -> Downloader:
+        """
+        Return a Downloader object configured for segmented downloads.
+        """
+        return Downloader(
+            connections=self.download_connections,
+            segment_size=self.download_segment_size,
+        )
+
+    @property
+    def uploader(self) -> Uploader:
+        """
+        Return an Uploader object configured for concurrent uploads.
+        """
+        return Uploader(
+            workers=self.upload_workers,
+            workers_per_file=self.upload_workers_per_file,
+            retries=self.upload_retries,
+        )
+
+    @property
+    def hasher(self) -> Hasher:
+        """
+        Return a Hasher object for checksumming sources.
+        """
+        return Hasher(
+            workers=self.hash_workers,
+            cache=HashCache(path=self.hash_cache) if self.hash_cache else None,
+        )
 
     @property
     def client(self) -> Client:
@@ -89,3 +160,28 @@ class ClientSettings(BaseSettings):
         return Client(
             token_tag=self.token_tag, host=self.host, timeout=self.client_timeout
         )
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """
+        Return an AsyncClient object for the API.
+        """
+        from .aio import AsyncClient
+
+        return AsyncClient(
+            token_tag=self.token_tag,
+            host=self.host,
+            timeout=self.client_timeout,
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            http2=self.http2,
+        )
+
+    @property
+    def async_cache(self) -> "AsyncMultiCache":
+        """
+        Return an AsyncMultiCache object for the caches.
+        """
+        from .aio import AsyncMultiCache
+
+        return AsyncMultiCache(cache=self.cache, workers=self.cache_workers)
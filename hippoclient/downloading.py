@@ -0,0 +1,443 @@
+"""
+The download engine for sources fetched into the hippo client cache.
+
+Downloads are written to a temporary ``.part`` file next to their destination,
+and only moved into place (atomically) once they are complete and their
+checksum has been verified. An interrupted download leaves its ``.part`` file
+behind, and the next attempt resumes from it rather than starting from zero.
+
+Large objects are downloaded over several connections at once:
+
+a) The object is split into byte ranges of ``segment_size``.
+b) Up to ``connections`` ranges are fetched concurrently with HTTP Range
+   requests, and written straight into their place in a pre-allocated file
+   with ``pwrite``. Completed ranges (start and end) are recorded in a
+   ``.segments`` file so that a later attempt only fetches the missing ones.
+   Only ranges that match exactly are skipped, so resuming with a different
+   ``segment_size`` is safe.
+c) A range that fails is retried on its own, resuming from the last byte
+   that was written.
+
+Small objects, or servers that do not honour Range requests, fall back to a
+single streamed GET, which resumes from the last byte of the ``.part`` file
+and hashes the data as it arrives.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+
+import httpx
+import xxhash
+from pydantic import BaseModel
+
+from .hashing import CHUNK_SIZE, xxh64_file
+
+DOWNLOAD_SEGMENT_SIZE = 64 * 1024 * 1024
+
+# Status codes that indicate the storage server may succeed if we try again.
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class DownloadFailedError(Exception):
+    """
+    Raised when a download (or one of its ranges) could not be completed
+    after all retries.
+    """
+
+
+class ChecksumMismatchError(Exception):
+    """
+    Raised when a downloaded object does not match its expected checksum.
+    """
+
+    def __init__(self, url: str, expected: str, found: str):
+        self.expected = expected
+        self.found = found
+        super().__init__(
+            f"Checksum mismatch for {url}: expected {expected}, found {found}"
+        )
+
+
+class RangeNotSupportedError(Exception):
+    """
+    Raised when the server ignores a Range request.
+    """
+
+
+def partial_path(destination: Path) -> Path:
+    """
+    The path to the temporary file that ``destination`` is downloaded to.
+    """
+
+    return destination.with_name(destination.name + ".part")
+
+
+def segments_path(destination: Path) -> Path:
+    """
+    The path to the record of completed ranges for a segmented download.
+    """
+
+    return destination.with_name(destination.name + ".segments")
+
+
+def read_segments(record: Path) -> set[tuple[int, int]] | None:
+    """
+    The (inclusive) byte ranges recorded as complete for a segmented download,
+    or None if the record is missing or unreadable (e.g. from an older client,
+    which recorded only start offsets).
+    """
+
+    if not record.exists():
+        return None
+
+    try:
+        return {
+            (int(start), int(end))
+            for start, end in (x.split("-") for x in record.read_text().split())
+        }
+    except ValueError:
+        return None
+
+
+def verifiable(checksum: str | None) -> bool:
+    """
+    Whether we know how to verify this checksum. Only xxh64 checksums (as
+    produced by hippoclient) can be verified.
+    """
+
+    return checksum is not None and checksum.startswith("xxh64:")
+
+
+class Downloader(BaseModel):
+    """
+    Segmented, multi-connection, resumable downloader. Configure it through
+    ``ClientSettings`` (``download_connections``, ``download_segment_size``)
+    and get one with ``ClientSettings.downloader``.
+    """
+
+    connections: int = 4
+    "The maximum number of concurrent connections used for a single object"
+    segment_size: int = DOWNLOAD_SEGMENT_SIZE
+    "The size of each byte range in bytes"
+    retries: int = 3
+    "The number of times in a row a failed range is retried before giving up"
+    backoff: float = 1.0
+    "The initial delay between retries in seconds; doubles with each attempt"
+    timeout: float = 120.0
+    "Timeout for each request in seconds"
+
+    def _retry(self, attempt: int, error: Exception) -> bool:
+        """
+        Sleep before the next attempt, or return False if we should give up.
+        """
+
+        retryable = isinstance(error, httpx.TransportError) or (
+            isinstance(error, httpx.HTTPStatusError)
+            and error.response.status_code in RETRYABLE_STATUS_CODES
+        )
+
+        if not retryable or attempt >= self.retries:
+            return False
+
+        time.sleep(self.backoff * (2**attempt))
+
+        return True
+
+    def _fetch_range(
+        self,
+        client: httpx.Client,
+        url: str,
+        fd: int,
+        start: int,
+        end: int,
+        stop: threading.Event,
+    ):
+        """
+        Fetch bytes ``start`` to ``end`` (inclusive) and write them at the
+        same offsets in the file descriptor ``fd``.
+        """
+
+        position = start
+        attempt = 0
+
+        while position <= end and not stop.is_set():
+            before = position
+
+            try:
+                with client.stream(
+                    "GET", url, headers={"Range": f"bytes={position}-{end}"}
+                ) as response:
+                    response.raise_for_status()
+
+                    if response.status_code != 206:
+                        raise RangeNotSupportedError
+
+                    for chunk in response.iter_bytes():
+                        if stop.is_set():
+                            return
+
+                        os.pwrite(fd, chunk, position)
+                        position += len(chunk)
+
+                if position <= before:
+                    # The stream ended cleanly but gave us nothing new.
+                    attempt += 1
+
+                    if attempt > self.retries:
+                        raise DownloadFailedError(
+                            f"Failed to download bytes {position}-{end} of {url}: no data"
+                        )
+                else:
+                    attempt = 0
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                # Only failures in a row count towards the retries.
+                if position > before:
+                    attempt = 0
+
+                if not self._retry(attempt=attempt, error=e):
+                    raise DownloadFailedError(
+                        f"Failed to download bytes {position}-{end} of {url}: {e}"
+                    )
+
+                attempt += 1
+
+    def _download_segmented(
+        self,
+        client: httpx.Client,
+        url: str,
+        destination: Path,
+        size: int,
+        verify: bool = True,
+    ) -> str:
+        """
+        Download in ranges to the ``.part`` file, and return its xxh64 checksum
+        (or an empty string if ``verify`` is False).
+        """
+
+        partial = partial_path(destination)
+        record = segments_path(destination)
+
+        # Pick up where a previous attempt left off, if its file is intact.
+        completed = read_segments(record)
+
+        if completed is None or not (
+            partial.exists() and partial.stat().st_size == size
+        ):
+            completed = set()
+
+            with open(partial, "wb") as f:
+                # Pre-allocate so that each range can be written in place.
+                f.truncate(size)
+
+            record.write_text("")
+
+        ranges = [
+            (start, min(start + self.segment_size, size) - 1)
+            for start in range(0, size, self.segment_size)
+        ]
+        ranges = [x for x in ranges if x not in completed]
+
+        stop = threading.Event()
+        record_lock = threading.Lock()
+
+        fd = os.open(partial, os.O_WRONLY)
+
+        def fetch_and_record(start: int, end: int):
+            self._fetch_range(
+                client=client, url=url, fd=fd, start=start, end=end, stop=stop
+            )
+
+            if not stop.is_set():
+                os.fsync(fd)
+
+                with record_lock, open(record, "a") as f:
+                    f.write(f"{start}-{end}\n")
+
+        try:
+            with ThreadPoolExecutor(
+                max_workers=max(min(self.connections, len(ranges)), 1),
+                thread_name_prefix="hippo-download",
+            ) as executor:
+                futures = [
+                    executor.submit(fetch_and_record, start=start, end=end)
+                    for start, end in ranges
+                ]
+
+                done, _ = wait(futures, return_when="FIRST_EXCEPTION")
+
+                for future in done:
+                    if future.exception() is not None:
+                        stop.set()
+                        raise future.exception()
+        finally:
+            os.close(fd)
+
+        # Ranges arrive out of order, so we can only hash once they are all
+        # in; the file will still be in the page cache.
+        return xxh64_file(partial) if verify else ""
+
+    def _download_single(
+        self, client: httpx.Client, url: str, destination: Path, size: int
+    ) -> str:
+        """
+        Download in a single stream to the ``.part`` file, and return its
+        xxh64 checksum, computed as the data arrives.
+        """
+
+        partial = partial_path(destination)
+
+        if partial.exists() and partial.stat().st_size > size:
+            # Not a prefix of this object; start over.
+            partial.unlink()
+
+        # Hash what we already have, then carry on from the last byte.
+        hasher = xxhash.xxh64()
+        position = 0
+
+        if partial.exists():
+            with open(partial, "rb") as f:
+                while chunk := f.read(CHUNK_SIZE):
+                    hasher.update(chunk)
+                    position += len(chunk)
+
+        attempt = 0
+
+        while position < size or (size == 0 and not partial.exists()):
+            headers = {"Range": f"bytes={position}-"} if position > 0 else {}
+            start = position
+
+            try:
+                with client.stream("GET", url, headers=headers) as response:
+                    response.raise_for_status()
+
+                    if position > 0 and response.status_code != 206:
+                        # Server ignored the range; start from scratch.
+                        hasher.reset()
+                        position = 0
+
+                    with open(partial, "r+b" if position > 0 else "wb") as f:
+                        f.seek(position)
+                        f.truncate()
+
+                        for chunk in response.iter_bytes():
+                            f.write(chunk)
+                            hasher.update(chunk)
+                            position += len(chunk)
+
+                if size == 0:
+                    break
+
+                if position <= start:
+                    # The stream ended cleanly but gave us nothing new.
+                    attempt += 1
+
+                    if attempt > self.retries:
+                        raise DownloadFailedError(
+                            f"Failed to download {url}: no data after byte {position}"
+                        )
+                else:
+                    attempt = 0
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                # Only failures in a row count towards the retries.
+                if position > start:
+                    attempt = 0
+
+                if not self._retry(attempt=attempt, error=e):
+                    raise DownloadFailedError(f"Failed to download {url}: {e}")
+
+                attempt += 1
+
+        return f"xxh64:{hasher.hexdigest()}"
+
+    def download(
+        self,
+        url: str,
+        destination: Path,
+        size: int,
+        checksum: str | None = None,
+        client: httpx.Client | None = None,
+    ) -> Path:
+        """
+        Download the object at ``url`` (a pre-signed URL) to ``destination``,
+        resuming any previous partial download of the same destination.
+
+        Arguments
+        ---------
+        url : str
+            The pre-signed URL to download from.
+        destination : Path
+            The path to write the object to.
+        size : int
+            The size of the object in bytes.
+        checksum : str, optional
+            The expected checksum of the object. If it is an xxh64 checksum
+            the download is verified before being moved into place.
+        client : httpx.Client, optional
+            The client to download with. By default a new, unauthenticated,
+            client is created; pre-signed URLs carry their own credentials.
+
+        Returns
+        -------
+        Path
+            The path to the downloaded object.
+
+        Raises
+        ------
+        DownloadFailedError
+            If the object could not be downloaded after all retries.
+        ChecksumMismatchError
+            If the downloaded object does not match ``checksum``. The partial
+            download is discarded.
+        """
+
+        partial = partial_path(destination)
+        record = segments_path(destination)
+
+        own_client = client is None
+
+        if own_client:
+            client = httpx.Client(timeout=self.timeout)
+
+        segmented = self.connections > 1 and size > self.segment_size
+
+        if not segmented and record.exists():
+            # A segmented download was in progress; its .part file has holes.
+            partial.unlink(missing_ok=True)
+            record.unlink()
+
+        try:
+            found = None
+
+            if segmented:
+                try:
+                    found = self._download_segmented(
+                        client=client,
+                        url=url,
+                        destination=destination,
+                        size=size,
+                        verify=verifiable(checksum),
+                    )
+                except RangeNotSupportedError:
+                    partial.unlink(missing_ok=True)
+                    record.unlink(missing_ok=True)
+
+            if found is None:
+                found = self._download_single(
+                    client=client, url=url, destination=destination, size=size
+                )
+        finally:
+            if own_client:
+                client.close()
+
+        record.unlink(missing_ok=True)
+
+        if verifiable(checksum) and found != checksum:
+            partial.unlink(missing_ok=True)
+            raise ChecksumMismatchError(url=url, expected=checksum, found=found)
+
+        os.replace(partial, destination)
+
+        return destination
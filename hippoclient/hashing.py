@@ -0,0 +1,188 @@
+"""
+Checksum computation for sources pushed by the hippo client.
+
+Sources are hashed with xxh64, streamed in chunks so that memory use does not
+scale with file size. Several sources are hashed at once in a process pool.
+
+Hashes are remembered in a small SQLite database keyed on the file's path,
+size, modification time and inode. If none of these have changed since we
+last hashed the file, we re-use the stored checksum and skip reading the file
+entirely. As with the cache, marshalling is simple enough that we just use
+the built-in sqlite3 module.
+
+A ``Hasher`` keeps a single process pool for its lifetime, so that sources
+hashed at once by several pushes (e.g. the products of a collection pushed by
+the async client) share the one bound of ``workers``.
+"""
+
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import xxhash
+from pydantic import BaseModel, PrivateAttr
+
+CHUNK_SIZE = 16 * 1024 * 1024
+
+
+def xxh64_file(path: Path, chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    Compute the xxh64 checksum of a file, reading it in chunks. Returns the
+    checksum in the form hippo expects (``xxh64:{hexdigest}``).
+    """
+
+    hasher = xxhash.xxh64()
+
+    with open(path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            hasher.update(chunk)
+
+    return f"xxh64:{hasher.hexdigest()}"
+
+
+class HashCache(BaseModel):
+    """
+    A persistent store of checksums, keyed on (path, size, mtime, inode).
+    """
+
+    path: Path
+
+    _connection: sqlite3.Connection
+    _lock: threading.Lock
+
+    def model_post_init(self, __context):
+        self.path = self.path.expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # The async client hashes in worker threads; access is serialized
+        # with the lock.
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS hashes "
+            "(path PRIMARY KEY, size, mtime, inode, checksum)"
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def key(path: Path) -> tuple[str, int, int, int]:
+        """
+        The (path, size, mtime, inode) that a file's checksum is stored under.
+        """
+
+        stat = path.stat()
+        return str(path.resolve()), stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+    def get(self, path: Path) -> str | None:
+        """
+        Get the stored checksum for a file, or None if we have never seen it
+        or it has changed since it was hashed.
+        """
+
+        key = self.key(path)
+
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute(
+                "SELECT checksum FROM hashes WHERE path = ? AND size = ? AND mtime = ? AND inode = ?",
+                key,
+            )
+
+            result = cursor.fetchone()
+
+        return None if result is None else result[0]
+
+    def set(self, key: tuple[str, int, int, int], checksum: str):
+        """
+        Store the checksum for a file under its ``key``, which must be taken
+        before the file is hashed. A file changed while it was being hashed
+        then no longer matches the stored key, rather than the old checksum
+        being stored against the new file.
+        """
+
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute(
+                "INSERT OR REPLACE INTO hashes (path, size, mtime, inode, checksum) VALUES (?, ?, ?, ?, ?)",
+                (*key, checksum),
+            )
+            self._connection.commit()
+
+
+class Hasher(BaseModel):
+    """
+    Computes checksums for sets of sources, using a process pool and
+    (optionally) a persistent hash cache. Configure it through
+    ``ClientSettings`` (``hash_workers``, ``hash_cache``) and get one with
+    ``ClientSettings.hasher``.
+    """
+
+    workers: int = 4
+    "The maximum number of files hashed at once"
+    cache: HashCache | None = None
+    "The persistent hash cache; if None, every file is always re-hashed"
+
+    _executor: ProcessPoolExecutor | None = PrivateAttr(default=None)
+    _executor_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """
+        The process pool shared by every call to ``checksums``, created when
+        it is first needed.
+        """
+
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=max(min(self.workers, os.cpu_count() or 1), 1)
+                )
+
+            return self._executor
+
+    def checksums(self, paths: list[Path]) -> dict[Path, str]:
+        """
+        Compute the checksums of a set of files.
+
+        Arguments
+        ---------
+        paths : list[Path]
+            The files to checksum.
+
+        Returns
+        -------
+        dict[Path, str]
+            The checksums, in the form ``xxh64:{hexdigest}``, keyed by path.
+        """
+
+        paths = [Path(x) for x in paths]
+        checksums = {}
+        missing = []
+        keys = {}
+
+        for path in paths:
+            if self.cache is None:
+                missing.append(path)
+                continue
+
+            keys[path] = self.cache.key(path)
+            cached = self.cache.get(path)
+
+            if cached is None:
+                missing.append(path)
+            else:
+                checksums[path] = cached
+
+        if len(missing) > 1 and self.workers > 1:
+            computed = dict(zip(missing, self.executor.map(xxh64_file, missing)))
+        else:
+            computed = {path: xxh64_file(path) for path in missing}
+
+        for path, checksum in computed.items():
+            if self.cache is not None:
+                self.cache.set(keys[path], checksum)
+
+            checksums[path] = checksum
+
+        return checksums
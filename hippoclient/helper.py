@@ -2,14 +2,20 @@
 Helpers for rendering cli elements.
 """
 
+from typing import TYPE_CHECKING
+
 import rich
 
-from hippoclient.caching import MultiCache
-from hipposerve.api.models.relationships import (
+from hippoclient.caching import CacheStats, MultiCache
+from hipposerve.wire import (
+    FileMetadata,
+    ProductMetadata,
     ReadCollectionProductResponse,
     ReadCollectionResponse,
 )
-from hipposerve.database import FileMetadata, ProductMetadata
+
+if TYPE_CHECKING:
+    from hipposerve.database.indexes import QueryAudit
 
 
 def render_version_list(
@@ -103,7 +109,7 @@ def render_source_list(
     for slug, source in input.items():
         if cache is not None:
             try:
-                cache.available(source.uuid)
+                cache.available(source.uuid, touch=False)
                 cached = "Yes"
             except FileNotFoundError:
                 cached = "No"
@@ -120,3 +126,59 @@ def render_source_list(
         )
 
     return table
+
+
+def render_cache_stats(input: list[CacheStats]) -> rich.table.Table:
+    """
+    Render the usage statistics of a list of caches into a rich table.
+    """
+
+    table = rich.table.Table(
+        "Path",
+        "Sources",
+        "Pinned",
+        "Size [B]",
+        "Quota [B]",
+        "Hit Rate",
+        "Evictions",
+        "Evicted [B]",
+        title="Caches",
+    )
+
+    for stats in input:
+        table.add_row(
+            str(stats.path),
+            str(stats.entries),
+            str(stats.pinned),
+            str(stats.bytes),
+            str(stats.quota) if stats.quota is not None else "None",
+            f"{stats.hit_rate:.1%}" if stats.hit_rate is not None else "-",
+            str(stats.evictions),
+            str(stats.evicted_bytes),
+        )
+
+    return table
+
+
+def render_index_audit(input: list["QueryAudit"]) -> rich.table.Table:
+    """
+    Render the results of an index audit into a rich table.
+    """
+
+    table = rich.table.Table(
+        "Query", "Collection", "Covered", "Indexes", title="Index Audit"
+    )
+
+    for result in input:
+        if not result.covered:
+            covered = "[red]no[/red]"
+        elif result.in_memory_sort:
+            covered = "[yellow]in-memory sort[/yellow]"
+        else:
+            covered = "[green]yes[/green]"
+
+        table.add_row(
+            result.name, result.collection, covered, ", ".join(result.indexes)
+        )
+
+    return table
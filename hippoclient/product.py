@@ -2,103 +2,91 @@
 Methods for interacting with the product layer of the hippo API.
 """
 
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from itertools import islice
 from pathlib import Path
+from typing import Iterator
 
-import xxhash
 from httpx import Client, Response
 from rich.console import Console
 from tqdm import tqdm
 
 from hippometa import ALL_METADATA_TYPE
 from hippometa.simple import SimpleMetadata
-from hipposerve.api.models.product import ReadProductResponse
-from hipposerve.database import ProductMetadata
-from hipposerve.service.product import PostUploadFile, PreUploadFile
+from hipposerve.wire import (
+    MetadataPredicate,
+    MultipartUpload,
+    PostUploadFile,
+    PreUploadFile,
+    ProductMetadata,
+    ProductQuery,
+    ReadPartsResponse,
+    ReadProductResponse,
+    ResumeProductResponse,
+    SearchProductsResponse,
+    UploadedPart,
+)
 
 from .core import MultiCache
+from .hashing import Hasher
+from .uploading import Uploader, UploadFailedError
 
-MULTIPART_UPLOAD_SIZE = 50 * 1024 * 1024
+PAGE_SIZE = 100
+"The number of results (e.g. search results) requested from the API at a time."
 
 
-def __upload_sources(
-    initial_response: Response,
+def _upload_parts(
     client: Client,
-    sources: dict[str, PreUploadFile],
+    sources: dict[str, Path],
     this_product_id: str,
+    upload_urls: dict[str, list[str] | dict[int, str]],
+    uploads: dict[str, MultipartUpload],
+    uploader: Uploader | None = None,
     console: Console | None = None,
+    uploaded: dict[str, list[UploadedPart]] | None = None,
 ) -> dict[str, list[dict[str, str]]]:
-    responses = {}
-    sizes = {}
-
-    # Upload the sources to the presigned URLs.
-    for source in sources.values():
-        with source.open("rb") as file:
-            if console:
-                console.print("Uploading file:", source.name)
-
-            upload_urls = initial_response.json()["upload_urls"][source.name]
-            headers = []
-            size = []
-
-            # We need to handle our own redirects because otherwise the head of the file will be incorrect,
-            # and we will end up with Content-Length errors.
-
-            with tqdm(
-                desc="Uploading",
-                total=source.stat().st_size,
-                unit="B",
-                unit_scale=True,
-                unit_divisor=1024,
-            ) as t:
-                file_position = 0
-
-                for upload_url in upload_urls:
-                    retry = True
-
-                    while retry:
-                        file.seek(file_position)
-
-                        data = file.read(MULTIPART_UPLOAD_SIZE)
-
-                        individual_response = client.put(
-                            upload_url.strip(),
-                            content=data,
-                            follow_redirects=True,
-                            auth=None,
-                            # Blocks are 50 MB so may timeout on slow connections
-                            # (httpx defaults to 5 seconds)
-                            timeout=120.0,
-                        )
-
-                        if individual_response.status_code in [301, 302, 307, 308]:
-                            if console:
-                                console.print(
-                                    f"Redirected to {individual_response.headers['Location']} from {upload_url}"
-                                )
-                            upload_url = individual_response.headers["Location"]
+    uploader = uploader or Uploader()
+    slugs = {Path(path).name: slug for slug, path in sources.items()}
+
+    def fetch_urls(name: str, start: int, count: int) -> list[str]:
+        # Large sources only come with the first page of part URLs.
+        response = client.get(
+            f"/product/{this_product_id}/parts",
+            params={"slug": slugs[name], "from": start, "count": count},
+        )
 
-                            continue
-                        else:
-                            retry = False
-                            individual_response.raise_for_status()
-                            break
+        response.raise_for_status()
 
-                    headers.append(dict(individual_response.headers))
-                    size.append(len(data))
+        return ReadPartsResponse.model_validate(response.json()).urls
 
-                    file_position += MULTIPART_UPLOAD_SIZE
-                    t.update(len(data))
+    # Upload the sources to the presigned URLs, concurrently.
+    try:
+        headers, sizes = uploader.upload(
+            client=client,
+            sources=list(sources.values()),
+            upload_urls=upload_urls,
+            console=console,
+            uploads=uploads,
+            fetch_urls=fetch_urls,
+            uploaded=uploaded,
+        )
+    except UploadFailedError as e:
+        e.product_id = this_product_id
 
-            responses[source.name] = headers
-            sizes[source.name] = size
+        if console:
+            console.print(
+                f"Upload of product {this_product_id} failed; resume it with "
+                "hippoclient.product.resume.",
+                style="bold red",
+            )
 
-            if console:
-                console.print("Successfully uploaded file:", source.name)
+        raise
 
     # Close out the upload.
     response = client.post(
         f"/product/{this_product_id}/complete",
-        json={"headers": responses, "sizes": sizes},
+        json={"headers": headers, "sizes": sizes},
     )
 
     response.raise_for_status()
@@ -106,6 +94,107 @@ def __upload_sources(
     return response.json()
 
 
+def _upload_sources(
+    initial_response: Response,
+    client: Client,
+    sources: dict[str, PreUploadFile],
+    this_product_id: str,
+    uploader: Uploader | None = None,
+    console: Console | None = None,
+) -> dict[str, list[dict[str, str]]]:
+    initial = initial_response.json()
+
+    return _upload_parts(
+        client=client,
+        sources=sources,
+        this_product_id=this_product_id,
+        upload_urls=initial["upload_urls"],
+        uploads={
+            x: MultipartUpload.model_validate(y)
+            for x, y in initial.get("uploads", {}).items()
+        },
+        uploader=uploader,
+        console=console,
+    )
+
+
+def _resume_sources(
+    resumed: ResumeProductResponse,
+    sources: dict[str, Path],
+    hasher: Hasher | None = None,
+) -> dict[str, Path]:
+    """
+    Match the sources that are still being uploaded to their local files,
+    keyed by slug. The files must have the size and checksum that were given
+    when the upload started, so that their parts fit with those already
+    stored.
+
+    Raises
+    ------
+    ValueError
+        If a source is missing, or its local file does not match the upload.
+    """
+
+    matched = {}
+
+    for name, upload in resumed.uploads.items():
+        path = sources.get(upload.slug)
+
+        if path is None:
+            raise ValueError(f"No local file given for source {upload.slug}")
+
+        path = Path(path)
+
+        if path.name != name:
+            raise ValueError(
+                f"Source {upload.slug} is being uploaded from {name}, not {path.name}"
+            )
+
+        if path.stat().st_size != upload.size:
+            raise ValueError(f"{path} is not the file being uploaded to {upload.slug}")
+
+        matched[upload.slug] = path
+
+    checksums = (hasher or Hasher()).checksums(list(matched.values()))
+
+    for upload in resumed.uploads.values():
+        if checksums[matched[upload.slug]] != upload.checksum:
+            raise ValueError(
+                f"{matched[upload.slug]} has changed since it was being uploaded "
+                f"to {upload.slug}"
+            )
+
+    return matched
+
+
+def _validate_sources(
+    sources: dict[str, Path],
+    source_descriptions: dict[str, str | None],
+    hasher: Hasher | None = None,
+    console: Console | None = None,
+) -> dict[str, dict]:
+    hasher = hasher or Hasher()
+
+    # Hash all sources at once; unchanged files are served from the hash cache.
+    checksums = hasher.checksums(list(sources.values()))
+
+    source_metadata = {}
+
+    for slug, filename in sources.items():
+        file_info = {
+            "name": filename.name,
+            "size": filename.stat().st_size,
+            "checksum": checksums[filename],
+            "description": source_descriptions[slug],
+        }
+        source_metadata[slug] = file_info
+
+        if console:
+            console.print("Successfully validated file:", file_info)
+
+    return source_metadata
+
+
 def create(
     client: Client,
     name: str,
@@ -115,6 +204,8 @@ def create(
     source_descriptions: dict[str, str | None],
     readers: list[str] | None = None,
     writers: list[str] | None = None,
+    uploader: Uploader | None = None,
+    hasher: Hasher | None = None,
     console: Console | None = None,
 ) -> str:
     """
@@ -145,6 +236,12 @@ def create(
         A list of groups that can read the product.
     writers : list[str] | None, optional
         A list of groups that can write to the product.
+    uploader : Uploader, optional
+        The (concurrent) uploader to push the sources with. Defaults to an
+        ``Uploader`` with default settings.
+    hasher : Hasher, optional
+        The hasher used to checksum the sources. Defaults to a ``Hasher`` with
+        default settings and no persistent hash cache.
     console : Console, optional
         The rich console to print to.
 
@@ -165,22 +262,12 @@ def create(
     # Co-erce sources to paths as they will inevitably be strings...
     sources = {x: Path(y) for x, y in sources.items()}
 
-    source_metadata = {}
-
-    for slug in sources:
-        filename = sources[slug]
-        desc = source_descriptions[slug]
-
-        with filename.open("rb") as file:
-            file_info = {
-                "name": filename.name,
-                "size": filename.stat().st_size,
-                "checksum": f"xxh64:{xxhash.xxh64(file.read()).hexdigest()}",
-                "description": desc,
-            }
-            source_metadata[slug] = file_info
-            if console:
-                console.print("Successfully validated file:", file_info)
+    source_metadata = _validate_sources(
+        sources=sources,
+        source_descriptions=source_descriptions,
+        hasher=hasher,
+        console=console,
+    )
 
     # Make a request to hippo to create the product.
     if metadata is None:
@@ -191,7 +278,8 @@ def create(
         "description": description,
         "metadata": metadata.model_dump(mode="json"),
         "sources": source_metadata,
-        "mutlipart_batch_size": MULTIPART_UPLOAD_SIZE,
+        "multipart_batch_size": (uploader or Uploader()).part_size,
+        "part_url_limit": (uploader or Uploader()).url_page_size,
     }
 
     if readers is not None:
@@ -205,11 +293,12 @@ def create(
 
     this_product_id = response.json()["id"]
 
-    __upload_sources(
+    _upload_sources(
         initial_response=response,
         client=client,
         sources=sources,
         this_product_id=this_product_id,
+        uploader=uploader,
         console=console,
     )
 
@@ -320,6 +409,8 @@ def update(
     remove_readers: list[str] | None = None,
     add_writers: list[str] | None = None,
     remove_writers: list[str] | None = None,
+    uploader: Uploader | None = None,
+    hasher: Hasher | None = None,
     console: Console | None = None,
 ) -> str:
     """
@@ -349,6 +440,12 @@ def update(
         A list of descriptions for the sources to replace keyed by their slug.
     drop_sources : list[str]
         A list of source IDs to delete from a product.
+    uploader : Uploader, optional
+        The (concurrent) uploader to push the sources with. Defaults to an
+        ``Uploader`` with default settings.
+    hasher : Hasher, optional
+        The hasher used to checksum the sources. Defaults to a ``Hasher`` with
+        default settings and no persistent hash cache.
     console : Console, optional
         The rich console to print to.
 
@@ -363,38 +460,19 @@ def update(
         If a request to the API fails
     """
 
-    new_source_metadata = {}
-
-    for slug in (new_sources or {}).keys():
-        filename = new_sources[slug]
-        desc = new_source_descriptions[slug]
-
-        with filename.open("rb") as file:
-            file_info = {
-                "name": filename.name,
-                "size": filename.stat().st_size,
-                "checksum": f"xxh64:{xxhash.xxh64(file.read()).hexdigest()}",
-                "description": desc,
-            }
-            new_source_metadata[slug] = file_info
-            if console:
-                console.print("Successfully validated file:", file_info)
-
-    replace_source_metadata = {}
-    for slug in (replace_sources or {}).keys():
-        filename = replace_sources[slug]
-        desc = replace_source_descriptions[slug]
-
-        with filename.open("rb") as file:
-            file_info = {
-                "name": filename.name,
-                "size": filename.stat().st_size,
-                "checksum": f"xxh64:{xxhash.xxh64(file.read()).hexdigest()}",
-                "description": desc,
-            }
-            replace_source_metadata[slug] = file_info
-            if console:
-                console.print("Successfully validated file:", file_info)
+    new_source_metadata = _validate_sources(
+        sources={x: Path(y) for x, y in (new_sources or {}).items()},
+        source_descriptions=new_source_descriptions or {},
+        hasher=hasher,
+        console=console,
+    )
+
+    replace_source_metadata = _validate_sources(
+        sources={x: Path(y) for x, y in (replace_sources or {}).items()},
+        source_descriptions=replace_source_descriptions or {},
+        hasher=hasher,
+        console=console,
+    )
 
     response = client.post(
         f"/product/{id}/update",
@@ -410,6 +488,7 @@ def update(
             "remove_readers": remove_readers or [],
             "add_writers": add_writers or [],
             "remove_writers": remove_writers or [],
+            "part_url_limit": (uploader or Uploader()).url_page_size,
         },
     )
 
@@ -417,11 +496,12 @@ def update(
 
     this_product_id = response.json()["id"]
 
-    __upload_sources(
+    _upload_sources(
         initial_response=response,
         client=client,
         sources={**(new_sources or {}), **(replace_sources or {})},
         this_product_id=this_product_id,
+        uploader=uploader,
         console=console,
     )
 
@@ -431,6 +511,95 @@ def update(
     return this_product_id
 
 
+def resume(
+    client: Client,
+    id: str,
+    sources: dict[str, Path],
+    uploader: Uploader | None = None,
+    hasher: Hasher | None = None,
+    console: Console | None = None,
+) -> str:
+    """
+    Resume the interrupted upload of a product's sources, e.g. after
+    ``create`` or ``update`` failed part of the way through.
+
+    hippo lists the parts that the storage server already holds for each
+    source that is still being uploaded; only the missing parts are uploaded,
+    and the existing parts are re-used when the upload is completed.
+
+    Arguments
+    ---------
+    client: Client
+        The client to use for interacting with the hippo API.
+    id : str
+        The ID of the product whose upload was interrupted (as returned by
+        the create or update request).
+    sources : dict[str, Path]
+        The paths to the sources of the product keyed by their slug. Sources
+        that have already been uploaded in full may be left out.
+    uploader : Uploader, optional
+        The (concurrent) uploader to push the sources with. Defaults to an
+        ``Uploader`` with default settings.
+    hasher : Hasher, optional
+        The hasher used to check that the sources have not changed. Defaults
+        to a ``Hasher`` with default settings and no persistent hash cache.
+    console : Console, optional
+        The rich console to print to.
+
+    Returns
+    -------
+    str
+        The ID of the product.
+
+    Raises
+    ------
+    ValueError
+        If a source that is still being uploaded is not given, or does not
+        match its local file.
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    uploader = uploader or Uploader()
+
+    response = client.get(
+        f"/product/{id}/resume", params={"count": uploader.url_page_size}
+    )
+
+    response.raise_for_status()
+
+    resumed = ResumeProductResponse.model_validate(response.json())
+    sources = _resume_sources(resumed=resumed, sources=sources, hasher=hasher)
+
+    if console:
+        for name, upload in resumed.uploads.items():
+            console.print(
+                f"Resuming {name}: {len(upload.parts)} of {upload.number_of_parts} "
+                "parts already uploaded."
+            )
+
+    _upload_parts(
+        client=client,
+        sources=sources,
+        this_product_id=id,
+        upload_urls={x: y.upload_urls for x, y in resumed.uploads.items()},
+        uploads={
+            x: MultipartUpload(part_size=y.part_size, number_of_parts=y.number_of_parts)
+            for x, y in resumed.uploads.items()
+        },
+        uploader=uploader,
+        console=console,
+        uploaded={x: y.parts for x, y in resumed.uploads.items()},
+    )
+
+    if console:
+        console.print(
+            f"Successfully resumed upload of product {id}.", style="bold green"
+        )
+
+    return id
+
+
 def delete(client: Client, id: str, console: Console | None = None) -> bool:
     """
     Delete a product from hippo.
@@ -460,8 +629,55 @@ def delete(client: Client, id: str, console: Console | None = None) -> bool:
     return True
 
 
+def iterate_search(
+    client: Client, text: str, page_size: int = PAGE_SIZE
+) -> Iterator[ProductMetadata]:
+    """
+    Search for text information in products (primarily names), reading the
+    results from the API a page at a time as they are consumed.
+
+    Arguments
+    ----------
+    client: Client
+        The client to use for interacting with the hippo API.
+    text : str
+        The text to search for.
+    page_size : int, optional
+        The number of results to request at a time.
+
+    Yields
+    ------
+    ProductMetadata
+        The products that match the search query, best matches first.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    params = {"limit": page_size}
+
+    while True:
+        response = client.get(f"/product/search/{text}", params=params)
+
+        response.raise_for_status()
+
+        page = SearchProductsResponse.model_validate(response.json())
+
+        yield from page.results
+
+        if page.next_cursor is None:
+            return
+
+        params["cursor"] = page.next_cursor
+
+
 def search(
-    client: Client, text: str, console: Console | None = None
+    client: Client,
+    text: str,
+    console: Console | None = None,
+    limit: int | None = None,
 ) -> list[ProductMetadata]:
     """
     Search for text information in products (primarily names).
@@ -474,6 +690,9 @@ def search(
         The text to search for.
     console : Console, optional
         The rich console to print to.
+    limit : int, optional
+        The maximum number of products to return. By default, all matches are
+        returned; see ``iterate_search`` to read them lazily.
 
     Returns
     -------
@@ -486,20 +705,126 @@ def search(
         If a request to the API fails
     """
 
-    response = client.get(f"/product/search/{text}")
+    page_size = PAGE_SIZE if limit is None else min(limit, PAGE_SIZE)
+    models = list(islice(iterate_search(client, text, page_size=page_size), limit))
 
-    response.raise_for_status()
+    if console:
+        console.print(f"Successfully searched for products matching {text}")
+
+    return models
+
+
+def iterate_query(
+    client: Client,
+    metadata_type: str,
+    predicates: dict[str, MetadataPredicate] | None = None,
+    page_size: int = PAGE_SIZE,
+) -> Iterator[ProductMetadata]:
+    """
+    Query for products by their metadata, reading the results from the API a
+    page at a time as they are consumed.
+
+    Arguments
+    ----------
+    client: Client
+        The client to use for interacting with the hippo API.
+    metadata_type : str
+        The type of metadata to query, e.g. ``"mapset"``.
+    predicates : dict[str, MetadataPredicate], optional
+        The predicates (e.g. ``PrefixPredicate(prefix="f09")``) that the
+        metadata fields must match, keyed by field name. By default, all
+        products with this type of metadata match.
+    page_size : int, optional
+        The number of results to request at a time.
+
+    Yields
+    ------
+    ProductMetadata
+        The current products that match all of the predicates.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails, including if the query does not match
+        the fields of the metadata type (400).
+    """
+
+    body = ProductQuery(
+        metadata_type=metadata_type, predicates=predicates or {}
+    ).model_dump(mode="json")
+    params = {"limit": page_size}
+
+    while True:
+        response = client.post("/product/query", json=body, params=params)
+
+        response.raise_for_status()
+
+        page = SearchProductsResponse.model_validate(response.json())
+
+        yield from page.results
+
+        if page.next_cursor is None:
+            return
+
+        params["cursor"] = page.next_cursor
+
+
+def query(
+    client: Client,
+    metadata_type: str,
+    predicates: dict[str, MetadataPredicate] | None = None,
+    console: Console | None = None,
+    limit: int | None = None,
+) -> list[ProductMetadata]:
+    """
+    Query for products by their metadata.
+
+    Arguments
+    ----------
+    client: Client
+        The client to use for interacting with the hippo API.
+    metadata_type : str
+        The type of metadata to query, e.g. ``"mapset"``.
+    predicates : dict[str, MetadataPredicate], optional
+        The predicates that the metadata fields must match, keyed by field
+        name. See ``iterate_query``.
+    console : Console, optional
+        The rich console to print to.
+    limit : int, optional
+        The maximum number of products to return. By default, all matches are
+        returned; see ``iterate_query`` to read them lazily.
+
+    Returns
+    -------
+    list[ProductMetadata]
+        The list of products that match the query.
 
-    models = [ProductMetadata.model_validate(x) for x in response.json()]
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    page_size = PAGE_SIZE if limit is None else min(limit, PAGE_SIZE)
+    models = list(
+        islice(
+            iterate_query(client, metadata_type, predicates, page_size=page_size),
+            limit,
+        )
+    )
 
     if console:
-        console.print(f"Successfully searched for products matching {text}")
+        console.print(f"Successfully queried for {metadata_type} products")
 
     return models
 
 
 def cache(
-    client: Client, cache: MultiCache, id: str, console: Console | None = None
+    client: Client,
+    cache: MultiCache,
+    id: str,
+    console: Console | None = None,
+    workers: int = 4,
 ) -> list[Path]:
     """
     Cache a product from hippo.
@@ -514,6 +839,8 @@ def cache(
         The ID of the product to cache.
     console : Console, optional
         The rich console to print to.
+    workers : int
+        The maximum number of sources fetched at once.
 
     Returns
     -------
@@ -528,37 +855,84 @@ def cache(
         If the cache is not writeable
     """
 
-    response = client.get(f"/product/{id}/files")
+    return cache_many(
+        client=client, cache=cache, ids=[id], console=console, workers=workers
+    )[id]
 
-    response.raise_for_status()
 
-    post_upload_files = {
-        x: PostUploadFile.model_validate(y) for x, y in response.json()["files"].items()
-    }
+def cache_many(
+    client: Client,
+    cache: MultiCache,
+    ids: list[str],
+    console: Console | None = None,
+    workers: int = 4,
+) -> dict[str, list[Path]]:
+    """
+    Cache many products from hippo at once. This is a pipeline:
 
-    if console:
-        console.print(f"Successfully read product {id}")
+    a) The source lists of up to ``workers`` products are requested at once.
+    b) As each list arrives, all of its sources are checked against the cache
+       in one batched lookup.
+    c) Sources that are not cached are queued for download immediately, so
+       downloads overlap with the remaining requests. Up to ``workers``
+       sources are downloaded at once, and a source shared between products
+       is only downloaded once.
 
-    response_paths = []
+    Progress (in bytes, across all products) is shown as a single bar.
 
-    for file in post_upload_files.values():
-        # See if it's already cached.
-        try:
-            cached = cache.available(file.uuid)
-            response_paths.append(cached)
+    Arguments
+    ----------
+    client: Client
+        The client to use for interacting with the hippo API.
+    cache: MultiCache
+        The cache to use for storing the products.
+    ids : list[str]
+        The IDs of the products to cache.
+    console : Console, optional
+        The rich console to print to.
+    workers : int
+        The maximum number of requests, and of downloads, in flight at once.
+
+    Returns
+    -------
+    dict[str, list[Path]]
+        The paths to the cached sources of each product, keyed by product ID.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    CacheNotWriteableError
+        If the cache is not writeable
+    """
+
+    ids = list(dict.fromkeys(str(x) for x in ids))
+    workers = max(workers, 1)
+
+    # SQLite connections are per-thread, so each download worker gets its
+    # own clone of the caches.
+    local = threading.local()
+
+    def thread_cache() -> MultiCache:
+        if not hasattr(local, "cache"):
+            local.cache = cache.clone()
 
-            if console:
-                console.print(f"Found cached file {file.name}", style="green")
+        return local.cache
 
-            continue
-        except FileNotFoundError:
-            if console:
-                console.print(
-                    f"File {file.name} ({file.uuid}) not found in cache", style="red"
-                )
-            cached = None
+    def read_files(id: str) -> list[PostUploadFile]:
+        response = client.get(f"/product/{id}/files")
 
-        cached = cache.get(
+        response.raise_for_status()
+
+        if console:
+            console.print(f"Successfully read product {id}")
+
+        return [
+            PostUploadFile.model_validate(y) for y in response.json()["files"].values()
+        ]
+
+    def fetch(file: PostUploadFile) -> Path:
+        cached = thread_cache().get(
             id=file.uuid,
             path=file.object_name,
             checksum=file.checksum,
@@ -566,12 +940,79 @@ def cache(
             presigned_url=file.url,
         )
 
-        response_paths.append(cached)
-
         if console:
             console.print(f"Cached file {file.name} ({file.uuid})", style="yellow")
 
-    return response_paths
+        return cached
+
+    product_sources: dict[str, list[str]] = {}
+    paths: dict[str, Path] = {}
+    downloads: dict[str, Future] = {}
+
+    progress_lock = threading.Lock()
+
+    with (
+        tqdm(
+            desc="Caching", total=0, unit="B", unit_scale=True, unit_divisor=1024
+        ) as progress,
+        ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="hippo-read"
+        ) as readers,
+        ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="hippo-cache"
+        ) as fetchers,
+    ):
+
+        def advance(size: int):
+            with progress_lock:
+                progress.update(size)
+
+        try:
+            reads = {readers.submit(read_files, id): id for id in ids}
+
+            for future in as_completed(reads):
+                files = future.result()
+                product_sources[reads[future]] = [x.uuid for x in files]
+
+                new = [
+                    x for x in files if x.uuid not in paths and x.uuid not in downloads
+                ]
+                found = cache.available_many([x.uuid for x in new])
+                paths.update(found)
+
+                with progress_lock:
+                    progress.total += sum(x.size for x in new)
+                    progress.refresh()
+
+                for file in new:
+                    if file.uuid in found:
+                        if console:
+                            console.print(
+                                f"Found cached file {file.name}", style="green"
+                            )
+
+                        advance(file.size)
+                    else:
+                        downloads[file.uuid] = fetchers.submit(fetch, file)
+                        # Only count the bytes that actually made it in.
+                        downloads[file.uuid].add_done_callback(
+                            lambda future, size=file.size: (
+                                not future.cancelled()
+                                and future.exception() is None
+                                and advance(size)
+                            )
+                        )
+
+            for uuid, download in downloads.items():
+                paths[uuid] = download.result()
+        except BaseException:
+            # Don't start anything new; let in-flight downloads finish so
+            # their leases are released.
+            readers.shutdown(cancel_futures=True)
+            fetchers.shutdown(cancel_futures=True)
+            raise
+
+    return {id: [paths[x] for x in product_sources[id]] for id in ids}
 
 
 def uncache(
@@ -0,0 +1,426 @@
+"""
+The upload engine for sources pushed by the hippo client.
+
+Sources are uploaded to hippo as S3 multipart uploads, with one pre-signed
+URL per part. hippo chooses the part size (growing the requested size for
+very large sources) and may only hand out the first parts' URLs up front; the
+rest are read a page at a time, as they are needed, from
+``/product/{id}/parts``. Parts are independent of one another, so we upload
+many of them at once:
+
+a) Each file is split into ``lanes``. A lane is a worker that pulls the next
+   un-uploaded part of its file, PUTs it, and repeats until the file is done.
+   The number of lanes per file is ``workers_per_file``.
+b) All lanes, for all files, share a single thread pool of size ``workers``,
+   which bounds the total number of parts (and hence memory; each in-flight
+   part is held in RAM) across files. Uploads running at once with the same
+   ``Uploader`` (e.g. the products of a collection pushed by the async
+   client) share that bound too.
+c) Failed parts are retried on their own with exponential backoff.
+
+The ETag headers and sizes are collected in part order, ready for the
+``/product/{id}/complete`` call. An interrupted upload can be resumed by
+passing the parts that the storage server already holds (from
+``/product/{id}/resume``); those are skipped, and their ETags are re-used.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+from pathlib import Path
+from typing import Callable
+
+import httpx
+from pydantic import BaseModel, PrivateAttr
+from rich.console import Console
+from tqdm import tqdm
+
+from hipposerve.wire import MultipartUpload, UploadedPart
+
+MULTIPART_UPLOAD_SIZE = 50 * 1024 * 1024
+
+# Status codes that indicate the storage server may succeed if we try again.
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class UploadFailedError(Exception):
+    """
+    Raised when a part could not be uploaded after all retries. When raised
+    while uploading a product's sources, ``product_id`` is the product, whose
+    upload can then be resumed with ``hippoclient.product.resume``.
+    """
+
+    def __init__(self, name: str, part: int, reason: Exception):
+        self.name = name
+        self.part = part
+        self.reason = reason
+        self.product_id: str | None = None
+        super().__init__(f"Failed to upload part {part + 1} of {name}: {reason}")
+
+
+class FileUpload:
+    """
+    The state of a single file being uploaded. Shared between the lanes of
+    that file; ``next_part`` hands out part indices under a lock.
+
+    ``upload_urls`` is either a list of URLs for the first parts, or the URLs
+    keyed by (zero-based) part. The URLs for any other parts are read with
+    ``fetch_urls(start, count)`` when they are first needed. Parts that are
+    already ``uploaded`` are skipped.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        upload_urls: list[str] | dict[int, str],
+        part_size: int,
+        number_of_parts: int | None = None,
+        fetch_urls: Callable[[int, int], list[str]] | None = None,
+        url_page_size: int = 100,
+        uploaded: list[UploadedPart] | None = None,
+    ):
+        self.path = path
+        self.name = path.name
+        self.size = path.stat().st_size
+        self.upload_urls = (
+            dict(upload_urls)
+            if isinstance(upload_urls, dict)
+            else dict(enumerate(upload_urls))
+        )
+        self.part_size = part_size
+        self.number_of_parts = (
+            len(upload_urls) if number_of_parts is None else number_of_parts
+        )
+        self.fetch_urls = fetch_urls
+        self.url_page_size = url_page_size
+
+        self.headers: list[dict[str, str] | None] = [None] * self.number_of_parts
+        self.sizes: list[int | None] = [None] * self.number_of_parts
+        self.uploaded_size = 0
+
+        for part in uploaded or []:
+            self.headers[part.part] = {"etag": part.etag}
+            self.sizes[part.part] = part.size
+            self.uploaded_size += part.size
+
+        self._lock = threading.Lock()
+        self._urls_lock = threading.Lock()
+        self._next = 0
+        self._remaining = self.sizes.count(None)
+
+    def upload_url(self, part: int) -> str:
+        """
+        The URL to upload a part to, reading the next pages of URLs if needed.
+        """
+
+        with self._urls_lock:
+            if part not in self.upload_urls and self.fetch_urls is not None:
+                # Lanes can get here out of order, so start the page at the
+                # first earlier part still waiting for its URL.
+                start = next(
+                    x
+                    for x in range(part + 1)
+                    if x not in self.upload_urls and self.sizes[x] is None
+                )
+                urls = self.fetch_urls(start, self.url_page_size)
+
+                for i, url in enumerate(urls):
+                    self.upload_urls.setdefault(start + i, url)
+
+            if part not in self.upload_urls:
+                raise ValueError(f"No upload URL for part {part + 1} of {self.name}")
+
+            return self.upload_urls[part]
+
+    def next_part(self) -> int | None:
+        with self._lock:
+            # Skip over the parts that were uploaded before resuming.
+            while (
+                self._next < self.number_of_parts and self.sizes[self._next] is not None
+            ):
+                self._next += 1
+
+            if self._next >= self.number_of_parts:
+                return None
+
+            part = self._next
+            self._next += 1
+
+            return part
+
+    def part_done(self, part: int, headers: dict[str, str], size: int) -> bool:
+        """
+        Record a completed part. Returns True if this was the final part.
+        """
+
+        with self._lock:
+            self.headers[part] = headers
+            self.sizes[part] = size
+            self._remaining -= 1
+
+            return self._remaining == 0
+
+
+class Uploader(BaseModel):
+    """
+    Concurrent multipart uploader. Configure it through ``ClientSettings``
+    (``upload_workers``, ``upload_workers_per_file``, ``upload_retries``) and
+    get one with ``ClientSettings.uploader``.
+    """
+
+    workers: int = 4
+    "The maximum number of parts in flight at once, across all files"
+    workers_per_file: int = 4
+    "The maximum number of parts of a single file in flight at once"
+    retries: int = 3
+    "The number of times a failed part is retried before giving up"
+    backoff: float = 1.0
+    "The initial delay between retries in seconds; doubles with each attempt"
+    part_size: int = MULTIPART_UPLOAD_SIZE
+    "The size of each part in bytes to request; hippo may choose larger parts"
+    url_page_size: int = 100
+    "The number of part URLs to read from hippo at a time"
+    timeout: float = 120.0
+    "Timeout for a single part PUT in seconds (parts are large)"
+
+    _in_flight: threading.BoundedSemaphore = PrivateAttr()
+
+    def model_post_init(self, __context):
+        # Bounds the parts in flight across every upload made with this
+        # uploader, not just within one call to upload.
+        self._in_flight = threading.BoundedSemaphore(max(self.workers, 1))
+
+    def _put_part(
+        self,
+        client: httpx.Client,
+        upload_url: str,
+        data: bytes,
+        console: Console | None = None,
+    ) -> httpx.Response:
+        # We need to handle our own redirects because otherwise the head of the
+        # file will be incorrect, and we will end up with Content-Length errors.
+        while True:
+            response = client.put(
+                upload_url.strip(),
+                content=data,
+                follow_redirects=True,
+                auth=None,
+                timeout=self.timeout,
+            )
+
+            if response.status_code in [301, 302, 307, 308]:
+                if console:
+                    console.print(
+                        f"Redirected to {response.headers['Location']} from {upload_url}"
+                    )
+                upload_url = response.headers["Location"]
+
+                continue
+
+            response.raise_for_status()
+
+            return response
+
+    def _upload_part(
+        self,
+        client: httpx.Client,
+        file: FileUpload,
+        handle,
+        part: int,
+        console: Console | None = None,
+    ) -> tuple[dict[str, str], int]:
+        handle.seek(part * file.part_size)
+        data = handle.read(file.part_size)
+
+        attempt = 0
+
+        while True:
+            try:
+                response = self._put_part(
+                    client=client,
+                    upload_url=file.upload_url(part),
+                    data=data,
+                    console=console,
+                )
+
+                return dict(response.headers), len(data)
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retryable = isinstance(e, httpx.TransportError) or (
+                    e.response.status_code in RETRYABLE_STATUS_CODES
+                )
+
+                if not retryable or attempt >= self.retries:
+                    raise UploadFailedError(name=file.name, part=part, reason=e)
+
+                delay = self.backoff * (2**attempt)
+                attempt += 1
+
+                if console:
+                    console.print(
+                        f"Retrying part {part + 1} of {file.name} in {delay:.1f}s "
+                        f"(attempt {attempt}/{self.retries}): {e}",
+                        style="yellow",
+                    )
+
+                time.sleep(delay)
+
+    def _lane(
+        self,
+        client: httpx.Client,
+        file: FileUpload,
+        progress: tqdm,
+        progress_lock: threading.Lock,
+        stop: threading.Event,
+        console: Console | None = None,
+    ):
+        with file.path.open("rb") as handle:
+            while not stop.is_set():
+                part = file.next_part()
+
+                if part is None:
+                    return
+
+                with self._in_flight:
+                    headers, size = self._upload_part(
+                        client=client,
+                        file=file,
+                        handle=handle,
+                        part=part,
+                        console=console,
+                    )
+
+                with progress_lock:
+                    progress.update(size)
+
+                if file.part_done(part=part, headers=headers, size=size) and console:
+                    console.print("Successfully uploaded file:", file.name)
+
+    def upload(
+        self,
+        client: httpx.Client,
+        sources: list[Path],
+        upload_urls: dict[str, list[str] | dict[int, str]],
+        console: Console | None = None,
+        uploads: dict[str, MultipartUpload] | None = None,
+        fetch_urls: Callable[[str, int, int], list[str]] | None = None,
+        uploaded: dict[str, list[UploadedPart]] | None = None,
+    ) -> tuple[dict[str, list[dict[str, str]]], dict[str, list[int]]]:
+        """
+        Upload all parts of all sources to their pre-signed URLs.
+
+        Arguments
+        ---------
+        client : Client
+            The client to upload with; it is shared between threads.
+        sources : list[Path]
+            The files to upload.
+        upload_urls : dict[str, list[str] | dict[int, str]]
+            The pre-signed part URLs, keyed by file name (as returned by hippo).
+            Each is a list of URLs for the first parts, or the URLs keyed by
+            (zero-based) part. Need not hold every part's URL, if
+            ``fetch_urls`` is given.
+        console : Console, optional
+            The rich console to print to.
+        uploads : dict[str, MultipartUpload], optional
+            The part size and number of parts chosen by hippo for each file,
+            keyed by file name. By default, there is one part per URL in
+            ``upload_urls``, of ``part_size``.
+        fetch_urls : Callable[[str, int, int], list[str]], optional
+            Reads the URLs for (file name, first part, number of parts) from
+            hippo, for the parts that are not in ``upload_urls``.
+        uploaded : dict[str, list[UploadedPart]], optional
+            The parts of each file, keyed by file name, that the storage server
+            already holds from an interrupted upload. These are not uploaded
+            again, and their ETags are returned with the rest.
+
+        Returns
+        -------
+        headers : dict[str, list[dict[str, str]]]
+            The response headers (including ETags) for each part, in part order,
+            keyed by file name.
+        sizes : dict[str, list[int]]
+            The size of each part, in part order, keyed by file name.
+
+        Raises
+        ------
+        UploadFailedError
+            If any part fails to upload after all retries.
+        """
+
+        uploads = uploads or {}
+        uploaded = uploaded or {}
+        files = []
+
+        for source in sources:
+            name = Path(source).name
+            upload = uploads.get(name)
+
+            files.append(
+                FileUpload(
+                    path=Path(source),
+                    upload_urls=upload_urls[name],
+                    part_size=self.part_size if upload is None else upload.part_size,
+                    number_of_parts=None if upload is None else upload.number_of_parts,
+                    fetch_urls=None
+                    if fetch_urls is None
+                    else partial(fetch_urls, name),
+                    url_page_size=self.url_page_size,
+                    uploaded=uploaded.get(name),
+                )
+            )
+
+        # Interleave lanes across files so that every file makes progress, even
+        # when there are more lanes than workers.
+        lanes_per_file = [
+            min(max(self.workers_per_file, 1), file.number_of_parts) for file in files
+        ]
+        lanes = [
+            file
+            for lane in range(max(lanes_per_file, default=0))
+            for file, count in zip(files, lanes_per_file)
+            if lane < count
+        ]
+
+        if console:
+            for file in files:
+                console.print("Uploading file:", file.name)
+
+        stop = threading.Event()
+        progress_lock = threading.Lock()
+
+        with tqdm(
+            desc="Uploading",
+            total=sum(file.size for file in files),
+            initial=sum(file.uploaded_size for file in files),
+            unit="B",
+            unit_scale=True,
+            unit_divisor=1024,
+        ) as progress:
+            with ThreadPoolExecutor(
+                max_workers=max(self.workers, 1), thread_name_prefix="hippo-upload"
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        self._lane,
+                        client=client,
+                        file=file,
+                        progress=progress,
+                        progress_lock=progress_lock,
+                        stop=stop,
+                        console=console,
+                    )
+                    for file in lanes
+                ]
+
+                done, _ = wait(futures, return_when="FIRST_EXCEPTION")
+
+                for future in done:
+                    if future.exception() is not None:
+                        stop.set()
+                        raise future.exception()
+
+        return (
+            {file.name: file.headers for file in files},
+            {file.name: file.sizes for file in files},
+        )
@@ -10,3 +10,15 @@ from pydantic import BaseModel
 class BaseMetadata(BaseModel):
     metadata_type: str
     valid_slugs: ClassVar[set[str]] = {"data"}
+    # Fields that are commonly queried on. hipposerve creates an index on each
+    # of these, covering only the products that have this type of metadata.
+    indexed_fields: ClassVar[set[str]] = set()
+
+    @classmethod
+    def __pydantic_init_subclass__(cls, **kwargs):
+        super().__pydantic_init_subclass__(**kwargs)
+
+        unknown = cls.indexed_fields - set(cls.model_fields)
+
+        if unknown:
+            raise TypeError(f"{cls.__name__} cannot index unknown fields {unknown}")
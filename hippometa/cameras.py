@@ -18,6 +18,8 @@ class CameraMetadata(BaseMetadata):
     date: datetime
     "The date of the camera videos"
 
+    indexed_fields: ClassVar[set[str]] = {"date"}
+
     valid_slugs: ClassVar[set[str]] = {
         "act_highbay",
         "busbar",
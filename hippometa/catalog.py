@@ -1,4 +1,4 @@
-from typing import Literal
+from typing import ClassVar, Literal
 
 from hippometa.base import BaseMetadata
 
@@ -16,3 +16,5 @@ class CatalogMetadata(BaseMetadata):
     telescope: str | None = None
     instrument: str | None = None
     release: str | None = None
+
+    indexed_fields: ClassVar[set[str]] = {"telescope", "instrument", "release"}
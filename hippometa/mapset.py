@@ -28,6 +28,14 @@ class MapSet(BaseMetadata):
         "file_names",  # The file names of atomic maps or TODs used to create this map
         "data",  # Generic
     }
+    indexed_fields: ClassVar[set[str]] = {
+        "telescope",
+        "instrument",
+        "release",
+        "season",
+        "patch",
+        "frequency",
+    }
 
     pixelisation: Literal["equirectangular", "healpix", "cartesian"]
 
@@ -1,4 +1,4 @@
-from typing import Literal
+from typing import ClassVar, Literal
 
 from pydantic import Field
 
@@ -13,3 +13,5 @@ class NumericMetadata(BaseMetadata):
     metadata_type: Literal["numeric"] = "numeric"
 
     value: float = Field(json_schema_extra=dict(min=-1e100, max=1e100))
+
+    indexed_fields: ClassVar[set[str]] = {"value"}
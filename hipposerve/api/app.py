@@ -16,7 +16,10 @@ from starlette.middleware.cors import CORSMiddleware
 from hipposerve.api.product import product_router
 from hipposerve.api.relationships import relationship_router
 from hipposerve.api.soauth import setup_auth
-from hipposerve.database import BEANIE_MODELS
+from hipposerve.database import BEANIE_MODELS, Collection, Product
+from hipposerve.database.indexes import duplicate_current_names
+from hipposerve.database.monitoring import RoundTripCounter, count_round_trips
+from hipposerve.service import acl
 from hipposerve.service.collection import CollectionNotFound
 from hipposerve.service.product import ProductNotFound
 from hipposerve.settings import SETTINGS
@@ -28,14 +31,34 @@ from hipposerve.web.router import templates
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize application services."""
-    app.db = AsyncIOMotorClient(SETTINGS.mongo_uri).account
+    app.db = AsyncIOMotorClient(
+        SETTINGS.mongo_uri, event_listeners=[RoundTripCounter()]
+    ).account
+
+    # Beanie names collections after their documents, and cannot build the
+    # current_name index over duplicates; see "Upgrading" in the README.
+    duplicates = await duplicate_current_names(app.db[Product.__name__])
+
+    if duplicates:
+        raise RuntimeError(
+            "More than one current product holds each of these names, so the "
+            f"unique index on current names cannot be built: {duplicates}. "
+            "Retire all but one current version of each before starting."
+        )
+
     await init_beanie(app.db, document_models=BEANIE_MODELS)
+
+    for document in (Product, Collection):
+        await acl.backfill_access_control(document)
+
     app.storage = Storage(
         url=SETTINGS.minio_url,
         presign_url=SETTINGS.minio_presign_url,
         upgrade_presign_url_to_https=SETTINGS.minio_upgrade_presign_url_to_https,
         secure=SETTINGS.minio_secure,
         cert_check=SETTINGS.minio_cert_check,
+        url_reuse_fraction=SETTINGS.minio_presign_reuse_fraction,
+        workers=SETTINGS.minio_workers,
         access_key=SETTINGS.minio_access,
         secret_key=SETTINGS.minio_secret,
     )
@@ -168,3 +191,22 @@ if SETTINGS.add_cors:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+
+if SETTINGS.debug:
+    logger.warning("Debug mode is enabled, counting database round trips per request")
+
+    @app.middleware("http")
+    async def count_database_round_trips(request: Request, call_next):
+        with count_round_trips() as round_trips:
+            response = await call_next(request)
+
+        response.headers["X-Mongo-Round-Trips"] = str(round_trips.count)
+
+        logger.debug(
+            "{} {} made {} database round trip(s)",
+            request.method,
+            request.url.path,
+            round_trips.count,
+        )
+
+        return response
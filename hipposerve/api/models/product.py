@@ -8,6 +8,7 @@ from pydantic import BaseModel
 from hippometa import ALL_METADATA_TYPE
 from hipposerve.service.product import PostUploadFile, PreUploadFile, ProductMetadata
 from hipposerve.service.versioning import VersionRevision
+from hipposerve.wire import MultipartUpload
 
 
 class CreateProductRequest(BaseModel):
@@ -18,11 +19,14 @@ class CreateProductRequest(BaseModel):
     product_readers: list[str] = []
     product_writers: list[str] = []
     multipart_batch_size: int = 50 * 1024 * 1024
+    part_url_limit: int | None = None
+    "Return at most this many part URLs per source; read the rest from /parts."
 
 
 class CreateProductResponse(BaseModel):
     id: PydanticObjectId
     upload_urls: dict[str, list[str]]
+    uploads: dict[str, MultipartUpload] = {}
 
 
 class CompleteProductRequest(BaseModel):
@@ -30,13 +34,6 @@ class CompleteProductRequest(BaseModel):
     sizes: dict[str, list[int]]
 
 
-class ReadProductResponse(BaseModel):
-    current_present: bool
-    current: str | None
-    requested: str
-    versions: dict[str, ProductMetadata]
-
-
 class ReadFilesResponse(BaseModel):
     product: ProductMetadata
     files: dict[str, PostUploadFile]
@@ -55,9 +52,12 @@ class UpdateProductRequest(BaseModel):
     remove_readers: list[str] = []
     add_writers: list[str] = []
     remove_writers: list[str] = []
+    part_url_limit: int | None = None
+    "Return at most this many part URLs per source; read the rest from /parts."
 
 
 class UpdateProductResponse(BaseModel):
     version: str
     id: PydanticObjectId
     upload_urls: dict[str, list[str]]
+    uploads: dict[str, MultipartUpload] = {}
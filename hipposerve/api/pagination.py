@@ -0,0 +1,41 @@
+"""
+Query parameters for paginated endpoints.
+"""
+
+from fastapi import HTTPException, status
+
+from hipposerve.service.pagination import Cursor, InvalidCursor
+from hipposerve.settings import SETTINGS
+
+DEFAULT_LIMIT = 100
+
+
+def page_limit(limit: int) -> int:
+    """
+    The number of results to return in a page, capped at the server's maximum.
+    """
+    return max(1, min(limit, SETTINGS.page_limit_maximum))
+
+
+def decode_cursor(cursor: str | None) -> Cursor | None:
+    """
+    Decode the cursor handed to a client with a previous page.
+
+    Raises
+    ------
+    HTTPException
+        400, if the cursor is not one that we handed out.
+    """
+    if cursor is None:
+        return None
+
+    try:
+        return Cursor.decode(cursor)
+    except InvalidCursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def encode_cursor(cursor: Cursor | None) -> str | None:
+    return None if cursor is None else cursor.encode()
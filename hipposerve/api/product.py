@@ -2,10 +2,8 @@
 Routes for the product service.
 """
 
-import asyncio
-
 from beanie import PydanticObjectId
-from fastapi import APIRouter, HTTPException, Request, status
+from fastapi import APIRouter, HTTPException, Query, Request, status
 from fastapi.responses import RedirectResponse
 from loguru import logger
 
@@ -14,18 +12,70 @@ from hipposerve.api.models.product import (
     CreateProductRequest,
     CreateProductResponse,
     ReadFilesResponse,
-    ReadProductResponse,
     UpdateProductRequest,
     UpdateProductResponse,
 )
-from hipposerve.database import ProductMetadata
+from hipposerve.api.pagination import (
+    DEFAULT_LIMIT,
+    decode_cursor,
+    encode_cursor,
+    page_limit,
+)
+from hipposerve.database import Product
 from hipposerve.service import acl, product, storage, users
-from hipposerve.service.auth import requires
+from hipposerve.service.auth import AuthenticationError, requires
+from hipposerve.service.query import InvalidQuery
+from hipposerve.wire import (
+    MultipartUpload,
+    ProductQuery,
+    ReadPartsResponse,
+    ReadProductResponse,
+    ResumeProductResponse,
+    SearchProductsResponse,
+)
 
 product_router = APIRouter(prefix="/product")
 
 DEFAULT_USER_USER_NAME = "default_user"
 
+SOURCE_TOO_LARGE = HTTPException(
+    status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+    detail="Source is too large to upload",
+)
+
+
+def require_writer(item: Product, request: Request):
+    """
+    Refuse (with a 403) users that can read, but not write to, a product.
+    """
+
+    try:
+        acl.check_user_access(
+            user_groups=request.user.groups, document_groups=item.writers
+        )
+    except AuthenticationError:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have write access to this product",
+        )
+
+
+def multipart_uploads(
+    item: Product, upload_urls: dict[str, list[str]]
+) -> dict[str, MultipartUpload]:
+    """
+    The part sizes and counts of the sources being uploaded, keyed by file name
+    like their upload URLs.
+    """
+
+    return {
+        x.name: MultipartUpload(
+            part_size=x.multipart_batch_size, number_of_parts=x.number_of_parts
+        )
+        for x in item.sources.values()
+        if x.name in upload_urls
+    }
+
 
 @product_router.put("/new")
 @requires(["hippo:admin", "hippo:write"])
@@ -46,17 +96,25 @@ async def create_product(
             status_code=status.HTTP_409_CONFLICT, detail="Product already exists"
         )
 
-    item, presigned = await product.create(
-        name=model.name,
-        description=model.description,
-        metadata=model.metadata,
-        sources=model.sources,
-        user_name=request.user.display_name,
-        storage=request.app.storage,
-        product_readers=model.product_readers,
-        product_writers=model.product_writers,
-        mutlipart_size=model.multipart_batch_size,
-    )
+    try:
+        item, presigned = await product.create(
+            name=model.name,
+            description=model.description,
+            metadata=model.metadata,
+            sources=model.sources,
+            user_name=request.user.display_name,
+            storage=request.app.storage,
+            product_readers=model.product_readers,
+            product_writers=model.product_writers,
+            mutlipart_size=model.multipart_batch_size,
+            part_url_limit=model.part_url_limit,
+        )
+    except product.ProductExists:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Product already exists"
+        )
+    except storage.SourceTooLarge:
+        raise SOURCE_TOO_LARGE
 
     logger.info(
         "Successfully created {} pre-signed URL(s) for product upload {} (id: {}) from {}",
@@ -66,7 +124,11 @@ async def create_product(
         request.user.display_name,
     )
 
-    return CreateProductResponse(id=item.id, upload_urls=presigned)
+    return CreateProductResponse(
+        id=item.id,
+        upload_urls=presigned,
+        uploads=multipart_uploads(item, presigned),
+    )
 
 
 @product_router.get("/search/{text}")
@@ -74,16 +136,24 @@ async def create_product(
 async def search(
     text: str,
     request: Request,
-) -> list[ProductMetadata]:
+    limit: int = DEFAULT_LIMIT,
+    cursor: str | None = None,
+) -> SearchProductsResponse:
     """
-    Search for a product by name.
+    Search for a product by name. Returns a page of at most `limit` products,
+    best matches first; pass the `next_cursor` back to read the next page.
     """
 
     logger.info(
         "Search for product {} request from {}", text, request.user.display_name
     )
 
-    items = await product.search_by_name(name=text, groups=request.user.groups)
+    items, after = await product.search_metadata_by_name(
+        name=text,
+        groups=request.user.groups,
+        limit=page_limit(limit),
+        cursor=decode_cursor(cursor),
+    )
 
     logger.info(
         "Successfully found {} product(s) matching {} requested by {}",
@@ -92,7 +162,47 @@ async def search(
         request.user.display_name,
     )
 
-    return await asyncio.gather(*[item.to_metadata() for item in items])
+    return SearchProductsResponse(results=items, next_cursor=encode_cursor(after))
+
+
+@product_router.post("/query")
+@requires(["hippo:admin", "hippo:read"])
+async def query(
+    model: ProductQuery,
+    request: Request,
+    limit: int = DEFAULT_LIMIT,
+    cursor: str | None = None,
+) -> SearchProductsResponse:
+    """
+    Find the current products whose metadata matches all of the predicates
+    in a typed query. Returns a page of at most `limit` products; pass the
+    `next_cursor` back to read the next page.
+    """
+
+    logger.info(
+        "Query for {} products request from {}",
+        model.metadata_type,
+        request.user.display_name,
+    )
+
+    try:
+        items, after = await product.query_metadata(
+            query=model,
+            groups=request.user.groups,
+            limit=page_limit(limit),
+            cursor=decode_cursor(cursor),
+        )
+    except InvalidQuery as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    logger.info(
+        "Successfully found {} {} product(s) matching query requested by {}",
+        len(items),
+        model.metadata_type,
+        request.user.display_name,
+    )
+
+    return SearchProductsResponse(results=items, next_cursor=encode_cursor(after))
 
 
 @product_router.post("/{id}/complete")
@@ -145,8 +255,7 @@ async def read_product(
     logger.info("Read product request for {} from {}", id, request.user.display_name)
 
     try:
-        product_item = await product.read_by_id(id, request.user.groups)
-        item = await product_item.to_metadata()
+        item = await product.read_metadata_by_id(id, request.user.groups)
 
         response = ReadProductResponse(
             current_present=item.current,
@@ -184,13 +293,13 @@ async def read_tree(
     )
 
     try:
-        requested_item = await product.read_by_id(id=id, groups=request.user.groups)
-        current_item = await product.walk_to_current(
-            product=requested_item, groups=request.user.groups
+        requested_item = await product.read_by_id(
+            id=id, groups=request.user.groups, fetch_links=False
         )
-        history = await product.walk_history(product=current_item)
+        history = await product.read_tree(product=requested_item)
+        current_item = next((x for x in history.values() if x.current), None)
 
-        if not current_item.current:
+        if current_item is None:
             raise HTTPException(
                 status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Unable to find the current version of the requested item",
@@ -227,7 +336,7 @@ async def read_files(id: PydanticObjectId, request: Request) -> ReadFilesRespons
     logger.info("Read files request for {} from {}", id, request.user.display_name)
 
     try:
-        item = await product.read_by_id(id=id, groups=request.user.groups)
+        item = await product.read_metadata_by_id(id=id, groups=request.user.groups)
     except product.ProductNotFound:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Product not found"
@@ -243,11 +352,100 @@ async def read_files(id: PydanticObjectId, request: Request) -> ReadFilesRespons
         request.user.display_name,
     )
 
-    return ReadFilesResponse(
-        product=await item.to_metadata(),
-        files=files,
+    return ReadFilesResponse(product=item, files=files)
+
+
+@product_router.get("/{id}/parts")
+@requires(["hippo:admin", "hippo:write"])
+async def read_parts(
+    id: PydanticObjectId,
+    request: Request,
+    slug: str,
+    start: int = Query(default=0, alias="from", ge=0),
+    count: int = DEFAULT_LIMIT,
+) -> ReadPartsResponse:
+    """
+    Read the pre-signed URLs for up to `count` parts of a source that is still
+    being uploaded, starting from the (zero-based) part `from`. Large sources
+    are given only their first parts' URLs when created, and read the rest
+    from here as the upload goes.
+    """
+
+    logger.info(
+        "Read parts request for {} ({}) from {}", id, slug, request.user.display_name
+    )
+
+    try:
+        item = await product.read_by_id(
+            id=id, groups=request.user.groups, fetch_links=False
+        )
+        file = item.sources[slug]
+    except (product.ProductNotFound, KeyError):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Slug {slug} not found for product {id}",
+        )
+
+    require_writer(item=item, request=request)
+
+    if file.multipart_closed or file.upload_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload of {slug} has already been completed",
+        )
+
+    urls = await storage.part_urls(
+        file=file, storage=request.app.storage, start=start, count=page_limit(count)
+    )
+
+    return ReadPartsResponse(
+        slug=slug,
+        part_size=file.multipart_batch_size,
+        number_of_parts=file.number_of_parts,
+        start=start,
+        urls=urls,
+    )
+
+
+@product_router.get("/{id}/resume")
+@requires(["hippo:admin", "hippo:write"])
+async def resume_product(
+    id: PydanticObjectId, request: Request, count: int = DEFAULT_LIMIT
+) -> ResumeProductResponse:
+    """
+    Read how far the uploads of a product's sources got, so that an
+    interrupted upload can be resumed. For each source that is still being
+    uploaded, lists the parts that the storage server already holds (with
+    their ETags), and pre-signs URLs for up to `count` of the missing parts.
+    Any further missing parts can be read from `/parts`.
+    """
+
+    logger.info("Resume request for {} from {}", id, request.user.display_name)
+
+    try:
+        item = await product.read_by_id(
+            id=id, groups=request.user.groups, fetch_links=False
+        )
+    except product.ProductNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Product not found"
+        )
+
+    require_writer(item=item, request=request)
+
+    uploads = await product.resume(
+        product=item, storage=request.app.storage, count=page_limit(count)
+    )
+
+    logger.info(
+        "Found {} open upload(s) for product {} from {}",
+        len(uploads),
+        id,
+        request.user.display_name,
     )
 
+    return ResumeProductResponse(id=item.id, uploads=uploads)
+
 
 @product_router.get("/{id}/{slug}")
 @requires(["hippo:admin", "hippo:read"])
@@ -353,18 +551,26 @@ async def update_product(
             )
 
     if model.level:
-        new_product, upload_urls = await product.update(
-            product=item,
-            access_groups=request.user.groups,
-            name=model.name,
-            description=model.description,
-            metadata=model.metadata,
-            new_sources=model.new_sources,
-            replace_sources=model.replace_sources,
-            drop_sources=model.drop_sources,
-            storage=request.app.storage,
-            level=model.level,
-        )
+        try:
+            new_product, upload_urls = await product.update(
+                product=item,
+                access_groups=request.user.groups,
+                name=model.name,
+                description=model.description,
+                metadata=model.metadata,
+                new_sources=model.new_sources,
+                replace_sources=model.replace_sources,
+                drop_sources=model.drop_sources,
+                storage=request.app.storage,
+                level=model.level,
+                part_url_limit=model.part_url_limit,
+            )
+        except product.ProductExists:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT, detail="Product already exists"
+            )
+        except storage.SourceTooLarge:
+            raise SOURCE_TOO_LARGE
 
         logger.info(
             "Successfully updated product {} (new id: {}; {}; old id: {}; {}) from {}",
@@ -398,6 +604,7 @@ async def update_product(
         version=new_product.version,
         id=new_product.id,
         upload_urls=upload_urls,
+        uploads=multipart_uploads(new_product, upload_urls),
     )
 
 
@@ -412,7 +619,7 @@ async def confirm_product(id: PydanticObjectId, request: Request) -> None:
 
     try:
         item = await product.read_by_id(id=id, groups=request.user.groups)
-        success = await product.confirm(
+        confirmed = await product.confirm_sources(
             product=item,
             storage=request.app.storage,
         )
@@ -421,10 +628,12 @@ async def confirm_product(id: PydanticObjectId, request: Request) -> None:
             status_code=status.HTTP_404_NOT_FOUND, detail="Product not found."
         )
 
-    if not success:
+    missing = sorted(slug for slug, present in confirmed.items() if not present)
+
+    if missing:
         raise HTTPException(
             status_code=status.HTTP_424_FAILED_DEPENDENCY,
-            detail="Not all sources were present.",
+            detail=f"Not all sources were present: {', '.join(missing)}.",
         )
 
     logger.info("Successfully confirmed product {} (id: {})", item.name, item.id)
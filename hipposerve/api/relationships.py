@@ -8,13 +8,21 @@ from loguru import logger
 
 from hipposerve.api.models.relationships import (
     CreateCollectionRequest,
-    ReadCollectionCollectionResponse,
-    ReadCollectionProductResponse,
-    ReadCollectionResponse,
     UpdateCollectionRequest,
 )
+from hipposerve.api.pagination import (
+    DEFAULT_LIMIT,
+    decode_cursor,
+    encode_cursor,
+    page_limit,
+)
 from hipposerve.service import acl, collection, product
 from hipposerve.service.auth import requires
+from hipposerve.wire import (
+    ReadCollectionProductsResponse,
+    ReadCollectionResponse,
+    SearchCollectionsResponse,
+)
 
 relationship_router = APIRouter(prefix="/relationships")
 
@@ -54,61 +62,70 @@ async def create_collection(
 async def read_collection(
     id: PydanticObjectId,
     request: Request,
+    limit: int = DEFAULT_LIMIT,
+    cursor: str | None = None,
 ) -> ReadCollectionResponse:
     """
-    Read a collection's details.
+    Read a collection's details, and the first page of its products (at most
+    `limit`). If there are more, pass the `next_cursor` to the products
+    endpoint to read them.
     """
 
     logger.info("Request to read collection: {} from {}", id, request.user.display_name)
 
     try:
-        item = await collection.read(id=id, groups=request.user.groups)
+        item = await collection.read_metadata(id=id, groups=request.user.groups)
+        products, after = await collection.read_products(
+            id=id,
+            groups=request.user.groups,
+            limit=page_limit(limit),
+            cursor=decode_cursor(cursor),
+            collection=item,
+        )
+    except collection.CollectionNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Collection not found."
+        )
+
+    item.products = products
+    item.next_cursor = encode_cursor(after)
+
+    return item
+
+
+@relationship_router.get("/collection/{id}/products")
+@requires(["hippo:admin", "hippo:read"])
+async def read_collection_products(
+    id: PydanticObjectId,
+    request: Request,
+    limit: int = DEFAULT_LIMIT,
+    cursor: str | None = None,
+) -> ReadCollectionProductsResponse:
+    """
+    Read a page of the products in a collection, at most `limit` of them;
+    pass the `next_cursor` back to read the next page.
+    """
+
+    logger.info(
+        "Request to read products of collection: {} from {}",
+        id,
+        request.user.display_name,
+    )
+
+    try:
+        products, after = await collection.read_products(
+            id=id,
+            groups=request.user.groups,
+            limit=page_limit(limit),
+            cursor=decode_cursor(cursor),
+        )
     except collection.CollectionNotFound:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Collection not found."
         )
 
-    return ReadCollectionResponse(
-        id=item.id,
-        name=item.name,
-        description=item.description,
-        owner=item.owner,
-        readers=item.readers,
-        writers=item.writers,
-        products=[
-            ReadCollectionProductResponse(
-                id=x.id,
-                name=x.name,
-                version=x.version,
-                description=x.description,
-                owner=x.owner,
-                uploaded=x.uploaded,
-                metadata=x.metadata,
-            )
-            for x in item.products
-        ],
-        child_collections=[
-            ReadCollectionCollectionResponse(
-                id=x.id,
-                name=x.name,
-                description=x.description,
-                owner=x.owner,
-                readers=x.readers,
-                writers=x.writers,
-            )
-            for x in item.child_collections
-        ],
-        parent_collections=[
-            ReadCollectionCollectionResponse(
-                id=x.id,
-                name=x.name,
-                description=x.description,
-                owner=x.owner,
-                readers=x.readers,
-                writers=x.writers,
-            )
-            for x in item.parent_collections
-        ],
+    return ReadCollectionProductsResponse(
+        results=products, next_cursor=encode_cursor(after)
     )
 
 
@@ -117,18 +134,26 @@ async def read_collection(
 async def search_collection(
     name: str,
     request: Request,
-) -> list[ReadCollectionResponse]:
+    limit: int = DEFAULT_LIMIT,
+    cursor: str | None = None,
+) -> SearchCollectionsResponse:
     """
     Search for collections by name. Products and sub-collections are not
     returned; these should be fetched separately through the read_collection
-    endpoint.
+    endpoint. Returns a page of at most `limit` collections, best matches
+    first; pass the `next_cursor` back to read the next page.
     """
 
     logger.info(
         "Request to search for collection: {} from {}", name, request.user.display_name
     )
 
-    results = await collection.search_by_name(name=name, groups=request.user.groups)
+    results, after = await collection.search_metadata_by_name(
+        name=name,
+        groups=request.user.groups,
+        limit=page_limit(limit),
+        cursor=decode_cursor(cursor),
+    )
 
     logger.info(
         "Found {} collections for {} from {}",
@@ -137,18 +162,7 @@ async def search_collection(
         request.user.display_name,
     )
 
-    return [
-        ReadCollectionResponse(
-            id=item.id,
-            name=item.name,
-            description=item.description,
-            owner=item.owner,
-            readers=item.readers,
-            writers=item.writers,
-            products=None,
-        )
-        for item in results
-    ]
+    return SearchCollectionsResponse(results=results, next_cursor=encode_cursor(after))
 
 
 @relationship_router.put("/collection/{collection_id}/{product_id}")
@@ -170,7 +184,9 @@ async def add_product_to_collection(
     )
 
     try:
-        coll = await collection.read(id=collection_id, groups=request.user.groups)
+        coll = await collection.read(
+            id=collection_id, groups=request.user.groups, fetch_links=False
+        )
     except collection.CollectionNotFound:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Collection not found."
@@ -207,7 +223,9 @@ async def remove_product_from_collection(
     )
 
     try:
-        coll = await collection.read(id=collection_id, groups=request.user.groups)
+        coll = await collection.read(
+            id=collection_id, groups=request.user.groups, fetch_links=False
+        )
     except collection.CollectionNotFound:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Collection not found."
@@ -299,7 +317,7 @@ async def delete_collection(
 
     try:
         # Check if we have a parent; if we do, we need to remove its link to us.
-        coll = await collection.read(id=id, groups=request.user.groups)
+        coll = await collection.read_metadata(id=id, groups=request.user.groups)
 
         if coll.parent_collections:
             for parent in coll.parent_collections:
@@ -6,10 +6,21 @@ from datetime import datetime
 from enum import Enum
 
 import pymongo
-from beanie import BackLink, Document, Indexed, Link, PydanticObjectId
-from pydantic import BaseModel, Field
-
-from hippometa import ALL_METADATA_TYPE
+from beanie import (
+    BackLink,
+    Document,
+    Indexed,
+    Insert,
+    Link,
+    PydanticObjectId,
+    Replace,
+    Save,
+    before_event,
+)
+from pydantic import Field
+
+from hippometa import ALL_METADATA
+from hipposerve.wire import CollectionMetadata, FileMetadata, ProductMetadata
 
 
 class CollectionPolicy(Enum):
@@ -34,23 +45,6 @@ class User(Document):
     last_access_time: datetime | None
 
 
-class FileMetadata(BaseModel):
-    """
-    Object containing the metadata from a single file.
-    """
-
-    id: PydanticObjectId
-    name: str
-    description: str | None = None
-    uploader: str
-    uuid: str
-    bucket: str
-    size: int
-    checksum: str
-    slug: str = Field(default="data")
-    available: bool = True
-
-
 class File(Document, FileMetadata):
     # Information for multi-part uploads (private)
     multipart: bool = False
@@ -74,35 +68,12 @@ class File(Document, FileMetadata):
         )
 
 
-class ProductMetadata(BaseModel):
+def access_control_list(readers: list[str], writers: list[str]) -> list[str]:
     """
-    Object containing the metadata from a single version of a product.
+    All of the groups that may access a document: its readers, its writers,
+    and admin.
     """
-
-    id: PydanticObjectId
-
-    name: str
-    description: str
-    metadata: ALL_METADATA_TYPE
-
-    uploaded: datetime
-    updated: datetime
-
-    current: bool
-    version: str
-
-    sources: dict[str, FileMetadata]  # Sources are indexed by their slug
-    owner: str
-
-    replaces: str | None
-
-    readers: list[str] = []
-    writers: list[str] = []
-
-    child_of: list[PydanticObjectId]
-    parent_of: list[PydanticObjectId]
-
-    collections: list[PydanticObjectId]
+    return sorted(set(readers) | set(writers) | {"admin"})
 
 
 class ProtectedDocument(Document):
@@ -110,9 +81,35 @@ class ProtectedDocument(Document):
     writers: list[str] = Field(default_factory=lambda: ["admin"])
     owner: str
 
+    # Denormalized from readers and writers, so that access can be checked
+    # with a single $in on a (multikey) index.
+    acl: list[str] = Field(default_factory=lambda: ["admin"])
+
     current: bool = True
     replaces: Link["ProtectedDocument"] | None = None
 
+    @before_event(Insert, Replace, Save)
+    def update_acl(self):
+        self.acl = access_control_list(self.readers, self.writers)
+
+
+def metadata_indexes() -> list[pymongo.IndexModel]:
+    """
+    An index on each of the ``indexed_fields`` of every metadata type. Each
+    index only covers the products with that type of metadata, so queries
+    must match on ``metadata.metadata_type`` to use it.
+    """
+
+    return [
+        pymongo.IndexModel(
+            [(f"metadata.{field}", pymongo.ASCENDING)],
+            name=f"metadata_{metadata_type}_{field}",
+            partialFilterExpression={"metadata.metadata_type": metadata_type},
+        )
+        for metadata_type, metadata_class in ALL_METADATA.items()
+        for field in sorted(metadata_class.indexed_fields)
+    ]
+
 
 class Product(ProtectedDocument, ProductMetadata):
     name: Indexed(str, pymongo.TEXT)
@@ -129,6 +126,48 @@ class Product(ProtectedDocument, ProductMetadata):
     collections: list[Link["Collection"]] = []
     collection_policies: list[CollectionPolicy] = [CollectionPolicy.CURRENT]
 
+    # The ProductLineage that this is a version of. None for products created
+    # before lineages were introduced, until they are next updated.
+    lineage: PydanticObjectId | None = None
+
+    class Settings:
+        # Created by init_beanie; see hipposerve.database.indexes for the
+        # queries that these serve, and `henry dev audit-indexes`.
+        indexes = [
+            # Product names are unique, but only among current versions.
+            pymongo.IndexModel(
+                [("name", pymongo.ASCENDING)],
+                name="current_name",
+                unique=True,
+                partialFilterExpression={"current": True},
+            ),
+            pymongo.IndexModel(
+                [("name", pymongo.ASCENDING), ("version", pymongo.ASCENDING)],
+                name="name_version",
+            ),
+            pymongo.IndexModel([("replaces.$id", pymongo.ASCENDING)], name="replaces"),
+            pymongo.IndexModel([("lineage", pymongo.ASCENDING)], name="lineage"),
+            pymongo.IndexModel([("child_of.$id", pymongo.ASCENDING)], name="child_of"),
+            # Collection members are read in pages, in _id order.
+            pymongo.IndexModel(
+                [("collections.$id", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)],
+                name="collections_id",
+            ),
+            pymongo.IndexModel(
+                [("acl", pymongo.ASCENDING), ("updated", pymongo.DESCENDING)],
+                name="acl_updated",
+            ),
+            pymongo.IndexModel(
+                [
+                    ("current", pymongo.ASCENDING),
+                    ("acl", pymongo.ASCENDING),
+                    ("updated", pymongo.DESCENDING),
+                ],
+                name="current_acl_updated",
+            ),
+            *metadata_indexes(),
+        ]
+
     async def to_metadata(self) -> ProductMetadata:
         # If links are longer than the pre-determined limit (3) we need
         # to fetch.
@@ -161,19 +200,17 @@ class Product(ProtectedDocument, ProductMetadata):
         )
 
 
-class CollectionMetadata(BaseModel):
+class ProductLineage(Document):
     """
-    Base model for a collection.
+    All of the versions of a single product. Versions are only linked to each
+    other through `replaces`, so this saves walking that chain to find the
+    head or the history of a product. Kept up to date by the product service.
     """
 
-    id: PydanticObjectId
-
-    name: str
-    description: str
-
-    products: list[ProductMetadata]
-    child_collections: list[PydanticObjectId]
-    parent_collections: list[PydanticObjectId]
+    current: PydanticObjectId
+    "The current version of the product."
+    versions: list[PydanticObjectId] = []
+    "All versions of the product, oldest first."
 
 
 class Collection(ProtectedDocument, CollectionMetadata):
@@ -188,5 +225,14 @@ class Collection(ProtectedDocument, CollectionMetadata):
         json_schema_extra={"original_field": "child_collections"}
     )
 
+    class Settings:
+        indexes = [
+            pymongo.IndexModel(
+                [("child_collections.$id", pymongo.ASCENDING)],
+                name="child_collections",
+            ),
+            pymongo.IndexModel([("acl", pymongo.ASCENDING)], name="acl"),
+        ]
+
 
-BEANIE_MODELS = [User, File, Product, Collection]
+BEANIE_MODELS = [User, File, Product, ProductLineage, Collection]
@@ -0,0 +1,238 @@
+"""
+Audit of the indexes used by the service layer's queries.
+
+Each of the hot queries made by the service layer is listed here with the
+shape of its filter and sort, and ``audit`` asks MongoDB to explain it. A
+query is covered if its winning plan never scans the whole collection. Keep
+this list in step with the services when adding or changing queries.
+"""
+
+from typing import Any
+
+from beanie import Document
+from bson import ObjectId
+from pydantic import BaseModel
+
+from hippometa import ALL_METADATA
+from hipposerve.database import Collection, Product
+from hipposerve.service.acl import access_query
+
+# Placeholder values; the query planner only cares about the shape of a query.
+ID = ObjectId()
+GROUPS = ["audit"]
+ACCESS_QUERY = access_query(GROUPS)
+
+
+class AuditedQuery(BaseModel):
+    """
+    The shape of a query made by the service layer.
+    """
+
+    name: str
+    document: type[Document]
+    filter: dict[str, Any]
+    sort: list[tuple[str, int]] | None = None
+
+
+class QueryAudit(BaseModel):
+    """
+    The result of explaining a single ``AuditedQuery``.
+    """
+
+    name: str
+    collection: str
+    covered: bool
+    "The winning plan does not scan the entire collection."
+    in_memory_sort: bool
+    "The results are sorted in memory, rather than read in order from an index."
+    indexes: list[str]
+    "The indexes used by the winning plan."
+
+
+AUDITED_QUERIES = [
+    AuditedQuery(
+        name="product.exists",
+        document=Product,
+        filter={"name": "audit"},
+    ),
+    AuditedQuery(
+        name="product.read_by_name (current)",
+        document=Product,
+        filter={"name": "audit", "current": True},
+    ),
+    AuditedQuery(
+        name="product.read_by_name (version)",
+        document=Product,
+        filter={"name": "audit", "version": "1.0.0"},
+    ),
+    AuditedQuery(
+        name="product.walk_to_current",
+        document=Product,
+        filter={"replaces.$id": ID},
+    ),
+    AuditedQuery(
+        name="product.read_tree",
+        document=Product,
+        filter={"lineage": ID},
+    ),
+    AuditedQuery(
+        name="product.read_most_recent",
+        document=Product,
+        filter=ACCESS_QUERY,
+        sort=[("updated", -1)],
+    ),
+    AuditedQuery(
+        name="product.read_most_recent (current only)",
+        document=Product,
+        filter={**ACCESS_QUERY, "current": True},
+        sort=[("updated", -1)],
+    ),
+    AuditedQuery(
+        name="product.search_by_name",
+        document=Product,
+        filter={**ACCESS_QUERY, "$text": {"$search": "audit"}, "current": True},
+    ),
+    AuditedQuery(
+        name="product.search_by_owner",
+        document=Product,
+        filter={
+            **ACCESS_QUERY,
+            "owner": {"$regex": "^audit$", "$options": "i"},
+            "current": True,
+        },
+    ),
+    AuditedQuery(
+        name="product.query_metadata",
+        document=Product,
+        filter={
+            "metadata.metadata_type": "audit",
+            "current": True,
+            **ACCESS_QUERY,
+        },
+        sort=[("_id", 1)],
+    ),
+    *[
+        AuditedQuery(
+            name=f"product.query_metadata ({metadata_type}.{field})",
+            document=Product,
+            filter={"metadata.metadata_type": metadata_type, f"metadata.{field}": ID},
+        )
+        for metadata_type, metadata_class in ALL_METADATA.items()
+        for field in sorted(metadata_class.indexed_fields)
+    ],
+    AuditedQuery(
+        name="product.parent_of",
+        document=Product,
+        filter={"child_of.$id": ID},
+    ),
+    AuditedQuery(
+        name="collection.read_products",
+        document=Product,
+        filter={"collections.$id": ID, **ACCESS_QUERY},
+        sort=[("_id", 1)],
+    ),
+    AuditedQuery(
+        name="collection.read_most_recent",
+        document=Collection,
+        filter=ACCESS_QUERY,
+    ),
+    AuditedQuery(
+        name="collection.search_by_name",
+        document=Collection,
+        filter={**ACCESS_QUERY, "$text": {"$search": "audit"}},
+    ),
+    AuditedQuery(
+        name="collection.parent_collections",
+        document=Collection,
+        filter={"child_collections.$id": ID},
+    ),
+]
+
+
+def _stages(plan: Any):
+    """
+    All of the stages (and the indexes that they use) in an explained plan.
+    """
+
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"], plan.get("indexName")
+
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _stages(value)
+
+
+async def audit(
+    database, queries: list[AuditedQuery] | None = None
+) -> list[QueryAudit]:
+    """
+    Explain each of the service layer's queries against a database.
+
+    Arguments
+    ---------
+    database
+        The database holding the hippo collections, as passed to
+        ``init_beanie``.
+    queries : list[AuditedQuery], optional
+        The queries to audit. Defaults to ``AUDITED_QUERIES``.
+
+    Returns
+    -------
+    list[QueryAudit]
+        The result for each query, in order.
+    """
+
+    results = []
+
+    for query in queries or AUDITED_QUERIES:
+        collection_name = query.document.get_collection_name()
+        cursor = database[collection_name].find(query.filter)
+
+        if query.sort is not None:
+            cursor = cursor.sort(query.sort)
+
+        explained = await cursor.explain()
+        stages = list(_stages(explained["queryPlanner"]["winningPlan"]))
+
+        results.append(
+            QueryAudit(
+                name=query.name,
+                collection=collection_name,
+                covered=all(stage != "COLLSCAN" for stage, _ in stages),
+                in_memory_sort=any(stage == "SORT" for stage, _ in stages),
+                indexes=list(dict.fromkeys(x for _, x in stages if x is not None)),
+            )
+        )
+
+    return results
+
+
+async def duplicate_current_names(collection) -> list[str]:
+    """
+    The names held by more than one current product. The ``current_name``
+    unique index cannot be built while there are any, so databases from
+    before it was introduced must have these resolved before upgrading.
+
+    Arguments
+    ---------
+    collection
+        The (motor) collection holding the products. This is read directly,
+        so it can be checked before ``init_beanie`` builds the indexes.
+
+    Returns
+    -------
+    list[str]
+        The duplicated names, in order.
+    """
+
+    pipeline = [
+        {"$match": {"current": True}},
+        {"$group": {"_id": "$name", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$sort": {"_id": 1}},
+    ]
+
+    return [x["_id"] for x in await collection.aggregate(pipeline).to_list(None)]
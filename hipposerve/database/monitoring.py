@@ -0,0 +1,58 @@
+"""
+Counting of database round trips, for spotting query regressions.
+
+Register ``RoundTripCounter`` as an event listener on the Mongo client, then
+count the commands sent within a block with ``count_round_trips``. The server
+does this for every request when running in debug mode, and reports the count
+in the ``X-Mongo-Round-Trips`` response header.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from pydantic import BaseModel
+from pymongo import monitoring
+
+
+class RoundTrips(BaseModel):
+    count: int = 0
+    "Number of commands sent to the database."
+
+
+_ROUND_TRIPS: ContextVar[RoundTrips | None] = ContextVar("round_trips", default=None)
+
+
+class RoundTripCounter(monitoring.CommandListener):
+    """
+    Counts every command sent to the database towards the active
+    ``count_round_trips`` block, if there is one.
+    """
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        round_trips = _ROUND_TRIPS.get()
+
+        if round_trips is not None:
+            round_trips.count += 1
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        pass
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        pass
+
+
+@contextmanager
+def count_round_trips() -> Iterator[RoundTrips]:
+    """
+    Count the database round trips made within this block. Tasks started
+    within the block count towards it too.
+    """
+
+    round_trips = RoundTrips()
+    token = _ROUND_TRIPS.set(round_trips)
+
+    try:
+        yield round_trips
+    finally:
+        _ROUND_TRIPS.reset(token)
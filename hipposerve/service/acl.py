@@ -3,13 +3,58 @@ Access control setup (changing access control levels, checking
 for access to documents). Works with `ProtectedDocument`s.
 """
 
-from typing import Iterable
+from typing import Any, Iterable
 
-from hipposerve.database import ProtectedDocument
+from beanie import PydanticObjectId
+
+from hipposerve.database import (
+    ProductLineage,
+    ProtectedDocument,
+    access_control_list,
+)
 from hipposerve.service import versioning
 from hipposerve.service.auth import AuthenticationError
 
 
+async def _version_ids(doc: ProtectedDocument) -> list[PydanticObjectId]:
+    """
+    The IDs of every version of this (current) document, found in a single
+    query: through its lineage, if it has one, or by following the
+    ``replaces`` chain with ``$graphLookup`` (also used if the lineage has
+    gone missing).
+    """
+
+    lineage_id = getattr(doc, "lineage", None)
+
+    if lineage_id is not None:
+        lineage = await ProductLineage.get(lineage_id)
+
+        if lineage is not None:
+            return lineage.versions
+
+    documents = (
+        await type(doc)
+        .aggregate(
+            [
+                {"$match": {"_id": doc.id}},
+                {
+                    "$graphLookup": {
+                        "from": doc.get_collection_name(),
+                        "startWith": "$replaces.$id",
+                        "connectFromField": "replaces.$id",
+                        "connectToField": "_id",
+                        "as": "versions",
+                    }
+                },
+                {"$project": {"versions": "$versions._id"}},
+            ]
+        )
+        .to_list()
+    )
+
+    return [doc.id] + [x for document in documents for x in document["versions"]]
+
+
 async def update_access_control(
     doc: ProtectedDocument,
     owner: str | None = None,
@@ -20,12 +65,11 @@ async def update_access_control(
 ) -> ProtectedDocument:
     """
     Update the access control on this doc, either adding or removing
-    readers or writers. Note that access control changes walk the entire
-    tree and update all docs, and do not create a new version.
+    readers or writers. Note that access control changes apply to all
+    versions of the doc (in a single bulk update), and do not create a
+    new version.
     """
 
-    initial_doc_id = doc.id
-
     if not doc.current:
         raise versioning.VersioningError(
             "Attempting to update a non-current product. You must always "
@@ -41,31 +85,66 @@ async def update_access_control(
     else:
         owner = doc.owner
 
-    # Need to walk the tree; some protected resources have versions.
-
-    while doc.replaces is not None:
-        doc.readers = readers
-        doc.writers = writers
-        doc.owner = owner
+    ids = await _version_ids(doc)
+
+    await (
+        type(doc)
+        .find({"_id": {"$in": ids}})
+        .update(
+            {
+                "$set": {
+                    "readers": sorted(readers),
+                    "writers": sorted(writers),
+                    "acl": access_control_list(readers, writers),
+                    "owner": owner,
+                }
+            }
+        )
+    )
 
-        await doc.save()
+    # We use the classmethod on the _instance_ to get back the same
+    # type that the doc is! Using ProtectedDocument.get() doesn't work.
+    return await doc.get(doc.id)
 
-        doc = doc.replaces
 
-        if not hasattr(doc, "replaces"):
-            link = doc
-            doc = await link.fetch()
+def access_query(groups: Iterable[str]) -> dict[str, Any]:
+    """
+    The query that matches all documents that a user (based on their groups)
+    has access to. Served by the multikey indexes on `acl`.
+    """
+    return {"acl": {"$in": list(groups)}}
 
-    # Base of tree that has no replacement
-    doc.readers = readers
-    doc.writers = writers
-    doc.owner = owner
 
-    await doc.save()
+async def backfill_access_control(document: type[ProtectedDocument]):
+    """
+    Fill in the `acl` of documents created before it was introduced, in
+    a single aggregation. Documents that already have one are untouched.
+    """
 
-    # We use the classmethod on the _instance_ to get back the same
-    # type that the doc is! Using ProtectedDocument.get() doesn't work.
-    return await doc.get(initial_doc_id)
+    await document.aggregate(
+        [
+            {"$match": {"acl": {"$exists": False}}},
+            {
+                "$project": {
+                    "acl": {
+                        "$setUnion": [
+                            {"$ifNull": ["$readers", []]},
+                            {"$ifNull": ["$writers", []]},
+                            ["admin"],
+                        ]
+                    }
+                }
+            },
+            {
+                "$merge": {
+                    "into": document.get_collection_name(),
+                    "on": "_id",
+                    "whenMatched": "merge",
+                    "whenNotMatched": "discard",
+                }
+            },
+        ]
+    ).to_list()
 
 
 def check_user_access(
@@ -6,19 +6,39 @@ the product service.
 """
 
 import re
+from typing import Any
 
 from beanie import PydanticObjectId
 from beanie.operators import Text
+from bson import DBRef
 from fastapi import HTTPException
 
-from hipposerve.database import Collection
-from hipposerve.service.acl import check_user_access
+from hipposerve.database import Collection, Product
+from hipposerve.service.acl import access_query, check_user_access
+from hipposerve.service.pagination import Cursor, after, keyset_stages, next_cursor
+from hipposerve.wire import (
+    ReadCollectionCollectionResponse,
+    ReadCollectionProductResponse,
+    ReadCollectionResponse,
+)
 
 
 class CollectionNotFound(Exception):
     pass
 
 
+# The fields read for summaries of collections, and of their products.
+SUMMARY_FIELDS = {"name": 1, "description": 1, "owner": 1, "readers": 1, "writers": 1}
+PRODUCT_FIELDS = {
+    "name": 1,
+    "description": 1,
+    "owner": 1,
+    "version": 1,
+    "uploaded": 1,
+    "metadata": 1,
+}
+
+
 async def create(
     name: str,
     user: str,
@@ -42,27 +62,162 @@ async def create(
 async def read(
     id: PydanticObjectId,
     groups: list[str],
+    fetch_links: bool = True,
 ):
-    collection = await Collection.find_one(Collection.id == id, fetch_links=True)
+    """
+    Read a collection. Fetching links loads every one of its products; use
+    `read_metadata` and `read_products` to display a collection.
+    """
+    collection = await Collection.find_one(Collection.id == id, fetch_links=fetch_links)
 
     if collection is None:
         raise CollectionNotFound
     assert check_user_access(groups, collection.readers + collection.writers)
-    if collection.products:
+    if fetch_links and collection.products:
         collection_list = await collection_product_filter(groups, [collection])
         collection = collection_list[0]
     return collection
 
 
+def _related_lookup(
+    local_field: str, foreign_field: str, name: str, count_products: bool
+) -> dict[str, Any]:
+    """
+    A ``$lookup`` stage adding summaries of related (parent or child)
+    collections, optionally with the number of products in each.
+    """
+
+    pipeline = [{"$project": SUMMARY_FIELDS}]
+
+    if count_products:
+        pipeline.append(
+            {
+                "$lookup": {
+                    "from": Product.get_collection_name(),
+                    "localField": "_id",
+                    "foreignField": "collections.$id",
+                    "pipeline": [{"$project": {"_id": 1}}],
+                    "as": "number_of_products",
+                }
+            }
+        )
+        pipeline.append(
+            {"$set": {"number_of_products": {"$size": "$number_of_products"}}}
+        )
+
+    return {
+        "$lookup": {
+            "from": Collection.get_collection_name(),
+            "localField": local_field,
+            "foreignField": foreign_field,
+            "pipeline": pipeline,
+            "as": name,
+        }
+    }
+
+
+def _summary(document: dict[str, Any]) -> ReadCollectionCollectionResponse:
+    return ReadCollectionCollectionResponse(
+        id=document["_id"],
+        name=document["name"],
+        description=document["description"],
+        owner=document["owner"],
+        readers=document["readers"],
+        writers=document["writers"],
+        number_of_products=document.get("number_of_products"),
+    )
+
+
+async def read_metadata(
+    id: PydanticObjectId, groups: list[str], count_products: bool = False
+) -> ReadCollectionResponse:
+    """
+    Read a collection, with summaries of its parent and child collections, in
+    a single aggregation. None of its products are loaded (``products`` is
+    None); page through those with `read_products`. With `count_products`,
+    the summaries include the number of products in each related collection.
+    """
+
+    documents = await Collection.aggregate(
+        [
+            {"$match": {"_id": id}},
+            {"$project": {**SUMMARY_FIELDS, "child_collections": 1}},
+            _related_lookup(
+                "child_collections.$id", "_id", "child_collections", count_products
+            ),
+            _related_lookup(
+                "_id", "child_collections.$id", "parent_collections", count_products
+            ),
+        ]
+    ).to_list()
+
+    if not documents:
+        raise CollectionNotFound
+
+    document = documents[0]
+
+    assert check_user_access(groups, document["readers"] + document["writers"])
+
+    return ReadCollectionResponse(
+        id=document["_id"],
+        name=document["name"],
+        description=document["description"],
+        owner=document["owner"],
+        readers=document["readers"],
+        writers=document["writers"],
+        products=None,
+        child_collections=[_summary(x) for x in document["child_collections"]],
+        parent_collections=[_summary(x) for x in document["parent_collections"]],
+    )
+
+
+async def read_products(
+    id: PydanticObjectId,
+    groups: list[str],
+    limit: int | None = None,
+    cursor: Cursor | None = None,
+    collection: ReadCollectionResponse | None = None,
+) -> tuple[list[ReadCollectionProductResponse], Cursor | None]:
+    """
+    Read the products in a collection that the user has access to, through
+    the index on `Product.collections`, reading only the fields that are
+    displayed. Returns a page of at most `limit` products (all of them if
+    None) after the `cursor`, and the cursor for the next page (None if this
+    is the last). Pass the `collection` if it has already been read with
+    `read_metadata`, to skip reading it (and checking access) again.
+    """
+
+    if collection is None:
+        collection = await Collection.find_one(Collection.id == id)
+
+        if collection is None:
+            raise CollectionNotFound
+
+    assert check_user_access(groups, collection.readers + collection.writers)
+
+    documents = await Product.aggregate(
+        [
+            {"$match": {"collections.$id": id, **access_query(groups)}},
+            *keyset_stages(cursor, limit),
+            {"$project": PRODUCT_FIELDS},
+        ]
+    ).to_list()
+
+    documents, cursor = next_cursor(documents, limit)
+
+    return [
+        ReadCollectionProductResponse(id=x.pop("_id"), **x) for x in documents
+    ], cursor
+
+
 async def read_most_recent(
     groups: list[str],
     fetch_links: bool = False,
     maximum: int = 16,
 ) -> list[Collection]:
     # TODO: Implement updated time for collections.
-    access_query = {"$or": [{"readers": {"$in": groups}}, {"writers": {"$in": groups}}]}
     collection_list = await Collection.find(
-        access_query, fetch_links=fetch_links
+        access_query(groups), fetch_links=fetch_links
     ).to_list(maximum)
     filtered_collection_list = await collection_product_filter(groups, collection_list)
     return filtered_collection_list
@@ -75,9 +230,8 @@ async def search_by_name(
     Search for Collections by name using the text index.
     """
 
-    access_query = {"$or": [{"readers": {"$in": groups}}, {"writers": {"$in": groups}}]}
     results = (
-        await Collection.find(access_query, Text(name), fetch_links=fetch_links)  # noqa: E712
+        await Collection.find(access_query(groups), Text(name), fetch_links=fetch_links)
         .sort([("score", {"$meta": "textScore"})])
         .to_list()
     )
@@ -86,25 +240,74 @@ async def search_by_name(
     return filtered_collection_list
 
 
+async def search_metadata_by_name(
+    name: str,
+    groups: list[str],
+    limit: int | None = None,
+    cursor: Cursor | None = None,
+) -> tuple[list[ReadCollectionResponse], Cursor | None]:
+    """
+    Search for Collections by name using the text index, reading only the
+    fields shown in search results (and not the products or sub-collections).
+    Returns a page of at most `limit` collections (all of them if None), best
+    matches first, after the `cursor`, and the cursor for the next page (None
+    if this is the last).
+    """
+
+    documents = await Collection.aggregate(
+        [
+            {"$match": {"$text": {"$search": name}, **access_query(groups)}},
+            *keyset_stages(cursor, limit, text=True),
+            {"$project": {"score": 1, **SUMMARY_FIELDS}},
+        ]
+    ).to_list()
+
+    documents, cursor = next_cursor(documents, limit, text=True)
+
+    return [
+        ReadCollectionResponse(
+            id=x["_id"],
+            name=x["name"],
+            description=x["description"],
+            owner=x["owner"],
+            readers=x["readers"],
+            writers=x["writers"],
+            products=None,
+        )
+        for x in documents
+    ], cursor
+
+
 async def search_by_owner(
     owner: str,
     groups: list[str],
     fetch_links: bool = True,
-) -> list[Collection]:
+    limit: int | None = None,
+    cursor: Cursor | None = None,
+) -> tuple[list[Collection], Cursor | None]:
     """
     Search for Collections by owner; owner search is case insensitive
-    but must otherwise be an exact match
+    but must otherwise be an exact match. Returns a page of at most `limit`
+    collections (all of them if None) after the `cursor`, and the cursor for
+    the next page (None if this is the last).
     """
 
     owner_regex = {"$regex": f"^{re.escape(owner)}$", "$options": "i"}
 
-    access_query = {"$or": [{"readers": {"$in": groups}}, {"writers": {"$in": groups}}]}
-    results = await Collection.find(
-        {**access_query, "owner": owner_regex}, fetch_links=fetch_links
-    ).to_list()
+    results = (
+        await Collection.find(
+            {**access_query(groups), "owner": owner_regex},
+            after(cursor),
+            fetch_links=fetch_links,
+        )
+        .sort([("_id", 1)])
+        .to_list(None if limit is None else limit + 1)
+    )
+
+    results, cursor = next_cursor(results, limit)
 
     filtered_collection_list = await collection_product_filter(groups, results)
-    return filtered_collection_list
+    return filtered_collection_list, cursor
 
 
 async def diff(
@@ -134,16 +337,23 @@ async def update(
     name: str | None,
     description: str | None,
 ):
-    collection = await read(id=id, groups=access_groups)
+    collection = await read(id=id, groups=access_groups, fetch_links=False)
     assert check_user_access(access_groups, collection.writers)
 
+    changes = {}
+
     if name:
         collection.name = name
+        changes["name"] = name
 
     if description:
         collection.description = description
+        changes["description"] = description
 
-    await collection.save()
+    if changes:
+        await Collection.find_one(Collection.id == collection.id).update(
+            {"$set": changes}
+        )
 
     return collection
 
@@ -157,7 +367,9 @@ async def add_child(
     child = await read(id=child_id, groups=groups)
     assert check_user_access(groups, parent.writers)
     parent.child_collections.append(child)
-    await parent.save()
+    await Collection.find_one(Collection.id == parent.id).update(
+        {"$addToSet": {"child_collections": child.to_ref()}}
+    )
 
     return parent
 
@@ -169,11 +381,12 @@ async def remove_child(
 ) -> Collection:
     parent = await read(id=parent_id, groups=groups)
     assert check_user_access(groups, parent.writers)
-    await parent.set(
+    parent.child_collections = [x for x in parent.child_collections if x.id != child_id]
+    await Collection.find_one(Collection.id == parent.id).update(
         {
-            Collection.child_collections: [
-                x for x in parent.child_collections if x.id != child_id
-            ]
+            "$pull": {
+                "child_collections": DBRef(Collection.get_collection_name(), child_id)
+            }
         }
     )
 
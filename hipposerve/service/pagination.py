@@ -0,0 +1,116 @@
+"""
+Keyset pagination for search results.
+
+Results are sorted by ``_id`` (or, for text searches, by text score and then
+``_id``), and a page is read by matching only the documents that sort after
+the last one on the previous page. Unlike skipping, this costs the same for
+every page. The position is handed to clients as an opaque cursor.
+"""
+
+import base64
+import binascii
+from typing import Any
+
+from beanie import PydanticObjectId
+from pydantic import BaseModel, ValidationError
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class Cursor(BaseModel):
+    """
+    The sort key of the last result on a page.
+    """
+
+    id: PydanticObjectId
+    score: float | None = None
+    "The text score, for text searches."
+
+    def encode(self) -> str:
+        return base64.urlsafe_b64encode(self.model_dump_json().encode()).decode()
+
+    @classmethod
+    def decode(cls, cursor: str) -> "Cursor":
+        """
+        Raises
+        ------
+        InvalidCursor
+            If this is not a cursor that we handed out.
+        """
+        try:
+            return cls.model_validate_json(base64.urlsafe_b64decode(cursor))
+        except (binascii.Error, ValueError, ValidationError):
+            raise InvalidCursor
+
+
+def keyset_stages(
+    cursor: Cursor | None, limit: int | None, text: bool = False
+) -> list[dict[str, Any]]:
+    """
+    The aggregation stages that sort, and read the page after ``cursor`` of,
+    the documents matched by earlier stages. One more document than the
+    ``limit`` is read, to tell whether there is another page.
+    """
+
+    if text:
+        stages = [{"$set": {"score": {"$meta": "textScore"}}}]
+        sort = {"score": -1, "_id": 1}
+
+        if cursor is not None:
+            stages.append(
+                {
+                    "$match": {
+                        "$or": [
+                            {"score": {"$lt": cursor.score}},
+                            {"score": cursor.score, "_id": {"$gt": cursor.id}},
+                        ]
+                    }
+                }
+            )
+    else:
+        stages = []
+        sort = {"_id": 1}
+
+        if cursor is not None:
+            stages.append({"$match": {"_id": {"$gt": cursor.id}}})
+
+    stages.append({"$sort": sort})
+
+    if limit is not None:
+        stages.append({"$limit": limit + 1})
+
+    return stages
+
+
+def after(cursor: Cursor | None) -> dict[str, Any]:
+    """
+    The query matching the documents after ``cursor``, for searches sorted
+    by ``_id`` alone.
+    """
+
+    return {} if cursor is None else {"_id": {"$gt": cursor.id}}
+
+
+def next_cursor(
+    results: list[Any], limit: int | None, text: bool = False
+) -> tuple[list[Any], Cursor | None]:
+    """
+    Trim the extra result read by ``keyset_stages`` from a page, and find the
+    cursor for the next page (None if this is the last). Results may be raw
+    documents or models.
+    """
+
+    if limit is None or len(results) <= limit:
+        return results, None
+
+    results = results[:limit]
+    last = results[-1]
+
+    if isinstance(last, dict):
+        cursor = Cursor(id=last["_id"], score=last.get("score") if text else None)
+    else:
+        cursor = Cursor(id=last.id)
+
+    return results, cursor
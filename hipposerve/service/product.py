@@ -2,34 +2,42 @@
 The product service layer.
 """
 
+import asyncio
 import datetime
 import re
 from typing import Any, Literal
 
-from beanie import Link, PydanticObjectId, WriteRules
+from beanie import Link, PydanticObjectId
 from beanie.operators import Text
 from bson.errors import InvalidId
 from loguru import logger
-from pydantic import BaseModel
 from pydantic_core import ValidationError
+from pymongo.errors import DuplicateKeyError
 
 from hippometa import ALL_METADATA_TYPE, SimpleMetadata
 from hipposerve.database import (
     Collection,
     CollectionPolicy,
     File,
+    FileMetadata,
     Product,
+    ProductLineage,
     ProductMetadata,
 )
 from hipposerve.service import storage as storage_service
 from hipposerve.service import utils, versioning
-from hipposerve.service.acl import check_user_access
+from hipposerve.service.acl import access_query, check_user_access
+from hipposerve.service.pagination import Cursor, after, keyset_stages, next_cursor
+from hipposerve.service.query import compile_query
 from hipposerve.storage import Storage
+from hipposerve.wire import (
+    PostUploadFile,
+    PreUploadFile,
+    ProductQuery,
+    ResumeUpload,
+)
 
 INITIAL_VERSION = "1.0.0"
-LINK_POLICY = {
-    "fetch_links": True,
-}
 
 
 class ProductExists(Exception):
@@ -40,49 +48,42 @@ class ProductNotFound(Exception):
     pass
 
 
-class PreUploadFile(BaseModel):
-    name: str
-    size: int
-    checksum: str
-    description: str | None = None
-
-
-class PostUploadFile(BaseModel):
-    uuid: str
-    name: str
-    size: int
-    slug: str
-    checksum: str
-    url: str | None
-    description: str | None
-    object_name: str | None
-    available: bool
-
-
 async def presign_uploads(
     sources: dict[str, PreUploadFile],
     storage: Storage,
     user_name: str,
     mutlipart_size: int = 50 * 1024 * 1024,
+    part_url_limit: int | None = None,
 ) -> tuple[dict[str, list[str]], dict[str, File]]:
     """
     Note that upload pre-signing does _not_ validate sources' slugs as it does not
-    know about the metadata type.
+    know about the metadata type. Sources are pre-signed concurrently. Only the
+    first ``part_url_limit`` part URLs of each source are signed, if given; see
+    ``storage_service.part_urls`` for the rest.
     """
     presigned = {}
     pre_upload_sources = {}
 
-    for slug, source in sources.items():
-        pre_upload_source, presigned_urls = await storage_service.create(
-            name=source.name,
-            description=source.description,
-            slug=slug,
-            uploader=user_name,
-            size=source.size,
-            checksum=source.checksum,
-            storage=storage,
+    created = await asyncio.gather(
+        *(
+            storage_service.create(
+                name=source.name,
+                description=source.description,
+                slug=slug,
+                uploader=user_name,
+                size=source.size,
+                checksum=source.checksum,
+                storage=storage,
+                multipart_size=mutlipart_size,
+                part_url_limit=part_url_limit,
+            )
+            for slug, source in sources.items()
         )
+    )
 
+    for (slug, source), (pre_upload_source, presigned_urls) in zip(
+        sources.items(), created
+    ):
         presigned[source.name] = presigned_urls
         pre_upload_sources[slug] = pre_upload_source
 
@@ -91,11 +92,11 @@ async def presign_uploads(
 
 async def exists(name: str) -> bool:
     """
-    Check whether a product exists with this name.
-    Product names are unique but this cannot be enforced at the
-    database level due to versioning.
+    Check whether a product exists with this name. Any version of a product
+    reserves its name; the partial index on current names only stops two
+    current products from sharing one (e.g. when creates race).
     """
-    return (await Product.find(Product.name == name).count()) > 0
+    return await Product.find(Product.name == name).exists()
 
 
 def validate_slugs(sources: dict[str, PreUploadFile], metadata: ALL_METADATA_TYPE):
@@ -128,6 +129,7 @@ async def create(
     product_readers: list[str] | None = None,
     product_writers: list[str] | None = None,
     mutlipart_size: int = 50 * 1024 * 1024,
+    part_url_limit: int | None = None,
 ) -> tuple[Product, dict[str, list[str]]]:
     if metadata is None:
         metadata = SimpleMetadata()
@@ -139,6 +141,7 @@ async def create(
         storage=storage,
         user_name=user_name,
         mutlipart_size=mutlipart_size,
+        part_url_limit=part_url_limit,
     )
 
     current_utc_time = datetime.datetime.now(datetime.timezone.utc)
@@ -159,29 +162,47 @@ async def create(
         collections=[],
         readers=set(product_readers or []) | {user_name},
         writers=set(product_writers or []) | {user_name},
+        lineage=PydanticObjectId(),
     )
 
-    await product.create()
+    try:
+        await product.create()
+    except DuplicateKeyError:
+        # Lost a race with another create of the same name.
+        raise ProductExists
+
+    try:
+        await ProductLineage(
+            id=product.lineage, current=product.id, versions=[product.id]
+        ).insert()
+    except BaseException:
+        # A product must never point at a lineage that does not exist.
+        await product.delete()
+        raise
 
     return product, presigned
 
 
-async def read_by_name(name: str, version: str | None, groups: list[str]) -> Product:
+async def read_by_name(
+    name: str, version: str | None, groups: list[str], fetch_links: bool = True
+) -> Product:
     """
-    If version is None, we grab the latest version of a product.
+    If version is None, we grab the latest version of a product. Only
+    fetch links if you need the linked documents themselves; for the metadata,
+    prefer ``read_metadata_by_id``.
     """
 
     if version is None:
         potential = await Product.find_one(
             Product.name == name,
             Product.current == True,  # noqa: E712
-            **LINK_POLICY,
+            fetch_links=fetch_links,
         )
     else:
         potential = await Product.find_one(
             Product.name == name,
             Product.version == version,
-            **LINK_POLICY,
+            fetch_links=fetch_links,
         )
 
     if potential is None:
@@ -194,9 +215,11 @@ async def read_by_name(name: str, version: str | None, groups: list[str]) -> Pro
     return potential
 
 
-async def read_by_id(id: PydanticObjectId, groups: list[str]) -> Product:
+async def read_by_id(
+    id: PydanticObjectId, groups: list[str], fetch_links: bool = True
+) -> Product:
     try:
-        potential = await Product.get(document_id=id, **LINK_POLICY)
+        potential = await Product.get(document_id=id, fetch_links=fetch_links)
     except (InvalidId, ValidationError):
         raise ProductNotFound
 
@@ -216,10 +239,9 @@ async def search_by_name(
     """
     Search for products by name using the text index.
     """
-    access_query = {"$or": [{"readers": {"$in": groups}}, {"writers": {"$in": groups}}]}
     results = (
         await Product.find(
-            access_query,
+            access_query(groups),
             Text(name),
             Product.current == True,  # noqa: E712
             fetch_links=fetch_links,
@@ -232,61 +254,369 @@ async def search_by_name(
 
 
 async def search_by_metadata(
-    metadata_filters: dict[str, Any], groups: list[str], fetch_links: bool = True
-) -> list[Product]:
+    metadata_filters: dict[str, Any],
+    groups: list[str],
+    fetch_links: bool = True,
+    limit: int | None = None,
+    cursor: Cursor | None = None,
+) -> tuple[list[Product], Cursor | None]:
     """
-    Search for products by metadata.
+    Search for products by metadata. Returns a page of at most `limit`
+    products (all of them if None) after the `cursor`, and the cursor
+    for the next page (None if this is the last).
     """
-    access_query = {"$or": [{"readers": {"$in": groups}}, {"writers": {"$in": groups}}]}
     # Construct the query by embedding metadata field names and values
     query = {f"metadata.{key}": value for key, value in metadata_filters.items()}
 
     # Execute the query
-    results = await Product.find(access_query, query, fetch_links=fetch_links).to_list()
-    return results
+    results = (
+        await Product.find(
+            access_query(groups), query, after(cursor), fetch_links=fetch_links
+        )
+        .sort([("_id", 1)])
+        .to_list(None if limit is None else limit + 1)
+    )
+
+    return next_cursor(results, limit)
 
 
 async def search_by_owner(
     owner: str,
     groups: list[str],
     fetch_links: bool = True,
-) -> list[Collection]:
+    limit: int | None = None,
+    cursor: Cursor | None = None,
+) -> tuple[list[Product], Cursor | None]:
     """
     Search for products by owner; owner search is case insensitive
-    but must otherwise be an exact match
+    but must otherwise be an exact match. Paged like `search_by_metadata`.
     """
 
     owner_regex = {"$regex": f"^{re.escape(owner)}$", "$options": "i"}
 
-    access_query = {"$or": [{"readers": {"$in": groups}}, {"writers": {"$in": groups}}]}
+    results = (
+        await Product.find(
+            {**access_query(groups), "owner": owner_regex},
+            Product.current == True,  # noqa: E712
+            after(cursor),
+            fetch_links=fetch_links,
+        )
+        .sort([("_id", 1)])
+        .to_list(None if limit is None else limit + 1)
+    )
 
-    results = await Product.find(
-        {**access_query, "owner": owner_regex},
-        Product.current == True,  # noqa: E712
-        fetch_links=fetch_links,
+    return next_cursor(results, limit)
+
+
+async def _read_versions(
+    product: Product, older: bool = True, newer: bool = True
+) -> list[dict[str, Any]]:
+    """
+    Read the raw documents for the versions of a product that are ``older``
+    and/or ``newer`` than this one, in a single aggregation. Each document also
+    has a ``parent_of`` list of the IDs of the products that are its children.
+    The versions are returned newest first.
+
+    Products with a lineage are read through its index; for older products we
+    follow the ``replaces`` chain with ``$graphLookup``.
+    """
+
+    collection = Product.get_collection_name()
+
+    if product.lineage is not None:
+        pipeline = [{"$match": {"lineage": product.lineage}}]
+    else:
+        chain = {
+            "from": collection,
+            "connectToField": "_id",
+            "connectFromField": "replaces.$id",
+            "startWith": "$replaces.$id",
+            "as": "older",
+        }
+
+        reverse_chain = {
+            "from": collection,
+            "connectToField": "replaces.$id",
+            "connectFromField": "_id",
+            "startWith": "$_id",
+            "as": "newer",
+        }
+
+        pipeline = [
+            {"$match": {"_id": product.id}},
+            {"$graphLookup": chain} if older else {"$set": {"older": []}},
+            {"$graphLookup": reverse_chain} if newer else {"$set": {"newer": []}},
+            {
+                "$project": {
+                    "versions": {"$concatArrays": [["$$ROOT"], "$older", "$newer"]}
+                }
+            },
+            {"$unwind": "$versions"},
+            {"$replaceRoot": {"newRoot": "$versions"}},
+            {"$project": {"older": 0, "newer": 0}},
+        ]
+
+    pipeline.append(_children_lookup())
+
+    documents = await Product.aggregate(pipeline).to_list()
+
+    # Order the versions by following the chain back from the newest, which
+    # is the only version that nothing replaces.
+    by_id = {x["_id"]: x for x in documents}
+    replaced = {x["replaces"].id for x in documents if x.get("replaces") is not None}
+
+    version = next((x for x in documents if x["_id"] not in replaced), None)
+    versions = []
+
+    while version is not None:
+        versions.append(version)
+        replaces = version.get("replaces")
+        version = None if replaces is None else by_id.get(replaces.id)
+
+    ids = [x["_id"] for x in versions]
+
+    if product.id in ids:
+        position = ids.index(product.id)
+        versions = versions[
+            (0 if newer else position) : (None if older else position + 1)
+        ]
+
+    return versions
+
+
+async def _ensure_lineage(product: Product) -> PydanticObjectId:
+    """
+    Get the ID of the lineage of a product, creating it (and tagging every
+    version with it) for products that pre-date lineages.
+    """
+
+    if product.lineage is not None:
+        return product.lineage
+
+    versions = await _read_versions(product)
+
+    lineage = ProductLineage(
+        current=next(x["_id"] for x in versions if x["current"]),
+        versions=[x["_id"] for x in reversed(versions)],
+    )
+
+    await lineage.insert()
+
+    await Product.find({"_id": {"$in": lineage.versions}}).update(
+        {"$set": {"lineage": lineage.id}}
+    )
+
+    product.lineage = lineage.id
+
+    return lineage.id
+
+
+def _children_lookup() -> dict[str, Any]:
+    """
+    A ``$lookup`` stage adding the IDs of a product's children as ``parent_of``
+    (which is a back-link, so is not stored on the product).
+    """
+
+    return {
+        "$lookup": {
+            "from": Product.get_collection_name(),
+            "localField": "_id",
+            "foreignField": "child_of.$id",
+            "pipeline": [{"$project": {"_id": 1}}],
+            "as": "parent_of",
+        }
+    }
+
+
+def _metadata_stages() -> list[dict[str, Any]]:
+    """
+    Aggregation stages that add everything that ``_metadata_from_document``
+    needs beyond the product's own document: the version of the product that
+    it replaces, and the IDs of its children. Nothing else is fetched.
+    """
+
+    return [
+        {"$project": {"acl": 0, "collection_policies": 0, "lineage": 0}},
+        {
+            "$lookup": {
+                "from": Product.get_collection_name(),
+                "localField": "replaces.$id",
+                "foreignField": "_id",
+                "pipeline": [{"$project": {"_id": 0, "version": 1}}],
+                "as": "replaces_version",
+            }
+        },
+        {
+            "$set": {
+                "replaces_version": {"$arrayElemAt": ["$replaces_version.version", 0]}
+            }
+        },
+        _children_lookup(),
+    ]
+
+
+def _metadata_from_document(document: dict[str, Any]) -> ProductMetadata:
+    """
+    Build the metadata for a product from its raw document, without fetching
+    any of its links. The document must have been through ``_metadata_stages``,
+    or otherwise have ``replaces_version`` and ``parent_of`` set.
+    """
+
+    return ProductMetadata(
+        id=document["_id"],
+        name=document["name"],
+        description=document["description"],
+        metadata=document["metadata"],
+        uploaded=document["uploaded"],
+        updated=document["updated"],
+        current=document["current"],
+        version=document["version"],
+        sources={
+            slug: FileMetadata(**{**source, "id": source["_id"]})
+            for slug, source in document["sources"].items()
+        },
+        owner=document["owner"],
+        readers=document.get("readers", []),
+        writers=document.get("writers", []),
+        replaces=document.get("replaces_version"),
+        child_of=[x.id for x in document.get("child_of", [])],
+        parent_of=[x["_id"] for x in document.get("parent_of", [])],
+        collections=[x.id for x in document.get("collections", [])],
+    )
+
+
+def _metadata_from_documents(
+    documents: list[dict[str, Any]],
+) -> dict[str, ProductMetadata]:
+    """
+    Build the metadata for a list of versions of the same product, which
+    between them hold the versions that each one replaces.
+    """
+
+    versions_by_id = {x["_id"]: x["version"] for x in documents}
+
+    for document in documents:
+        if document.get("replaces") is not None:
+            document["replaces_version"] = versions_by_id.get(document["replaces"].id)
+
+    return {x["version"]: _metadata_from_document(x) for x in documents}
+
+
+async def read_metadata_by_id(
+    id: PydanticObjectId, groups: list[str]
+) -> ProductMetadata:
+    """
+    Read the metadata of a product in a single aggregation, rather than
+    fetching all of its links as ``read_by_id`` does.
+    """
+
+    try:
+        id = PydanticObjectId(id)
+    except (InvalidId, TypeError):
+        raise ProductNotFound
+
+    documents = await Product.aggregate(
+        [{"$match": {"_id": id}}, *_metadata_stages()]
     ).to_list()
 
-    return results
+    if not documents:
+        raise ProductNotFound
+
+    metadata = _metadata_from_document(documents[0])
+
+    assert check_user_access(
+        user_groups=groups, document_groups=metadata.readers + metadata.writers
+    )
+
+    return metadata
+
+
+async def search_metadata_by_name(
+    name: str,
+    groups: list[str],
+    limit: int | None = None,
+    cursor: Cursor | None = None,
+) -> tuple[list[ProductMetadata], Cursor | None]:
+    """
+    Search for products by name using the text index, like ``search_by_name``,
+    returning their metadata from a single aggregation. Returns a page of at
+    most ``limit`` products (all of them if None), best matches first, after
+    the ``cursor``, and the cursor for the next page (None if this is the last).
+    """
+
+    documents = await Product.aggregate(
+        [
+            {
+                "$match": {
+                    "$text": {"$search": name},
+                    "current": True,
+                    **access_query(groups),
+                }
+            },
+            *keyset_stages(cursor, limit, text=True),
+            *_metadata_stages(),
+        ]
+    ).to_list()
+
+    documents, cursor = next_cursor(documents, limit, text=True)
+
+    return [_metadata_from_document(x) for x in documents], cursor
+
+
+async def query_metadata(
+    query: ProductQuery,
+    groups: list[str],
+    limit: int | None = None,
+    cursor: Cursor | None = None,
+) -> tuple[list[ProductMetadata], Cursor | None]:
+    """
+    Find the current products matching a typed metadata query, returning
+    their metadata from a single aggregation. Paged like
+    ``search_by_metadata``.
+
+    Raises
+    ------
+    InvalidQuery
+        If the query does not match the fields of its metadata type.
+    """
+
+    documents = await Product.aggregate(
+        [
+            {
+                "$match": {
+                    **compile_query(query),
+                    "current": True,
+                    **access_query(groups),
+                }
+            },
+            *keyset_stages(cursor, limit),
+            *_metadata_stages(),
+        ]
+    ).to_list()
+
+    documents, cursor = next_cursor(documents, limit)
+
+    return [_metadata_from_document(x) for x in documents], cursor
 
 
 async def walk_history(product: Product) -> dict[str, ProductMetadata]:
     """
     Walk the history of the product from this point backwards.
     It is recommended that you walk to the current version first,
-    to get the whole history.
+    to get the whole history. Uses a single database query.
     """
-    versions = {}
 
-    while product.replaces is not None:
-        versions[product.version] = await product.to_metadata()
-        product = product.replaces
+    return _metadata_from_documents(await _read_versions(product, newer=False))
 
-        if isinstance(product, Link):
-            product = await product.fetch(fetch_links=True)
 
-    versions[product.version] = await product.to_metadata()
+async def read_tree(product: Product) -> dict[str, ProductMetadata]:
+    """
+    Read every version of the product, both older and newer than this one,
+    in a single database query. Versions are ordered newest first, and
+    exactly one of them should be current.
+    """
 
-    return versions
+    return _metadata_from_documents(await _read_versions(product))
 
 
 async def walk_to_current(product: Product, groups: list[str]) -> Product:
@@ -295,19 +625,27 @@ async def walk_to_current(product: Product, groups: list[str]) -> Product:
     marked 'current'.
     """
 
-    # Re-read the product from the database, in case it
-    # is stale!
-    product = await read_by_id(id=product.id, groups=groups)
+    # Find the current version, then re-read it in full, in case the product
+    # we were given is stale!
+    if product.lineage is not None:
+        lineage = await ProductLineage.get(product.lineage)
 
-    while not product.current:
-        product = await Product.find_one(
-            Product.replaces.id == product.id, **LINK_POLICY
-        )
+        if lineage is None:
+            raise ProductNotFound
 
-        if product is None:  # pragma: no cover
-            raise RuntimeError
+        return await read_by_id(id=lineage.current, groups=groups)
 
-    return product
+    versions = await _read_versions(product, older=False)
+
+    current = [x for x in versions if x["current"]]
+
+    if not current:
+        if not versions:
+            raise ProductNotFound
+
+        raise RuntimeError  # pragma: no cover
+
+    return await read_by_id(id=current[0]["_id"], groups=groups)
 
 
 async def complete(
@@ -316,33 +654,120 @@ async def complete(
     headers: dict[str, list[dict[str, str]]],
     sizes: dict[str, list[int]],
 ) -> bool:
-    for file in product.sources.values():
-        if file.multipart_closed:
-            continue
-
-        await storage_service.complete(
-            file=file,
-            storage=storage,
-            response_headers=headers[file.name],
-            sizes=sizes[file.name],
+    """
+    Complete the multipart uploads of all of a product's open sources,
+    concurrently, then record that they are closed in a single write. If any
+    fail, those that did complete are still recorded (their upload IDs are
+    gone, so they could never be completed again) before the first error is
+    raised.
+    """
+
+    open_sources = {
+        slug: file
+        for slug, file in product.sources.items()
+        if not file.multipart_closed
+    }
+
+    results = await asyncio.gather(
+        *(
+            storage_service.complete(
+                file=file,
+                storage=storage,
+                response_headers=headers[file.name],
+                sizes=sizes[file.name],
+            )
+            for file in open_sources.values()
+        ),
+        return_exceptions=True,
+    )
+
+    closed = [
+        slug
+        for slug, result in zip(open_sources, results)
+        if not isinstance(result, BaseException)
+    ]
+
+    if closed:
+        await Product.find_one(Product.id == product.id).update(
+            {"$set": {f"sources.{slug}.multipart_closed": True for slug in closed}}
         )
 
-        file.multipart_closed = True
-        await file.save()
+    for slug in closed:
+        open_sources[slug].multipart_closed = True
+
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
 
     return True
 
 
+async def resume(
+    product: Product, storage: Storage, count: int
+) -> dict[str, ResumeUpload]:
+    """
+    Find how far the uploads of a product's open sources got, so that an
+    interrupted upload can carry on where it left off. Each source is given
+    pre-signed URLs for up to ``count`` of its missing parts. Returns the
+    state of each open source, keyed by file name.
+    """
+
+    open_sources = [
+        file
+        for file in product.sources.values()
+        if not file.multipart_closed and file.upload_id is not None
+    ]
+
+    resumed = await asyncio.gather(
+        *(
+            storage_service.resume(file=file, storage=storage, count=count)
+            for file in open_sources
+        )
+    )
+
+    return {
+        file.name: ResumeUpload(
+            slug=file.slug,
+            size=file.size,
+            checksum=file.checksum,
+            part_size=file.multipart_batch_size,
+            number_of_parts=file.number_of_parts,
+            parts=parts,
+            upload_urls=upload_urls,
+        )
+        for file, (parts, upload_urls) in zip(open_sources, resumed)
+    }
+
+
+async def confirm_sources(product: Product, storage: Storage) -> dict[str, bool]:
+    """
+    Check which of a product's sources have been uploaded in full, with the
+    expected size. Returns the result for each source, keyed by slug.
+    """
+
+    return await storage_service.confirm_many(files=product.sources, storage=storage)
+
+
 async def confirm(product: Product, storage: Storage) -> bool:
-    for slug, file in product.sources.items():
-        if not await storage_service.confirm(file=file, storage=storage):
-            logger.debug(f"File {file.name} ({slug}) not confirmed")
-            return False
+    confirmed = await confirm_sources(product=product, storage=storage)
 
-    return True
+    for slug, present in confirmed.items():
+        if not present:
+            logger.debug(f"File {product.sources[slug].name} ({slug}) not confirmed")
+
+    return all(confirmed.values())
 
 
-async def read_files(product: Product, storage: Storage) -> dict[str, PostUploadFile]:
+async def read_files(
+    product: Product | ProductMetadata, storage: Storage
+) -> dict[str, PostUploadFile]:
+    # Sign the download URLs for all of the available sources at once.
+    available = {slug: x for slug, x in product.sources.items() if x.available}
+    urls = await asyncio.gather(
+        *(storage_service.read(file=x, storage=storage) for x in available.values())
+    )
+    urls = dict(zip(available, urls))
+
     return {
         slug: PostUploadFile(
             uuid=x.uuid,
@@ -351,11 +776,7 @@ async def read_files(product: Product, storage: Storage) -> dict[str, PostUpload
             slug=x.slug,
             checksum=x.checksum,
             description=x.description,
-            url=storage.get(
-                name=x.name, uploader=x.uploader, uuid=x.uuid, bucket=x.bucket
-            )
-            if x.available
-            else None,
+            url=urls.get(slug),
             object_name=storage.object_name(
                 filename=x.name, uploader=x.uploader, uuid=x.uuid
             )
@@ -373,12 +794,11 @@ async def read_most_recent(
     maximum: int = 16,
     current_only: bool = False,
 ) -> list[Product]:
-    access_query = {"$or": [{"readers": {"$in": groups}}, {"writers": {"$in": groups}}]}
+
+    query = access_query(groups)
 
     if current_only:
-        query = {"$and": [{"current": True}, access_query]}
-    else:
-        query = access_query
+        query["current"] = True
 
     found = Product.find(
         query,
@@ -451,6 +871,11 @@ async def update_metadata(
             "make changes to the head of the list"
         )
 
+    if name is not None and name != product.name and await exists(name):
+        raise ProductExists
+
+    lineage = await _ensure_lineage(product)
+
     # We don't actually 'update' the database; we actually create a new
     # product and link it in.
 
@@ -482,10 +907,14 @@ async def update_metadata(
         ],
         readers=product.readers,
         writers=product.writers,
+        lineage=lineage,
     )
 
     # Need to perform a small number of modifications on the original
-    # product.
+    # product, which are undone if the new version cannot be written.
+    collections = product.collections
+    collection_policies = product.collection_policies
+
     product.current = False
     product.collections = [
         c
@@ -498,8 +927,47 @@ async def update_metadata(
         if p in [CollectionPolicy.ALL, CollectionPolicy.NEW, CollectionPolicy.FIXED]
     ]
 
-    await new.save(link_rule=WriteRules.WRITE)
-    await product.save(link_rule=WriteRules.WRITE)
+    # The old version must stop being current before the new one is written,
+    # as only one current version of a product may exist. Only the fields that
+    # changed are written; linked documents are untouched.
+    await Product.find_one(Product.id == product.id).update(
+        {
+            "$set": {
+                "current": False,
+                "collections": [x.to_ref() for x in product.collections],
+                "collection_policies": product.collection_policies,
+            }
+        }
+    )
+
+    try:
+        await new.insert()
+    except BaseException as e:
+        # Put the old version back, so that the product still has a current
+        # version.
+        product.current = True
+        product.collections = collections
+        product.collection_policies = collection_policies
+
+        await Product.find_one(Product.id == product.id).update(
+            {
+                "$set": {
+                    "current": True,
+                    "collections": [x.to_ref() for x in collections],
+                    "collection_policies": collection_policies,
+                }
+            }
+        )
+
+        if isinstance(e, DuplicateKeyError):
+            # Lost a race with another update (or create) of the same name.
+            raise ProductExists
+
+        raise
+
+    await ProductLineage.find_one(ProductLineage.id == lineage).update(
+        {"$set": {"current": new.id}, "$push": {"versions": new.id}}
+    )
 
     return new
 
@@ -510,6 +978,7 @@ async def update_sources(
     replace: dict[str, PreUploadFile],
     drop: list[str],
     storage: Storage,
+    part_url_limit: int | None = None,
 ) -> tuple[Product, dict[str, str]]:
     """
     Change the sources associated with a product. New and replace provide
@@ -538,10 +1007,14 @@ async def update_sources(
         sources=new,
         storage=storage,
         user_name=product.owner,
+        part_url_limit=part_url_limit,
     )
 
     presigned_replace, pre_upload_sources_replace = await presign_uploads(
-        sources=replace, storage=storage, user_name=product.owner
+        sources=replace,
+        storage=storage,
+        user_name=product.owner,
+        part_url_limit=part_url_limit,
     )
 
     presigned = {**presigned_new, **presigned_replace}
@@ -561,7 +1034,9 @@ async def update_sources(
 
     product.sources = {**pre_upload_sources, **keep_sources}
 
-    await product.save(link_rule=WriteRules.WRITE)
+    await Product.find_one(Product.id == product.id).update(
+        {"$set": {"sources": product.sources}}
+    )
 
     return product, presigned
 
@@ -577,6 +1052,7 @@ async def update(
     new_sources: dict[str, PreUploadFile] | None = None,
     replace_sources: dict[str, PreUploadFile] | None = None,
     drop_sources: list[str] | None = None,
+    part_url_limit: int | None = None,
 ) -> tuple[Product, dict[str, str]]:
     """
     Rev the version of the product and update its contents.
@@ -614,6 +1090,7 @@ async def update(
                 replace=replace_sources,
                 drop=drop_sources,
                 storage=storage,
+                part_url_limit=part_url_limit,
             )
         except Exception as e:
             # Need to roll-back our new product. Full transactions when?
@@ -642,12 +1119,9 @@ async def delete_one(
     if product.current:
         replaced_by = None
         replaces = product.replaces
-        if replaces is not None:
-            replaces.current = True
     else:
         replaced_by = await Product.find_one(Product.replaces.id == product.id)
         replaces = product.replaces
-        replaced_by.replaces = replaces
 
     # Deal with potentially newly ingested files
 
@@ -673,13 +1147,31 @@ async def delete_one(
             if file.uuid in net_source_uuids:
                 await storage_service.delete(file=file, storage=storage)
 
+    # Delete first, as `replaces` may be about to become the current version.
+    await product.delete()
+
     if replaced_by is not None:
-        await replaced_by.save()
+        await Product.find_one(Product.id == replaced_by.id).update(
+            {"$set": {"replaces": None if replaces is None else replaces.to_ref()}}
+        )
 
-    if replaces is not None:
-        await replaces.save()
+    if product.current and replaces is not None:
+        await Product.find_one(Product.id == replaces.id).update(
+            {"$set": {"current": True}}
+        )
 
-    await product.delete()
+    if product.lineage is not None:
+        lineage = ProductLineage.find_one(ProductLineage.id == product.lineage)
+
+        if replaces is None and replaced_by is None:
+            # This was the only version.
+            await lineage.delete()
+        elif product.current:
+            await lineage.update(
+                {"$set": {"current": replaces.id}, "$pull": {"versions": product.id}}
+            )
+        else:
+            await lineage.update({"$pull": {"versions": product.id}})
 
     return
 
@@ -700,6 +1192,7 @@ async def delete_tree(
             "Attempting to delete the tree starting from a non-current product"
         )
 
+    lineage = product.lineage
     uuids_to_delete = set()
     files_to_delete = []
     products_to_delete = []
@@ -724,6 +1217,9 @@ async def delete_tree(
     for product in products_to_delete:
         await product.delete()
 
+    if lineage is not None:
+        await ProductLineage.find_one(ProductLineage.id == lineage).delete()
+
     return
 
 
@@ -733,10 +1229,13 @@ async def add_relationship(
     access_groups: list[str],
     type: Literal["child"],
 ):
+    assert check_user_access(user_groups=access_groups, document_groups=source.writers)
+
     if type == "child":
         source.child_of = source.child_of + [destination]
-    assert check_user_access(user_groups=access_groups, document_groups=source.writers)
-    await source.save()
+        await Product.find_one(Product.id == source.id).update(
+            {"$addToSet": {"child_of": destination.to_ref()}}
+        )
 
     return
 
@@ -747,10 +1246,13 @@ async def remove_relationship(
     access_groups: list[str],
     type: Literal["child"],
 ):
+    assert check_user_access(user_groups=access_groups, document_groups=source.writers)
+
     if type == "child":
         source.child_of = [c for c in source.child_of if c.id != destination.id]
-    assert check_user_access(user_groups=access_groups, document_groups=source.writers)
-    await source.save()
+        await Product.find_one(Product.id == source.id).update(
+            {"$pull": {"child_of": destination.to_ref()}}
+        )
 
     return
 
@@ -758,9 +1260,12 @@ async def remove_relationship(
 async def add_collection(
     product: Product, access_groups: list[str], collection: Collection
 ):
-    product.collections = product.collections + [collection]
     assert check_user_access(user_groups=access_groups, document_groups=product.writers)
-    await product.save()
+
+    product.collections = product.collections + [collection]
+    await Product.find_one(Product.id == product.id).update(
+        {"$addToSet": {"collections": collection.to_ref()}}
+    )
 
     return
 
@@ -768,8 +1273,11 @@ async def add_collection(
 async def remove_collection(
     product: Product, access_groups: list[str], collection: Collection
 ):
-    product.collections = [c for c in product.collections if c.id != collection.id]
     assert check_user_access(user_groups=access_groups, document_groups=product.writers)
-    await product.save()
+
+    product.collections = [c for c in product.collections if c.id != collection.id]
+    await Product.find_one(Product.id == product.id).update(
+        {"$pull": {"collections": collection.to_ref()}}
+    )
 
     return product
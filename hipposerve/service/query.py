@@ -0,0 +1,195 @@
+"""
+Compilation of typed metadata queries into MongoDB filters.
+
+A ``ProductQuery`` names a metadata type and holds predicates on that type's
+fields. Each predicate is checked against the field on the matching
+``hippometa`` model, and its values are converted to the field's type, so
+that e.g. numeric ranges compare numbers and date ranges compare dates.
+Predicates compile to filters that can use an index on the field: prefixes
+become anchored, case sensitive regular expressions.
+"""
+
+import re
+from functools import cache
+from types import UnionType
+from typing import Any, Literal, Union, get_args, get_origin
+
+from pydantic import TypeAdapter, ValidationError
+from pydantic.fields import FieldInfo
+
+from hippometa import ALL_METADATA
+from hipposerve.wire import (
+    EqualPredicate,
+    ExistsPredicate,
+    InPredicate,
+    MetadataPredicate,
+    PrefixPredicate,
+    ProductQuery,
+    RangePredicate,
+)
+
+
+class InvalidQuery(Exception):
+    pass
+
+
+def _alternatives(annotation: Any) -> list[Any]:
+    """
+    The types in a (possibly optional) union, other than None.
+    """
+
+    if get_origin(annotation) in (Union, UnionType):
+        return [x for x in get_args(annotation) if x is not type(None)]
+
+    return [annotation]
+
+
+def _field(metadata_type: str, field: str) -> FieldInfo:
+    """
+    Raises
+    ------
+    InvalidQuery
+        If there is no such metadata type or field.
+    """
+
+    metadata_class = ALL_METADATA.get(metadata_type)
+
+    if metadata_class is None:
+        raise InvalidQuery(f"Unknown metadata type {metadata_type}")
+
+    field_info = metadata_class.model_fields.get(field)
+
+    if field_info is None or field == "metadata_type":
+        raise InvalidQuery(f"Metadata type {metadata_type} has no field {field}")
+
+    return field_info
+
+
+@cache
+def _element_type(metadata_type: str, field: str) -> Any:
+    """
+    The type of the values that a field can be compared with. For list
+    fields, this is the type of their elements, as MongoDB matches a list
+    if any one of its elements matches.
+
+    Raises
+    ------
+    InvalidQuery
+        If there is no such metadata type or field, or the field cannot be
+        compared with values.
+    """
+
+    field_info = _field(metadata_type, field)
+    alternatives = []
+
+    for alternative in _alternatives(field_info.annotation):
+        origin = get_origin(alternative)
+
+        if origin is list:
+            alternatives.append(get_args(alternative)[0])
+        elif origin is dict:
+            raise InvalidQuery(f"Field {field} can only be queried for existence")
+        else:
+            alternatives.append(alternative)
+
+    return Union[tuple(alternatives)]
+
+
+def _accepts_strings(element_type: Any) -> bool:
+    for alternative in _alternatives(element_type):
+        if alternative is str:
+            return True
+
+        if get_origin(alternative) is Literal and all(
+            isinstance(x, str) for x in get_args(alternative)
+        ):
+            return True
+
+    return False
+
+
+def _compile_predicate(
+    metadata_type: str, field: str, predicate: MetadataPredicate
+) -> dict[str, Any]:
+    """
+    The MongoDB filter on ``metadata.<field>`` for a single predicate.
+    """
+
+    if isinstance(predicate, ExistsPredicate):
+        _field(metadata_type, field)
+
+        # Unset optional fields are stored as null, so only a value counts.
+        return {"$ne": None} if predicate.exists else {"$eq": None}
+
+    element_type = _element_type(metadata_type, field)
+    adapter = TypeAdapter(element_type)
+
+    def convert(value: Any) -> Any:
+        try:
+            return adapter.validate_python(value)
+        except ValidationError:
+            raise InvalidQuery(f"Invalid value for field {field}: {value!r}")
+
+    if isinstance(predicate, EqualPredicate):
+        return {"$eq": convert(predicate.value)}
+
+    if isinstance(predicate, InPredicate):
+        return {"$in": [convert(x) for x in predicate.values]}
+
+    if isinstance(predicate, RangePredicate):
+        if predicate.minimum is None and predicate.maximum is None:
+            raise InvalidQuery(f"Range on field {field} has no bounds")
+
+        bounds = {}
+
+        if predicate.minimum is not None:
+            bounds["$gte"] = convert(predicate.minimum)
+
+        if predicate.maximum is not None:
+            bounds["$lte"] = convert(predicate.maximum)
+
+        return bounds
+
+    if isinstance(predicate, PrefixPredicate):
+        if not _accepts_strings(element_type):
+            raise InvalidQuery(f"Field {field} is not a string field")
+
+        return {"$regex": f"^{re.escape(predicate.prefix)}"}
+
+    raise InvalidQuery(f"Unknown predicate on field {field}")
+
+
+def compile_query(query: ProductQuery) -> dict[str, Any]:
+    """
+    Compile a metadata query into a MongoDB filter on products.
+
+    Arguments
+    ---------
+    query : ProductQuery
+        The metadata type and the predicates on its fields.
+
+    Returns
+    -------
+    dict[str, Any]
+        The filter, matching products with metadata of the given type that
+        match all of the predicates.
+
+    Raises
+    ------
+    InvalidQuery
+        If the metadata type or any of the fields do not exist, or a
+        predicate's values cannot be converted to the field's type.
+    """
+
+    if query.metadata_type not in ALL_METADATA:
+        raise InvalidQuery(f"Unknown metadata type {query.metadata_type}")
+
+    return {
+        "metadata.metadata_type": query.metadata_type,
+        **{
+            f"metadata.{field}": _compile_predicate(
+                query.metadata_type, field, predicate
+            )
+            for field, predicate in query.predicates.items()
+        },
+    }
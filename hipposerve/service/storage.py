@@ -2,14 +2,18 @@
 Service drivers for interacting with the storage layer.
 """
 
+import asyncio
 import os
 import uuid
+from functools import partial
 from math import ceil
+from typing import Callable, TypeVar
 
-from asyncer import asyncify
+from loguru import logger
 
 from hipposerve.database import File
 from hipposerve.storage import Storage
+from hipposerve.wire import UploadedPart
 
 
 # TODO: Settings
@@ -19,6 +23,64 @@ def UUID():
 
 GLOBAL_BUCKET_NAME = "global"
 
+# S3's limits on multipart uploads. All parts but the last must be at least the
+# minimum size.
+MINIMUM_PART_SIZE = 5 * 1024 * 1024
+MAXIMUM_PART_SIZE = 5 * 1024 * 1024 * 1024
+MAXIMUM_PARTS = 10_000
+
+TARGET_PARTS = 5_000
+"Sources that would need more parts than this at the requested size get larger parts."
+
+T = TypeVar("T")
+
+
+class SourceTooLarge(Exception):
+    pass
+
+
+async def _run(storage: Storage, function: Callable[..., T], **kwargs) -> T:
+    """
+    Run a blocking storage call on the storage's own thread pool. The pool
+    bounds the requests in flight to the storage server, so many calls can be
+    gathered at once without starving anyio's shared thread limiter.
+    """
+
+    return await asyncio.get_running_loop().run_in_executor(
+        storage.executor, partial(function, **kwargs)
+    )
+
+
+def part_size(size: int, requested: int, grow: bool = False) -> int:
+    """
+    The size of the parts to upload a source of ``size`` bytes in. This is
+    the ``requested`` size, unless the source would then need more than
+    ``TARGET_PARTS`` parts (when ``grow`` is set) or ``MAXIMUM_PARTS`` parts,
+    in which case the parts are grown (in whole MiB) to fit. Parts always
+    stay within S3's limits.
+
+    Only clients that read the part size back from hippo may ``grow`` their
+    parts; older clients split sources by the size they requested.
+
+    Raises
+    ------
+    SourceTooLarge
+        If the source cannot be uploaded within S3's limits.
+    """
+
+    part = min(max(requested, MINIMUM_PART_SIZE), MAXIMUM_PART_SIZE)
+
+    target = TARGET_PARTS if grow else MAXIMUM_PARTS
+
+    if ceil(size / part) > target:
+        mebibyte = 1024 * 1024
+        part = min(ceil(size / target / mebibyte) * mebibyte, MAXIMUM_PART_SIZE)
+
+    if ceil(size / part) > MAXIMUM_PARTS:
+        raise SourceTooLarge
+
+    return part
+
 
 async def create(
     name: str,
@@ -29,19 +91,35 @@ async def create(
     checksum: str,
     storage: Storage,
     multipart_size: int = 50 * 1024 * 1024,
-) -> tuple[File, str]:
+    part_url_limit: int | None = None,
+) -> tuple[File, list[str]]:
+    """
+    Start the (multipart) upload of a file. The parts are ``multipart_size``,
+    or larger for very large files; see ``part_size``. Returns the file and
+    the pre-signed URLs for its first ``part_url_limit`` parts (all of them if
+    None). The rest can be signed later with ``part_urls``. Only clients that
+    give a ``part_url_limit`` read the part size back, so only their parts
+    grow to ``TARGET_PARTS``.
+    """
+
     # All uploads are now multipart.
     multipart = True
+    multipart_size = part_size(
+        size=size, requested=multipart_size, grow=part_url_limit is not None
+    )
     number_of_parts = int(ceil(size / multipart_size))
     uuid = UUID()
 
-    upload_id, put = await asyncify(storage.put)(
+    upload_id, put = await _run(
+        storage,
+        storage.put,
         name=name,
         uploader=uploader,
         uuid=uuid,
         bucket=GLOBAL_BUCKET_NAME,
         size=size,
         batch=multipart_size,
+        count=part_url_limit,
     )
 
     file = File(
@@ -65,6 +143,110 @@ async def create(
     return file, put
 
 
+async def part_urls(file: File, storage: Storage, start: int, count: int) -> list[str]:
+    """
+    Pre-sign the upload URLs for up to ``count`` parts of a file's open
+    multipart upload, starting from the (zero-based) part ``start``. Returns
+    fewer URLs (or none) past the end of the file.
+    """
+
+    count = min(count, file.number_of_parts - start)
+
+    if count <= 0:
+        return []
+
+    return await _run(
+        storage,
+        storage.part_urls,
+        name=file.name,
+        uploader=file.uploader,
+        uuid=file.uuid,
+        bucket=file.bucket,
+        upload_id=file.upload_id,
+        start=start,
+        count=count,
+    )
+
+
+def _part_runs(parts: list[int]) -> list[tuple[int, int]]:
+    """
+    Group sorted part indices into (start, count) runs of consecutive parts.
+    """
+
+    runs = []
+
+    for part in parts:
+        if runs and runs[-1][0] + runs[-1][1] == part:
+            runs[-1] = (runs[-1][0], runs[-1][1] + 1)
+        else:
+            runs.append((part, 1))
+
+    return runs
+
+
+async def resume(
+    file: File, storage: Storage, count: int
+) -> tuple[list[UploadedPart], dict[int, str]]:
+    """
+    Find how far an interrupted multipart upload got. The storage server is
+    asked which parts it holds (ListParts); parts that do not have the size
+    that they should are treated as missing, and will be overwritten.
+
+    Returns
+    -------
+    parts : list[UploadedPart]
+        The parts that are stored in full, in part order.
+    upload_urls : dict[int, str]
+        Pre-signed URLs for up to ``count`` of the missing parts, keyed by
+        (zero-based) part. Any further missing parts can be signed with
+        ``part_urls``.
+    """
+
+    stored = await _run(
+        storage,
+        storage.parts,
+        name=file.name,
+        uploader=file.uploader,
+        uuid=file.uuid,
+        bucket=file.bucket,
+        upload_id=file.upload_id,
+    )
+
+    def expected_size(part: int) -> int:
+        return min(
+            file.multipart_batch_size, file.size - part * file.multipart_batch_size
+        )
+
+    parts = sorted(
+        (
+            UploadedPart(part=x.part_number - 1, etag=x.etag, size=x.size)
+            for x in stored
+            if 0 < x.part_number <= file.number_of_parts
+            and x.size == expected_size(x.part_number - 1)
+        ),
+        key=lambda x: x.part,
+    )
+
+    uploaded = {x.part for x in parts}
+    missing = [x for x in range(file.number_of_parts) if x not in uploaded][:count]
+    runs = _part_runs(missing)
+
+    urls = await asyncio.gather(
+        *(
+            part_urls(file=file, storage=storage, start=start, count=length)
+            for start, length in runs
+        )
+    )
+
+    upload_urls = {
+        start + i: url
+        for (start, _), run_urls in zip(runs, urls)
+        for i, url in enumerate(run_urls)
+    }
+
+    return parts, upload_urls
+
+
 async def complete(
     file: File,
     storage: Storage,
@@ -76,7 +258,9 @@ async def complete(
     the storage server along the way.
     """
 
-    await asyncify(storage.complete)(
+    await _run(
+        storage,
+        storage.complete,
         name=file.name,
         uploader=file.uploader,
         uuid=file.uuid,
@@ -90,25 +274,91 @@ async def complete(
 
 
 async def confirm(file: File, storage: Storage) -> bool:
-    return await asyncify(storage.confirm)(
-        name=file.name, uploader=file.uploader, uuid=file.uuid, bucket=file.bucket
+    return await _run(
+        storage,
+        storage.confirm,
+        name=file.name,
+        uploader=file.uploader,
+        uuid=file.uuid,
+        bucket=file.bucket,
     )
 
 
+async def confirm_many(files: dict[str, File], storage: Storage) -> dict[str, bool]:
+    """
+    Checks that each of the files (keyed by e.g. slug) has been uploaded in
+    full: that its object exists and has the expected size. Each file's
+    prefix is listed, concurrently, rather than its object being looked up.
+    """
+
+    listings = await asyncio.gather(
+        *(
+            _run(
+                storage,
+                storage.sizes,
+                uploader=file.uploader,
+                uuid=file.uuid,
+                bucket=file.bucket,
+            )
+            for file in files.values()
+        )
+    )
+
+    confirmed = {}
+
+    for (key, file), sizes in zip(files.items(), listings):
+        size = sizes.get(
+            storage.object_name(
+                filename=file.name, uploader=file.uploader, uuid=file.uuid
+            )
+        )
+
+        if size is not None and size != file.size:
+            logger.warning(
+                "File {} ({}) is stored with size {}, expected {}",
+                file.name,
+                key,
+                size,
+                file.size,
+            )
+
+        confirmed[key] = size == file.size
+
+    return confirmed
+
+
 async def read(
     file: File,
     storage: Storage,
 ) -> str:
-    return await asyncify(storage.get)(
+    # Re-using a recently signed URL needs no thread, or storage server.
+    url = storage.cached_get(
         name=file.name, uploader=file.uploader, uuid=file.uuid, bucket=file.bucket
     )
 
+    if url is not None:
+        return url
+
+    return await _run(
+        storage,
+        storage.get,
+        name=file.name,
+        uploader=file.uploader,
+        uuid=file.uuid,
+        bucket=file.bucket,
+    )
+
 
 async def delete(
     file: File,
     storage: Storage,
 ):
-    await asyncify(storage.delete)(
-        name=file.name, uploader=file.uploader, uuid=file.uuid, bucket=file.bucket
+    await _run(
+        storage,
+        storage.delete,
+        name=file.name,
+        uploader=file.uploader,
+        uuid=file.uuid,
+        bucket=file.bucket,
     )
     return
@@ -13,6 +13,10 @@ class Settings(BaseSettings):
     minio_upgrade_presign_url_to_https: bool = False
     minio_secure: bool = False
     minio_cert_check: bool = False
+    minio_presign_reuse_fraction: float = 0.5
+    "Signed download URLs are re-used until this fraction of their lifetime has passed."
+    minio_workers: int = 10
+    "The largest number of requests made to the storage server at once."
 
     minio_access: str
     minio_secret: str
@@ -24,6 +28,9 @@ class Settings(BaseSettings):
 
     hasher: PasswordHash = PasswordHash([Argon2Hasher()])
 
+    page_limit_maximum: int = 1000
+    "The largest page of results (e.g. search results) that the API will return."
+
     add_cors: bool = True
     debug: bool = True
 
@@ -5,13 +5,17 @@ and uses the MinIO tools.
 
 import datetime
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from math import ceil
 
 from loguru import logger
 from minio import Minio
 from minio.api import Part, genheaders
 from minio.error import S3Error
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, PrivateAttr
 
 
 def replace_host(url: str, old: str, new: str | None, upgrade: bool) -> str:
@@ -41,8 +45,29 @@ class Storage(BaseModel):
     client: Minio | None = None
     expires: datetime.timedelta = datetime.timedelta(days=1)
 
+    url_reuse_fraction: float = 0.5
+    "Signed GET URLs are re-used until this fraction of ``expires`` has passed."
+    url_cache_size: int = 65536
+    "The maximum number of signed GET URLs to keep for re-use."
+
+    workers: int = 10
+    """
+    The number of threads making blocking calls to the storage server, and so
+    the largest number of requests in flight at once. Matches the size of the
+    MinIO client's connection pool.
+    """
+
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
+    # Buckets that are known to exist, and signed GET URLs with the (monotonic)
+    # time that they were signed at, oldest first.
+    _buckets: set[str] = PrivateAttr(default_factory=set)
+    _urls: OrderedDict[tuple, tuple[str, float]] = PrivateAttr(
+        default_factory=OrderedDict
+    )
+    _urls_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _executor: ThreadPoolExecutor | None = PrivateAttr(default=None)
+
     def model_post_init(self, __context):
         self.client = Minio(
             self.url,
@@ -52,25 +77,56 @@ class Storage(BaseModel):
             cert_check=self.cert_check,
         )
 
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="storage"
+        )
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """
+        The thread pool that the (async) service layer runs storage calls on.
+        """
+        return self._executor
+
+    def prefix(self, uploader: str, uuid: str) -> str:
+        return f"{uploader}/{uuid}/"
+
     def object_name(self, filename: str, uploader: str, uuid: str) -> str:
         # Filename may contain some kind of path, and this
         # breaks the download side of things, but for some
         # reason this is a valid object name for uploads?
-        return f"{uploader}/{uuid}/{os.path.basename(filename)}"
+        return (
+            f"{self.prefix(uploader=uploader, uuid=uuid)}{os.path.basename(filename)}"
+        )
 
     def bucket(self, name: str):
+        # Buckets are never deleted, so once one is known to exist it is not
+        # checked again.
+        if name in self._buckets:
+            return
+
         if not self.client.bucket_exists(name):
             self.client.make_bucket(name)
 
+        self._buckets.add(name)
+
         return
 
     def put(
-        self, name: str, uploader: str, uuid: str, bucket: str, size: int, batch: int
+        self,
+        name: str,
+        uploader: str,
+        uuid: str,
+        bucket: str,
+        size: int,
+        batch: int,
+        count: int | None = None,
     ) -> tuple[str, list[str]]:
         """
         Initiates a multipart upload. Returns a list of pre-signed URLs and the
         upload ID. Each one of these URLs should have ``batch`` data uploaded to
-        it.
+        it. Only the first ``count`` URLs are signed, if given; the rest can be
+        signed later with ``part_urls``.
 
         Returns
         -------
@@ -82,21 +138,55 @@ class Storage(BaseModel):
 
         self.bucket(name=bucket)
 
-        object_name = self.object_name(
-            filename=name,
-            uploader=uploader,
-            uuid=uuid,
-        )
-
         # First - initiate the multipart upload to get the UploadID.
         upload_id = self.client._create_multipart_upload(
             bucket_name=bucket,
-            object_name=object_name,
+            object_name=self.object_name(
+                filename=name,
+                uploader=uploader,
+                uuid=uuid,
+            ),
             headers=genheaders(None, None, None, None, None),
         )
 
         # Second - generate n pre-signed URLs for each part.
-        urls = [
+        number_of_parts = int(ceil(size / batch))
+
+        urls = self.part_urls(
+            name=name,
+            uploader=uploader,
+            uuid=uuid,
+            bucket=bucket,
+            upload_id=upload_id,
+            start=0,
+            count=number_of_parts if count is None else min(count, number_of_parts),
+        )
+
+        return upload_id, urls
+
+    def part_urls(
+        self,
+        name: str,
+        uploader: str,
+        uuid: str,
+        bucket: str,
+        upload_id: str,
+        start: int,
+        count: int,
+    ) -> list[str]:
+        """
+        Pre-signs the URLs for ``count`` parts of a multipart upload, starting
+        from the (zero-based) part ``start``. Signing needs no requests to the
+        storage server.
+        """
+
+        object_name = self.object_name(
+            filename=name,
+            uploader=uploader,
+            uuid=uuid,
+        )
+
+        return [
             replace_host(
                 url=self.client.get_presigned_url(
                     method="PUT",
@@ -113,10 +203,40 @@ class Storage(BaseModel):
                 new=self.presign_url,
                 upgrade=self.upgrade_presign_url_to_https,
             )
-            for i in range(int(ceil(size / batch)))
+            for i in range(start, start + count)
         ]
 
-        return upload_id, urls
+    def parts(
+        self, name: str, uploader: str, uuid: str, bucket: str, upload_id: str
+    ) -> list[Part]:
+        """
+        Lists the parts that the storage server holds for an open multipart
+        upload, with their (one-based) part numbers, ETags and sizes.
+        """
+
+        object_name = self.object_name(
+            filename=name,
+            uploader=uploader,
+            uuid=uuid,
+        )
+
+        parts = []
+        marker = None
+
+        while True:
+            result = self.client._list_parts(
+                bucket_name=bucket,
+                object_name=object_name,
+                upload_id=upload_id,
+                part_number_marker=marker,
+            )
+
+            parts.extend(result.parts)
+
+            if not result.is_truncated:
+                return parts
+
+            marker = result.next_part_number_marker
 
     def complete(
         self,
@@ -180,29 +300,95 @@ class Storage(BaseModel):
             logger.info(e)
             return False
 
-    def get(self, name: str, uploader: str, uuid: str, bucket: str) -> str:
+    def sizes(self, uploader: str, uuid: str, bucket: str) -> dict[str, int]:
         """
-        Returns a specific URL for HTTP GET requests.
+        Lists the objects stored under an uploader and UUID, in a single
+        request. Objects only appear once their upload has been completed.
+
+        Returns
+        -------
+        sizes : dict[str, int]
+            The size of each object, keyed by object name.
         """
 
         self.bucket(name=bucket)
 
+        return {
+            x.object_name: x.size
+            for x in self.client.list_objects(
+                bucket_name=bucket,
+                prefix=self.prefix(uploader=uploader, uuid=uuid),
+                recursive=True,
+            )
+        }
+
+    def _response_headers(self, name: str) -> dict[str, str] | None:
         # Special headers - if we have a video or image, we want it to
         # be displayed inline in the browser, not downloaded.
 
         match x := name.split(".")[-1].lower():
             case "jpg" | "jpeg" | "png" | "gif":
-                response_headers = {
+                return {
                     "response-content-type": f"image/{x}",
                     "response-content-disposition": "inline",
                 }
             case "mp4" | "webm":
-                response_headers = {
+                return {
                     "response-content-type": f"video/{x}",
                     "response-content-disposition": "inline",
                 }
             case _:
-                response_headers = None
+                return None
+
+    def _url_key(self, name: str, uploader: str, uuid: str, bucket: str) -> tuple:
+        response_headers = self._response_headers(name)
+
+        return (
+            bucket,
+            self.object_name(filename=name, uploader=uploader, uuid=uuid),
+            tuple(sorted(response_headers.items())) if response_headers else None,
+        )
+
+    def cached_get(
+        self, name: str, uploader: str, uuid: str, bucket: str
+    ) -> str | None:
+        """
+        Returns the URL for HTTP GET requests that ``get`` would, if one was
+        signed recently enough to be re-used, without contacting the storage
+        server. Otherwise, returns None.
+        """
+
+        key = self._url_key(name=name, uploader=uploader, uuid=uuid, bucket=bucket)
+
+        with self._urls_lock:
+            url, signed = self._urls.get(key, (None, 0.0))
+            age = time.monotonic() - signed
+
+            if (
+                url is not None
+                and age >= self.url_reuse_fraction * self.expires.total_seconds()
+            ):
+                del self._urls[key]
+                url = None
+
+        return url
+
+    def get(self, name: str, uploader: str, uuid: str, bucket: str) -> str:
+        """
+        Returns a specific URL for HTTP GET requests. URLs are re-used until
+        ``url_reuse_fraction`` of their lifetime has passed, so every URL
+        handed out is valid for at least the rest of ``expires``.
+        """
+
+        url = self.cached_get(name=name, uploader=uploader, uuid=uuid, bucket=bucket)
+
+        if url is not None:
+            return url
+
+        self.bucket(name=bucket)
+
+        key = self._url_key(name=name, uploader=uploader, uuid=uuid, bucket=bucket)
+        signed = time.monotonic()
 
         base_url = self.client.presigned_get_object(
             bucket_name=bucket,
@@ -212,21 +398,36 @@ class Storage(BaseModel):
                 uuid=uuid,
             ),
             expires=self.expires,
-            response_headers=response_headers,
+            response_headers=self._response_headers(name),
         )
 
-        return replace_host(
+        url = replace_host(
             base_url,
             old=self.url,
             new=self.presign_url,
             upgrade=self.upgrade_presign_url_to_https,
         )
 
+        with self._urls_lock:
+            self._urls[key] = (url, signed)
+            self._urls.move_to_end(key)
+
+            while len(self._urls) > self.url_cache_size:
+                self._urls.popitem(last=False)
+
+        return url
+
     def delete(self, name: str, uploader: str, uuid: str, bucket: str) -> str:
         """
         Deletes an object from the bucket.
         """
 
+        with self._urls_lock:
+            self._urls.pop(
+                self._url_key(name=name, uploader=uploader, uuid=uuid, bucket=bucket),
+                None,
+            )
+
         self.client.remove_object(
             bucket_name=bucket,
             object_name=self.object_name(
@@ -13,6 +13,7 @@ from beanie import PydanticObjectId
 from fastapi import HTTPException, Request, status
 from fastapi.responses import RedirectResponse
 
+from hipposerve.api.pagination import decode_cursor, encode_cursor
 from hipposerve.database import Collection
 from hipposerve.service import collection, product, storage
 from hipposerve.settings import SETTINGS
@@ -22,6 +23,8 @@ from .router import static_files as static_files
 from .router import templates, web_router
 from .search import router as search_router
 
+COLLECTION_PAGE_LIMIT = 100
+
 web_router.include_router(search_router)
 web_router.include_router(auth_router)
 
@@ -74,10 +77,7 @@ async def index(request: Request):
 async def product_view(request: Request, id: str):
     product_instance = await product.read_by_id(id, request.user.groups)
     # Grab the history!
-    latest_version = await product.walk_to_current(
-        product_instance, request.user.groups
-    )
-    version_history = await product.walk_history(latest_version)
+    version_history = await product.read_tree(product_instance)
 
     return templates.TemplateResponse(
         "product.html",
@@ -127,7 +127,9 @@ async def product_read_slug(request: Request, id: str, slug: str) -> RedirectRes
 
 @web_router.get("/collections/{id}/edit")
 async def collection_edit(request: Request, id: PydanticObjectId):
-    collection_instance = await collection.read(id, request.user.groups)
+    collection_instance = await collection.read(
+        id, request.user.groups, fetch_links=False
+    )
 
     return templates.TemplateResponse(
         "collection_edit.html",
@@ -141,8 +143,19 @@ async def collection_edit(request: Request, id: PydanticObjectId):
 
 
 @web_router.get("/collections/{id}")
-async def collection_view(request: Request, id: PydanticObjectId):
-    collection_instance = await collection.read(id, request.user.groups)
+async def collection_view(
+    request: Request, id: PydanticObjectId, cursor: str | None = None
+):
+    collection_instance = await collection.read_metadata(
+        id, request.user.groups, count_products=True
+    )
+    collection_instance.products, next_cursor = await collection.read_products(
+        id,
+        request.user.groups,
+        limit=COLLECTION_PAGE_LIMIT,
+        cursor=decode_cursor(cursor),
+        collection=collection_instance,
+    )
     parents_overflow_content = get_overflow_content(
         collection_instance.parent_collections, "collection"
     )
@@ -162,6 +175,7 @@ async def collection_view(request: Request, id: PydanticObjectId):
             "parents_overflow_content": parents_overflow_content,
             "children_overflow_content": children_overflow_content,
             "cmap": cmap,
+            "next_cursor": encode_cursor(next_cursor),
             "user": request.user.display_name,
             "web_root": SETTINGS.web_root,
         },
@@ -108,8 +108,8 @@ PotentialLoggedInUser = Annotated[
 @router.get("/user")
 async def read_user(request: Request):
     username = request.user.display_name
-    collections = await collection.search_by_owner(username, request.user.groups) or []
-    products = await product.search_by_owner(username, request.user.groups) or []
+    collections, _ = await collection.search_by_owner(username, request.user.groups)
+    products, _ = await product.search_by_owner(username, request.user.groups)
 
     return templates.TemplateResponse(
         "user.html",
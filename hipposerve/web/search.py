@@ -2,7 +2,7 @@
 Utilities for product search and rendering search results.
 """
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, HTTPException, Request, status
 from fastapi.responses import HTMLResponse
 
 from hippometa import ALL_METADATA
@@ -26,8 +26,8 @@ async def search_results_view(
     elif filter == "collections":
         results = await collection.search_by_name(q, request.user.groups)
     else:
-        collection_results = await collection.search_by_owner(q, request.user.groups)
-        product_results = await product.search_by_owner(q, request.user.groups)
+        collection_results, _ = await collection.search_by_owner(q, request.user.groups)
+        product_results, _ = await product.search_by_owner(q, request.user.groups)
         results = collection_results + product_results
 
     return templates.TemplateResponse(
@@ -94,17 +94,27 @@ async def searchmetadata_results_view(
             metadata_filters[key] = {"$in": [v.strip() for v in value.split(",")]}
         # Query for number ranges
         elif field_type == "number" and "," in value:
-            min, max = value.split(",")
-            if min != "undefined":
-                metadata_filters[key] = {"$gte": min}
-            if max != "undefined":
-                metadata_filters[key] = metadata_filters.get(key, {})
-                metadata_filters[key]["$lte"] = max
+            try:
+                min, max = value.split(",")
+                if min != "undefined":
+                    metadata_filters[key] = {"$gte": float(min)}
+                if max != "undefined":
+                    metadata_filters[key] = metadata_filters.get(key, {})
+                    metadata_filters[key]["$lte"] = float(max)
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Range {value} for {key} is not a pair of numbers",
+                )
         # Default query applies regex and case insensitivity
         else:
             metadata_filters[key] = {"$regex": value, "$options": "i"}
 
-    results = await product.search_by_metadata(metadata_filters, request.user.groups)
+    # Matching on the type lets the query use the type's metadata indexes.
+    metadata_type = metadata_class.model_fields["metadata_type"].default
+    results, _ = await product.search_by_metadata(
+        {"metadata_type": metadata_type, **metadata_filters}, request.user.groups
+    )
 
     return templates.TemplateResponse(
         "search_results.html",
@@ -0,0 +1,345 @@
+"""
+Wire models shared between the hippo server and its clients.
+
+These are the pydantic models that travel over the API and so are needed by
+both sides. This module must only depend on pydantic, bson and hippometa:
+the client imports it at start-up, and pulling in beanie, fastapi or minio
+here would make every ``henry`` invocation pay for the server's imports.
+The server modules re-export these models from their original locations.
+"""
+
+from datetime import datetime
+from typing import Annotated, Any, Literal, Union
+
+from bson import ObjectId
+from pydantic import (
+    BaseModel,
+    Field,
+    PlainSerializer,
+    PlainValidator,
+    WithJsonSchema,
+)
+
+from hippometa import ALL_METADATA_TYPE
+
+
+def _validate_object_id(value: Any) -> ObjectId:
+    if isinstance(value, ObjectId):
+        return value
+
+    if isinstance(value, (str, bytes)) and ObjectId.is_valid(value):
+        return ObjectId(value)
+
+    raise ValueError(f"Invalid ObjectId: {value!r}")
+
+
+ObjectIdType = Annotated[
+    ObjectId,
+    PlainValidator(_validate_object_id),
+    PlainSerializer(str, return_type=str, when_used="json"),
+    WithJsonSchema({"type": "string", "example": "5eb7cf5a86d9755df3a6c593"}),
+]
+"""
+A MongoDB ObjectId, (de)serialized as its hex string. Equivalent on the wire to
+beanie's ``PydanticObjectId``, without importing beanie.
+"""
+
+
+class FileMetadata(BaseModel):
+    """
+    Object containing the metadata from a single file.
+    """
+
+    id: ObjectIdType
+    name: str
+    description: str | None = None
+    uploader: str
+    uuid: str
+    bucket: str
+    size: int
+    checksum: str
+    slug: str = Field(default="data")
+    available: bool = True
+
+
+class ProductMetadata(BaseModel):
+    """
+    Object containing the metadata from a single version of a product.
+    """
+
+    id: ObjectIdType
+
+    name: str
+    description: str
+    metadata: ALL_METADATA_TYPE
+
+    uploaded: datetime
+    updated: datetime
+
+    current: bool
+    version: str
+
+    sources: dict[str, FileMetadata]  # Sources are indexed by their slug
+    owner: str
+
+    replaces: str | None
+
+    readers: list[str] = []
+    writers: list[str] = []
+
+    child_of: list[ObjectIdType]
+    parent_of: list[ObjectIdType]
+
+    collections: list[ObjectIdType]
+
+
+class CollectionMetadata(BaseModel):
+    """
+    Base model for a collection.
+    """
+
+    id: ObjectIdType
+
+    name: str
+    description: str
+
+    products: list[ProductMetadata]
+    child_collections: list[ObjectIdType]
+    parent_collections: list[ObjectIdType]
+
+
+class SearchProductsResponse(BaseModel):
+    """
+    A page of product search results.
+    """
+
+    results: list[ProductMetadata]
+    next_cursor: str | None = None
+    "Pass back as the cursor to read the next page; None on the last page."
+
+
+class EqualPredicate(BaseModel):
+    """
+    Matches metadata where the field is equal to (or, for list fields,
+    contains) the value.
+    """
+
+    op: Literal["eq"] = "eq"
+    value: Any
+
+
+class InPredicate(BaseModel):
+    """
+    Matches metadata where the field is equal to (or, for list fields,
+    contains) any one of the values.
+    """
+
+    op: Literal["in"] = "in"
+    values: list[Any]
+
+
+class RangePredicate(BaseModel):
+    """
+    Matches metadata where the field lies between the (inclusive) bounds. At
+    least one bound must be given.
+    """
+
+    op: Literal["range"] = "range"
+    minimum: Any = None
+    maximum: Any = None
+
+
+class PrefixPredicate(BaseModel):
+    """
+    Matches metadata where a string field starts with the prefix. The match
+    is case sensitive, so that it can use an index.
+    """
+
+    op: Literal["prefix"] = "prefix"
+    prefix: str
+
+
+class ExistsPredicate(BaseModel):
+    """
+    Matches metadata where the field is (or, if ``exists`` is False, is not)
+    set to something other than None.
+    """
+
+    op: Literal["exists"] = "exists"
+    exists: bool = True
+
+
+MetadataPredicate = Annotated[
+    Union[
+        EqualPredicate,
+        InPredicate,
+        RangePredicate,
+        PrefixPredicate,
+        ExistsPredicate,
+    ],
+    Field(discriminator="op"),
+]
+
+
+class ProductQuery(BaseModel):
+    """
+    A query on the metadata of products of a single metadata type. Products
+    must match all of the predicates, which are keyed by metadata field name
+    and are checked against that type's fields before being run.
+    """
+
+    metadata_type: str
+    predicates: dict[str, MetadataPredicate] = {}
+
+
+class PreUploadFile(BaseModel):
+    name: str
+    size: int
+    checksum: str
+    description: str | None = None
+
+
+class PostUploadFile(BaseModel):
+    uuid: str
+    name: str
+    size: int
+    slug: str
+    checksum: str
+    url: str | None
+    description: str | None
+    object_name: str | None
+    available: bool
+
+
+class MultipartUpload(BaseModel):
+    """
+    How a source is to be uploaded: in ``number_of_parts`` parts of
+    ``part_size`` bytes (the last part may be smaller).
+    """
+
+    part_size: int
+    number_of_parts: int
+
+
+class ReadPartsResponse(BaseModel):
+    """
+    A page of pre-signed part URLs for a source's multipart upload.
+    """
+
+    slug: str
+    part_size: int
+    number_of_parts: int
+    start: int
+    "The (zero-based) part that the first URL is for."
+    urls: list[str]
+
+
+class UploadedPart(BaseModel):
+    """
+    A part of a multipart upload that the storage server already holds.
+    """
+
+    part: int
+    "The (zero-based) index of the part."
+    etag: str
+    size: int
+
+
+class ResumeUpload(BaseModel):
+    """
+    The state of an interrupted multipart upload of a source: the parts that
+    are already stored, and pre-signed URLs for (some of) the missing ones.
+    """
+
+    slug: str
+    size: int
+    checksum: str
+    part_size: int
+    number_of_parts: int
+    parts: list[UploadedPart]
+    upload_urls: dict[int, str]
+    "Pre-signed URLs for the first missing parts, keyed by (zero-based) part."
+
+
+class ResumeProductResponse(BaseModel):
+    id: ObjectIdType
+    uploads: dict[str, ResumeUpload]
+    "The sources that are still being uploaded, keyed by file name."
+
+
+class ReadProductResponse(BaseModel):
+    current_present: bool
+    current: str | None
+    requested: str
+    versions: dict[str, ProductMetadata]
+
+
+class ReadCollectionProductResponse(BaseModel):
+    """
+    Response model for reading a product in a collection.
+    """
+
+    id: ObjectIdType
+    name: str
+    description: str
+    owner: str
+    version: str
+    uploaded: datetime
+    metadata: ALL_METADATA_TYPE
+
+
+class ReadCollectionCollectionResponse(BaseModel):
+    """
+    Response model for reading a collection (i.e. a parent or child)
+    as part of a collection request.
+    """
+
+    id: ObjectIdType
+    name: str
+    description: str
+    owner: str
+    readers: list[str]
+    writers: list[str]
+    number_of_products: int | None = None
+    "The number of products in this collection, if requested."
+
+
+class ReadCollectionResponse(BaseModel):
+    """
+    Response model for reading a collection.
+    """
+
+    id: ObjectIdType
+    name: str
+    description: str
+    products: list[ReadCollectionProductResponse] | None
+    child_collections: list[ReadCollectionCollectionResponse] | None = None
+    parent_collections: list[ReadCollectionCollectionResponse] | None = None
+    readers: list[str]
+    writers: list[str]
+    owner: str
+    next_cursor: str | None = None
+    """
+    Set if there are more products than were returned; pass back to the
+    collection's products endpoint to read the next page.
+    """
+
+
+class ReadCollectionProductsResponse(BaseModel):
+    """
+    A page of the products in a collection.
+    """
+
+    results: list[ReadCollectionProductResponse]
+    next_cursor: str | None = None
+    "Pass back as the cursor to read the next page; None on the last page."
+
+
+class SearchCollectionsResponse(BaseModel):
+    """
+    A page of collection search results.
+    """
+
+    results: list[ReadCollectionResponse]
+    next_cursor: str | None = None
+    "Pass back as the cursor to read the next page; None on the last page."
@@ -10,10 +10,14 @@ from hipposerve.api.models.product import (
     CreateProductResponse,
     PreUploadFile,
     ReadFilesResponse,
-    ReadProductResponse,
     UpdateProductResponse,
 )
 from hipposerve.service import versioning
+from hipposerve.wire import (
+    ReadPartsResponse,
+    ReadProductResponse,
+    ResumeProductResponse,
+)
 
 
 @pytest_asyncio.fixture(scope="function")
@@ -228,8 +232,192 @@ def test_confirm_product_product_not_existing(test_api_client):
     assert response.status_code == 404
 
 
+def test_read_parts(test_api_client: TestClient, test_api_user: str):
+    PART_SIZE = 5 * 1024 * 1024
+
+    response = test_api_client.put(
+        "/product/new",
+        json={
+            "name": "test_parts_product",
+            "description": "A product with many parts",
+            "metadata": {"metadata_type": "simple"},
+            "sources": {
+                "data": PreUploadFile(
+                    name="test_parts_file", size=3 * PART_SIZE, checksum="test"
+                ).model_dump()
+            },
+            "multipart_batch_size": PART_SIZE,
+            "part_url_limit": 1,
+        },
+    )
+
+    assert response.status_code == 200
+    validated = CreateProductResponse.model_validate(response.json())
+
+    # Only the first part's URL is handed out up front.
+    assert len(validated.upload_urls["test_parts_file"]) == 1
+    assert validated.uploads["test_parts_file"].number_of_parts == 3
+    assert validated.uploads["test_parts_file"].part_size == PART_SIZE
+
+    response = test_api_client.get(
+        f"/product/{validated.id}/parts",
+        params={"slug": "data", "from": 1, "count": 10},
+    )
+
+    assert response.status_code == 200
+    parts = ReadPartsResponse.model_validate(response.json())
+    assert parts.start == 1
+    assert parts.number_of_parts == 3
+    assert len(parts.urls) == 2
+    assert validated.upload_urls["test_parts_file"][0] not in parts.urls
+
+    response = test_api_client.get(
+        f"/product/{validated.id}/parts", params={"slug": "not-a-slug"}
+    )
+
+    assert response.status_code == 404
+
+    test_api_client.delete(f"/product/{validated.id}", params={"data": True})
+
+
+def test_read_parts_requires_writer(test_api_client: TestClient):
+    response = test_api_client.put(
+        "/product/new",
+        json={
+            "name": "test_parts_readers_product",
+            "description": "A product that we can only read",
+            "metadata": {"metadata_type": "simple"},
+            "sources": {
+                "data": PreUploadFile(
+                    name="test_parts_readers_file", size=9, checksum="test"
+                ).model_dump()
+            },
+        },
+    )
+
+    assert response.status_code == 200
+    product_id = response.json()["id"]
+
+    # Leave ourselves as a reader only.
+    response = test_api_client.post(
+        f"/product/{product_id}/update",
+        json={"add_writers": ["someone_else"], "remove_writers": ["test_user"]},
+    )
+
+    assert response.status_code == 200
+
+    response = test_api_client.get(
+        f"/product/{product_id}/parts", params={"slug": "data"}
+    )
+
+    assert response.status_code == 403
+
+    response = test_api_client.get(f"/product/{product_id}/resume")
+
+    assert response.status_code == 403
+
+    test_api_client.post(
+        f"/product/{product_id}/update", json={"add_writers": ["test_user"]}
+    )
+    test_api_client.delete(f"/product/{product_id}", params={"data": True})
+
+
+def test_read_parts_completed(
+    test_api_client: TestClient, test_api_product: tuple[str, str]
+):
+    response = test_api_client.get(
+        f"/product/{test_api_product[1]}/parts", params={"slug": "data"}
+    )
+
+    assert response.status_code == 409
+
+
+def test_resume_product(test_api_client: TestClient, test_api_user: str):
+    PART_SIZE = 5 * 1024 * 1024
+
+    response = test_api_client.put(
+        "/product/new",
+        json={
+            "name": "test_resume_product",
+            "description": "A product whose upload is interrupted",
+            "metadata": {"metadata_type": "simple"},
+            "sources": {
+                "data": PreUploadFile(
+                    name="test_resume_file", size=2 * PART_SIZE + 9, checksum="test"
+                ).model_dump()
+            },
+            "multipart_batch_size": PART_SIZE,
+        },
+    )
+
+    assert response.status_code == 200
+    validated = CreateProductResponse.model_validate(response.json())
+
+    # Upload only the first part before "crashing".
+    requests.put(
+        validated.upload_urls["test_resume_file"][0], data=b"0" * PART_SIZE
+    ).raise_for_status()
+
+    response = test_api_client.get(f"/product/{validated.id}/resume")
+
+    assert response.status_code == 200
+    resumed = ResumeProductResponse.model_validate(response.json())
+    upload = resumed.uploads["test_resume_file"]
+
+    assert upload.slug == "data"
+    assert [(x.part, x.size) for x in upload.parts] == [(0, PART_SIZE)]
+    assert sorted(upload.upload_urls) == [1, 2]
+
+    test_api_client.delete(f"/product/{validated.id}", params={"data": True})
+
+
+def test_resume_product_completed(
+    test_api_client: TestClient, test_api_product: tuple[str, str]
+):
+    response = test_api_client.get(f"/product/{test_api_product[1]}/resume")
+
+    assert response.status_code == 200
+    assert response.json()["uploads"] == {}
+
+    response = test_api_client.get(f"/product/{'7' * 24}/resume")
+
+    assert response.status_code == 404
+
+
 def test_product_search(test_api_client: TestClient, test_api_product: tuple[str, str]):
     response = test_api_client.get(f"/product/search/{test_api_product[0]}")
 
     assert response.status_code == 200
-    assert len(response.json()) == 1
+    assert len(response.json()["results"]) == 1
+    assert response.json()["next_cursor"] is None
+
+    response = test_api_client.get(
+        f"/product/search/{test_api_product[0]}", params={"cursor": "not-a-cursor"}
+    )
+
+    assert response.status_code == 400
+
+
+def test_product_query(test_api_client: TestClient, test_api_product: tuple[str, str]):
+    response = test_api_client.post(
+        "/product/query",
+        json={
+            "metadata_type": "mapset",
+            "predicates": {"pixelisation": {"op": "prefix", "prefix": "equi"}},
+        },
+        params={"limit": 10},
+    )
+
+    assert response.status_code == 200
+    assert [x["name"] for x in response.json()["results"]] == [test_api_product[0]]
+    assert response.json()["next_cursor"] is None
+
+    response = test_api_client.post(
+        "/product/query",
+        json={
+            "metadata_type": "mapset",
+            "predicates": {"not_a_field": {"op": "exists"}},
+        },
+    )
+
+    assert response.status_code == 400
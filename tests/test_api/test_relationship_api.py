@@ -72,6 +72,27 @@ def test_read_collection(
         assert product["description"] == "test_description"
         assert product["owner"] == "test_user"
 
+    # Page through the products, two at a time.
+    response = test_api_client.get(
+        f"/relationships/collection/{collection_id}", params={"limit": 2}
+    )
+    assert response.status_code == 200
+
+    products = response.json()["products"]
+    cursor = response.json()["next_cursor"]
+
+    while cursor is not None:
+        response = test_api_client.get(
+            f"/relationships/collection/{collection_id}/products",
+            params={"limit": 2, "cursor": cursor},
+        )
+        assert response.status_code == 200
+
+        products += response.json()["results"]
+        cursor = response.json()["next_cursor"]
+
+    assert sorted(x["id"] for x in products) == sorted(product_ids)
+
 
 def test_update_collection(test_api_client: TestClient):
     collection_name = "Test Collection"
@@ -123,6 +144,9 @@ def test_read_non_existent_collection(test_api_client):
     assert response.status_code == 404
     assert response.json()["detail"] == "Collection not found."
 
+    response = test_api_client.get(f"/relationships/collection/{'7' * 24}/products")
+    assert response.status_code == 404
+
 
 def test_add_to_non_existent_collection(test_api_client):
     response = test_api_client.put(f"/relationships/collection/{'7' * 24}/{'7' * 24}")
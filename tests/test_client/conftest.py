@@ -2,11 +2,31 @@
 Fixtures for the caching client tests.
 """
 
+import json
+import threading
 from pathlib import Path
 
+import httpx
 import pytest
 
 from hippoclient.caching import Cache
+from hippoclient.downloading import Downloader
+
+COLLECTION_ID = "6851be3dc869d741c82d6964"
+CHILD_COLLECTION_ID = "6851be3dc869d741c82d6967"
+
+# The products of each collection, and the sources of each product. Products
+# share their calibration file.
+COLLECTIONS = {
+    COLLECTION_ID: ["6851be3dc869d741c82d6965", "6851be3dc869d741c82d6966"],
+    CHILD_COLLECTION_ID: ["6851be3dc869d741c82d6968"],
+}
+CHILD_COLLECTIONS = {COLLECTION_ID: [CHILD_COLLECTION_ID], CHILD_COLLECTION_ID: []}
+FILES = {
+    "6851be3dc869d741c82d6965": ["map", "calibration"],
+    "6851be3dc869d741c82d6966": ["beam", "calibration"],
+    "6851be3dc869d741c82d6968": ["flat", "calibration"],
+}
 
 
 @pytest.fixture
@@ -19,3 +39,175 @@ def cache(tmp_path):
 
     for id in cache.complete_id_list:
         cache._remove(id)
+
+
+@pytest.fixture
+def fake_downloads(monkeypatch) -> list[str]:
+    """
+    Replace downloads with writing ``size`` bytes to the destination. Returns
+    the list of URLs that were downloaded.
+    """
+
+    downloads = []
+    lock = threading.Lock()
+
+    def download(self, url, destination, size, checksum=None, client=None):
+        with lock:
+            downloads.append(url)
+
+        destination.write_bytes(b"x" * size)
+        return destination
+
+    monkeypatch.setattr(Downloader, "download", download)
+
+    return downloads
+
+
+def _summary(id: str, name: str) -> dict:
+    return {
+        "id": id,
+        "name": name,
+        "description": "A description",
+        "owner": "admin",
+        "version": "1.0.0",
+        "uploaded": "2025-01-01T00:00:00",
+        "metadata": {"metadata_type": "simple"},
+    }
+
+
+def _metadata(id: str) -> dict:
+    return {
+        **_summary(id, f"product-{id}"),
+        "updated": "2025-01-01T00:00:00",
+        "current": True,
+        "sources": {},
+        "replaces": None,
+        "child_of": [],
+        "parent_of": [],
+        "collections": [],
+    }
+
+
+def _api(request: httpx.Request) -> httpx.Response:
+    """
+    A fake hippo API serving the collections in ``COLLECTIONS``.
+    """
+
+    path = request.url.path
+
+    # Collections return their products a page at a time; the cursor is an
+    # offset. Pages hold one product unless asked otherwise, so that clients
+    # must follow the cursors.
+    start = int(request.url.params.get("cursor", 0))
+    end = start + int(request.url.params.get("limit", 1))
+
+    for id, products in COLLECTIONS.items():
+        page = [_summary(x, f"product-{x}") for x in products[start:end]]
+        next_cursor = str(end) if end < len(products) else None
+
+        if path == f"/relationships/collection/{id}/products":
+            return httpx.Response(
+                200, json={"results": page, "next_cursor": next_cursor}
+            )
+
+        if path == f"/relationships/collection/{id}":
+            return httpx.Response(
+                200,
+                json={
+                    "id": id,
+                    "name": f"collection-{id}",
+                    "description": "A collection",
+                    "products": page,
+                    "next_cursor": next_cursor,
+                    "child_collections": [
+                        {
+                            "id": x,
+                            "name": f"collection-{x}",
+                            "description": "Child",
+                            "owner": "admin",
+                            "readers": [],
+                            "writers": [],
+                        }
+                        for x in CHILD_COLLECTIONS[id]
+                    ],
+                    "readers": [],
+                    "writers": [],
+                    "owner": "admin",
+                },
+            )
+
+    for id, files in FILES.items():
+        if path == f"/product/{id}/files":
+            return httpx.Response(
+                200,
+                json={
+                    "files": {
+                        name: {
+                            "uuid": name,
+                            "name": f"{name}.fits",
+                            "size": 16,
+                            "slug": name,
+                            "checksum": "not-a-real-checksum",
+                            "url": f"http://storage/{name}",
+                            "description": None,
+                            "object_name": f"{name}.fits",
+                            "available": True,
+                        }
+                        for name in files
+                    }
+                },
+            )
+
+    if path.startswith("/relationships/collection/search/"):
+        ids = list(COLLECTIONS)
+
+        return httpx.Response(
+            200,
+            json={
+                "results": [
+                    {
+                        "id": id,
+                        "name": f"collection-{id}",
+                        "description": "A collection",
+                        "products": None,
+                        "readers": [],
+                        "writers": [],
+                        "owner": "admin",
+                    }
+                    for id in ids[start:end]
+                ],
+                "next_cursor": str(end) if end < len(ids) else None,
+            },
+        )
+
+    if path == "/product/query":
+        # Every product has simple metadata; there are no other types.
+        if json.loads(request.content)["metadata_type"] != "simple":
+            return httpx.Response(400, json={"detail": "Unknown metadata type"})
+
+        ids = list(FILES)
+
+        return httpx.Response(
+            200,
+            json={
+                "results": [_metadata(id) for id in ids[start:end]],
+                "next_cursor": str(end) if end < len(ids) else None,
+            },
+        )
+
+    if path.startswith("/relationships/collection/") and "child_of" in path:
+        return httpx.Response(200, json=True)
+
+    return httpx.Response(404)
+
+
+@pytest.fixture
+def hippo_api() -> httpx.Client:
+    return httpx.Client(base_url="http://hippo", transport=httpx.MockTransport(_api))
+
+
+@pytest.fixture
+def async_hippo_api() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url="http://hippo", transport=httpx.MockTransport(_api)
+    )
@@ -0,0 +1,78 @@
+"""
+Tests the async client against a mock hippo API.
+"""
+
+import pytest
+
+from hippoclient.aio import AsyncClient, AsyncMultiCache
+from hippoclient.aio import collections as aio_collections
+from hippoclient.aio import product as aio_product
+from hippoclient.aio import relationships as aio_relationships
+from hippoclient.caching import Cache, MultiCache
+
+# See the mock API in conftest.py.
+COLLECTION_ID = "6851be3dc869d741c82d6964"
+CHILD_COLLECTION_ID = "6851be3dc869d741c82d6967"
+
+
+def test_async_client_limits():
+    client = AsyncClient(
+        host="http://hippo", token_tag=None, max_connections=7, http2=True
+    )
+
+    assert client._transport._pool._max_connections == 7
+
+
+async def test_async_relationships(async_hippo_api):
+    assert await aio_relationships.add_child_collection(
+        client=async_hippo_api, parent=COLLECTION_ID, child=CHILD_COLLECTION_ID
+    )
+
+
+async def test_async_search(async_hippo_api):
+    results = [
+        x
+        async for x in aio_collections.iterate_search(
+            client=async_hippo_api, name="collection", page_size=1
+        )
+    ]
+
+    assert [str(x.id) for x in results] == [COLLECTION_ID, CHILD_COLLECTION_ID]
+
+    results = await aio_collections.search(
+        client=async_hippo_api, name="collection", limit=1
+    )
+
+    assert [str(x.id) for x in results] == [COLLECTION_ID]
+
+
+async def test_async_query(async_hippo_api):
+    results = await aio_product.query(
+        client=async_hippo_api, metadata_type="simple", limit=2
+    )
+
+    assert len(results) == 2
+    assert all(x.metadata.metadata_type == "simple" for x in results)
+
+
+@pytest.mark.parametrize("recursive", [False, True])
+async def test_async_collection_cache(
+    tmp_path, async_hippo_api, fake_downloads, recursive
+):
+    cache = AsyncMultiCache(
+        cache=MultiCache(caches=[Cache(path=tmp_path, poll_interval=0.01)]),
+        workers=4,
+    )
+
+    paths = await aio_collections.cache(
+        client=async_hippo_api, cache=cache, id=COLLECTION_ID, recursive=recursive
+    )
+
+    cache.close()
+
+    expected = ["beam", "calibration", "map"] + (["flat"] if recursive else [])
+
+    assert len(paths) == (6 if recursive else 4)
+    assert all(path.exists() for path in paths)
+    # The shared file is only fetched once.
+    assert sorted(fake_downloads) == sorted(f"http://storage/{x}" for x in expected)
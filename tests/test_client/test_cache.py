@@ -2,10 +2,19 @@
 Tests the cache functionality.
 """
 
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pytest
 
+from hippoclient.caching import Cache, CacheQuotaExceededError
+from hippoclient.downloading import Downloader
+
 
 def test_add_file_to_cache(cache):
     """
@@ -58,3 +67,172 @@ def test_add_real_file_to_cache(cache):
 def test_unavailable(cache):
     with pytest.raises(FileNotFoundError):
         cache.available("not-a-real-id")
+
+
+def test_lease_is_exclusive(tmp_path):
+    first = Cache(path=tmp_path)
+    second = Cache(path=tmp_path)
+
+    assert first._acquire_lease("abc")
+    assert not second._acquire_lease("abc")
+
+    first._release_lease("abc")
+
+    assert second._acquire_lease("abc")
+
+
+def test_stale_leases_are_reclaimed(tmp_path):
+    # A lease that has not been renewed in time.
+    assert Cache(path=tmp_path, lease_timeout=0.0)._acquire_lease("abc")
+    assert Cache(path=tmp_path)._acquire_lease("abc")
+
+    # A lease held by a process on this host that has since exited.
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+
+    connection = sqlite3.connect(tmp_path / "cache.db")
+    connection.execute(
+        "INSERT OR REPLACE INTO leases (id, owner, host, pid, expires) VALUES (?, ?, ?, ?, ?)",
+        ("def", "crashed", socket.gethostname(), process.pid, time.time() + 3600),
+    )
+    connection.commit()
+    connection.close()
+
+    assert Cache(path=tmp_path)._acquire_lease("def")
+
+
+def test_concurrent_get_downloads_once(tmp_path, monkeypatch):
+    downloads = []
+
+    def download(self, url, destination, size, checksum=None, client=None):
+        downloads.append(url)
+        time.sleep(0.2)
+        destination.write_bytes(b"x" * size)
+        return destination
+
+    monkeypatch.setattr(Downloader, "download", download)
+
+    def get(_):
+        # Each worker has its own connection, as separate processes would.
+        return Cache(path=tmp_path, poll_interval=0.01).get(
+            id="abc",
+            path="shared/input.fits",
+            checksum="not-a-real-checksum",
+            size=16,
+            presigned_url="http://storage/input.fits",
+        )
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        paths = list(executor.map(get, range(4)))
+
+    assert len(downloads) == 1
+    assert all(path == tmp_path / "shared/input.fits" for path in paths)
+    assert paths[0].read_bytes() == b"x" * 16
+
+
+def fetch(cache: Cache, id: str, size: int = 100) -> Path:
+    return cache.get(
+        id=id,
+        path=f"{id}.dat",
+        checksum="not-a-real-checksum",
+        size=size,
+        presigned_url=f"http://storage/{id}",
+    )
+
+
+@pytest.mark.parametrize("policy", ["lru", "lfu"])
+def test_eviction(tmp_path, fake_downloads, policy):
+    cache = Cache(path=tmp_path, quota=300, eviction_policy=policy)
+
+    for id in ["a", "b", "c"]:
+        fetch(cache, id)
+        time.sleep(0.01)
+
+    # "c" has been used most often, but least recently.
+    for id in ["c", "c", "c", "b", "a"]:
+        cache.available(id)
+        time.sleep(0.01)
+
+    fetch(cache, "d")
+
+    evicted = "c" if policy == "lru" else "b"
+
+    assert set(cache.complete_id_list) == {"a", "b", "c", "d"} - {evicted}
+    assert not (tmp_path / f"{evicted}.dat").exists()
+    assert cache.stats.evictions == 1
+    assert cache.stats.bytes == 300
+
+
+def test_pinned_sources_are_not_evicted(tmp_path, fake_downloads):
+    cache = Cache(path=tmp_path, quota=200)
+
+    fetch(cache, "a")
+    cache.pin("a")
+    fetch(cache, "b")
+    fetch(cache, "c")
+
+    assert set(cache.complete_id_list) == {"a", "c"}
+
+    with pytest.raises(CacheQuotaExceededError):
+        fetch(cache, "d", size=150)
+
+
+def test_failed_fetches_release_their_space(tmp_path, monkeypatch):
+    cache = Cache(path=tmp_path, quota=100)
+
+    def download(self, url, destination, size, checksum=None, client=None):
+        raise OSError("Connection reset")
+
+    monkeypatch.setattr(Downloader, "download", download)
+
+    for _ in range(3):
+        with pytest.raises(OSError):
+            fetch(cache, "a")
+
+    def download(self, url, destination, size, checksum=None, client=None):
+        destination.write_bytes(b"x" * size)
+        return destination
+
+    monkeypatch.setattr(Downloader, "download", download)
+
+    # The failed fetches no longer hold on to the quota.
+    assert fetch(cache, "b").exists()
+    assert cache.complete_id_list == ["b"]
+
+
+def test_cache_stats(tmp_path, fake_downloads):
+    cache = Cache(path=tmp_path)
+
+    fetch(cache, "a")
+    fetch(cache, "a")
+    cache.available("a")
+    cache.available("a", touch=False)
+
+    stats = cache.stats
+
+    assert stats.entries == 1
+    assert stats.bytes == 100
+    assert stats.hits == 2
+    assert stats.misses == 1
+    assert stats.hit_rate == pytest.approx(2 / 3)
+
+
+def test_cache_schema_upgrade(tmp_path, fake_downloads):
+    # A cache created before usage tracking existed.
+    connection = sqlite3.connect(tmp_path / "cache.db")
+    connection.execute(
+        "CREATE TABLE sources (id PRIMARY KEY, path, checksum, size, available)"
+    )
+    connection.execute(
+        "INSERT INTO sources VALUES (?, ?, ?, ?, ?)",
+        ("old", "old.dat", "not-a-real-checksum", 100, True),
+    )
+    connection.commit()
+    connection.close()
+    (tmp_path / "old.dat").write_bytes(b"x" * 100)
+
+    cache = Cache(path=tmp_path, quota=100)
+
+    fetch(cache, "new")
+
+    assert cache.complete_id_list == ["new"]
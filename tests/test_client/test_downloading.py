@@ -0,0 +1,237 @@
+"""
+Tests the segmented downloader against a mock storage server.
+"""
+
+import os
+import re
+import threading
+
+import httpx
+import pytest
+import xxhash
+
+from hippoclient.downloading import (
+    ChecksumMismatchError,
+    Downloader,
+    DownloadFailedError,
+    partial_path,
+    segments_path,
+)
+
+DATA = os.urandom(10 * 1024 + 13)
+
+
+def make_storage(data: bytes = DATA, support_ranges: bool = True, fail_first: int = 0):
+    """
+    A fake object store serving ``data``, optionally honouring Range headers.
+    The first ``fail_first`` requests fail with a 503.
+    """
+
+    requests = []
+    lock = threading.Lock()
+    failures = {"remaining": fail_first}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        with lock:
+            requests.append(request.headers.get("Range"))
+
+            if failures["remaining"] > 0:
+                failures["remaining"] -= 1
+                return httpx.Response(503)
+
+        if support_ranges and "Range" in request.headers:
+            start, end = re.match(
+                r"bytes=(\d+)-(\d*)", request.headers["Range"]
+            ).groups()
+            start, end = int(start), int(end) if end else len(data) - 1
+            return httpx.Response(206, content=data[start : end + 1])
+
+        return httpx.Response(200, content=data)
+
+    return httpx.Client(transport=httpx.MockTransport(handler)), requests
+
+
+def test_segmented_download(tmp_path):
+    client, requests = make_storage()
+
+    downloader = Downloader(connections=3, segment_size=1024)
+    downloader.download(
+        url="http://storage/object",
+        destination=tmp_path / "object",
+        size=len(DATA),
+        client=client,
+    )
+
+    assert (tmp_path / "object").read_bytes() == DATA
+    assert len(requests) == 11
+    assert all(x is not None for x in requests)
+
+
+def test_segmented_download_retries_ranges(tmp_path):
+    client, requests = make_storage(fail_first=2)
+
+    downloader = Downloader(connections=2, segment_size=4096, backoff=0.0)
+    downloader.download(
+        url="http://storage/object",
+        destination=tmp_path / "object",
+        size=len(DATA),
+        client=client,
+    )
+
+    assert (tmp_path / "object").read_bytes() == DATA
+
+
+def test_download_without_range_support(tmp_path):
+    client, _ = make_storage(support_ranges=False)
+
+    downloader = Downloader(connections=4, segment_size=1024)
+    downloader.download(
+        url="http://storage/object",
+        destination=tmp_path / "object",
+        size=len(DATA),
+        client=client,
+    )
+
+    assert (tmp_path / "object").read_bytes() == DATA
+
+
+def test_download_gives_up(tmp_path):
+    client, _ = make_storage(fail_first=100)
+
+    downloader = Downloader(connections=1, retries=1, backoff=0.0)
+
+    with pytest.raises(DownloadFailedError):
+        downloader.download(
+            url="http://storage/object",
+            destination=tmp_path / "object",
+            size=len(DATA),
+            client=client,
+        )
+
+
+@pytest.mark.parametrize("segment_size", [1024 * 1024, 4096])
+def test_download_survives_repeated_drops(tmp_path, segment_size):
+    # Every response drops after 1 KiB; each resume makes progress, so the
+    # drops must not use up the retries.
+    def handler(request: httpx.Request) -> httpx.Response:
+        start, end = re.match(
+            r"bytes=(\d+)-(\d*)", request.headers.get("Range", "bytes=0-")
+        ).groups()
+        start, end = int(start), int(end) if end else len(DATA) - 1
+
+        def stream():
+            yield DATA[start : min(start + 1024, end + 1)]
+
+            if start + 1024 <= end:
+                raise httpx.ReadError("Connection dropped")
+
+        return httpx.Response(206, content=stream())
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    downloader = Downloader(
+        connections=1, segment_size=segment_size, retries=1, backoff=0.0
+    )
+    downloader.download(
+        url="http://storage/object",
+        destination=tmp_path / "object",
+        size=len(DATA),
+        client=client,
+    )
+
+    assert (tmp_path / "object").read_bytes() == DATA
+
+
+def test_download_verifies_checksum(tmp_path):
+    client, _ = make_storage()
+
+    Downloader(connections=1).download(
+        url="http://storage/object",
+        destination=tmp_path / "object",
+        size=len(DATA),
+        checksum=f"xxh64:{xxhash.xxh64(DATA).hexdigest()}",
+        client=client,
+    )
+
+    assert (tmp_path / "object").read_bytes() == DATA
+    assert not partial_path(tmp_path / "object").exists()
+
+
+@pytest.mark.parametrize("connections", [1, 4])
+def test_download_checksum_mismatch(tmp_path, connections):
+    client, _ = make_storage()
+
+    with pytest.raises(ChecksumMismatchError):
+        Downloader(connections=connections, segment_size=1024).download(
+            url="http://storage/object",
+            destination=tmp_path / "object",
+            size=len(DATA),
+            checksum="xxh64:0000000000000000",
+            client=client,
+        )
+
+    # Neither the corrupt object nor its partial download are kept.
+    assert not (tmp_path / "object").exists()
+    assert not partial_path(tmp_path / "object").exists()
+
+
+def test_single_download_resumes(tmp_path):
+    client, requests = make_storage()
+
+    partial_path(tmp_path / "object").write_bytes(DATA[:5000])
+
+    Downloader(connections=1).download(
+        url="http://storage/object",
+        destination=tmp_path / "object",
+        size=len(DATA),
+        checksum=f"xxh64:{xxhash.xxh64(DATA).hexdigest()}",
+        client=client,
+    )
+
+    assert requests == ["bytes=5000-"]
+    assert (tmp_path / "object").read_bytes() == DATA
+
+
+def test_segmented_download_resumes(tmp_path):
+    client, requests = make_storage()
+
+    # A previous attempt completed the first two segments only.
+    partial = bytearray(len(DATA))
+    partial[:2048] = DATA[:2048]
+    partial_path(tmp_path / "object").write_bytes(bytes(partial))
+    segments_path(tmp_path / "object").write_text("0-1023\n1024-2047\n")
+
+    Downloader(connections=2, segment_size=1024).download(
+        url="http://storage/object",
+        destination=tmp_path / "object",
+        size=len(DATA),
+        checksum=f"xxh64:{xxhash.xxh64(DATA).hexdigest()}",
+        client=client,
+    )
+
+    assert len(requests) == 9
+    assert "bytes=0-1023" not in requests
+    assert (tmp_path / "object").read_bytes() == DATA
+    assert not segments_path(tmp_path / "object").exists()
+
+
+def test_segmented_download_resumes_with_new_segment_size(tmp_path):
+    client, requests = make_storage()
+
+    # A previous attempt, with smaller segments, completed only bytes 0-1023
+    # and 2048-3071; the latter starts a segment at the new size too.
+    partial = bytearray(len(DATA))
+    partial[:1024] = DATA[:1024]
+    partial[2048:3072] = DATA[2048:3072]
+    partial_path(tmp_path / "object").write_bytes(bytes(partial))
+    segments_path(tmp_path / "object").write_text("0-1023\n2048-3071\n")
+
+    Downloader(connections=2, segment_size=2048).download(
+        url="http://storage/object",
+        destination=tmp_path / "object",
+        size=len(DATA),
+        checksum=f"xxh64:{xxhash.xxh64(DATA).hexdigest()}",
+        client=client,
+    )
+
+    assert "bytes=2048-4095" in requests
+    assert (tmp_path / "object").read_bytes() == DATA
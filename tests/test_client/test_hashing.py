@@ -0,0 +1,85 @@
+"""
+Tests the streaming checksums and the persistent hash cache.
+"""
+
+import os
+
+import xxhash
+
+from hippoclient import hashing
+from hippoclient.hashing import HashCache, Hasher
+
+
+def test_streaming_checksum(tmp_path):
+    data = os.urandom(1024 * 1024 + 17)
+    (tmp_path / "data.bin").write_bytes(data)
+
+    checksum = hashing.xxh64_file(tmp_path / "data.bin", chunk_size=4096)
+
+    assert checksum == f"xxh64:{xxhash.xxh64(data).hexdigest()}"
+
+
+def test_parallel_checksums(tmp_path):
+    expected = {}
+
+    for i in range(3):
+        data = os.urandom(4096)
+        (tmp_path / f"{i}.bin").write_bytes(data)
+        expected[tmp_path / f"{i}.bin"] = f"xxh64:{xxhash.xxh64(data).hexdigest()}"
+
+    assert Hasher(workers=2).checksums(list(expected.keys())) == expected
+
+
+def test_hash_cache(tmp_path, monkeypatch):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"hello")
+
+    hasher = Hasher(workers=1, cache=HashCache(path=tmp_path / "hashes.db"))
+
+    original = hasher.checksums([path])[path]
+
+    # Unchanged files must not be read again.
+    def fail(*args, **kwargs):
+        raise AssertionError("File was re-hashed")
+
+    monkeypatch.setattr(hashing, "xxh64_file", fail)
+
+    assert hasher.checksums([path])[path] == original
+
+    monkeypatch.undo()
+
+    # Changing the file invalidates the stored checksum.
+    path.write_bytes(b"hello, world")
+    os.utime(path, ns=(0, 0))
+
+    updated = hasher.checksums([path])[path]
+
+    assert updated != original
+    assert updated == f"xxh64:{xxhash.xxh64(b'hello, world').hexdigest()}"
+
+
+def test_hash_cache_ignores_files_changed_while_hashing(tmp_path, monkeypatch):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"hello")
+
+    hasher = Hasher(workers=1, cache=HashCache(path=tmp_path / "hashes.db"))
+    hash_file = hashing.xxh64_file
+
+    def hash_then_change(path, *args, **kwargs):
+        checksum = hash_file(path, *args, **kwargs)
+        path.write_bytes(b"hello, world")
+        return checksum
+
+    monkeypatch.setattr(hashing, "xxh64_file", hash_then_change)
+
+    assert (
+        hasher.checksums([path])[path] == f"xxh64:{xxhash.xxh64(b'hello').hexdigest()}"
+    )
+
+    monkeypatch.undo()
+
+    # The stale checksum must not be re-used for the changed file.
+    assert (
+        hasher.checksums([path])[path]
+        == f"xxh64:{xxhash.xxh64(b'hello, world').hexdigest()}"
+    )
@@ -0,0 +1,77 @@
+"""
+Tests concurrent caching of products and collections against a mock API.
+"""
+
+import pytest
+from tqdm import tqdm
+
+from hippoclient import collections, product
+from hippoclient.caching import Cache, MultiCache
+from hippoclient.downloading import Downloader
+
+# See the mock API in conftest.py.
+COLLECTION_ID = "6851be3dc869d741c82d6964"
+PRODUCT_IDS = ["6851be3dc869d741c82d6965", "6851be3dc869d741c82d6966"]
+
+
+@pytest.mark.parametrize("recursive", [False, True])
+def test_collection_cache(tmp_path, hippo_api, fake_downloads, recursive):
+    cache = MultiCache(caches=[Cache(path=tmp_path, poll_interval=0.01)])
+
+    paths = collections.cache(
+        client=hippo_api, cache=cache, id=COLLECTION_ID, recursive=recursive, workers=3
+    )
+
+    expected = ["beam", "calibration", "map"] + (["flat"] if recursive else [])
+
+    assert len(paths) == (6 if recursive else 4)
+    assert all(path.exists() for path in paths)
+    # The shared calibration file is only fetched once.
+    assert sorted(fake_downloads) == sorted(f"http://storage/{x}" for x in expected)
+
+
+def test_cache_many_skips_cached_sources(tmp_path, hippo_api, fake_downloads):
+    cache = MultiCache(caches=[Cache(path=tmp_path, poll_interval=0.01)])
+
+    first = product.cache(client=hippo_api, cache=cache, id=PRODUCT_IDS[0])
+
+    assert [x.name for x in first] == ["map.fits", "calibration.fits"]
+
+    fake_downloads.clear()
+
+    paths = product.cache_many(client=hippo_api, cache=cache, ids=PRODUCT_IDS)
+
+    assert fake_downloads == ["http://storage/beam"]
+    assert paths[PRODUCT_IDS[0]] == first
+    assert [x.name for x in paths[PRODUCT_IDS[1]]] == ["beam.fits", "calibration.fits"]
+    assert cache.caches[0].stats.hits == 2
+
+
+def test_cache_many_progress_skips_failed_downloads(
+    tmp_path, hippo_api, fake_downloads, monkeypatch
+):
+    cache = MultiCache(caches=[Cache(path=tmp_path, poll_interval=0.01)])
+    bars = []
+
+    class RecordingBar(tqdm):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            bars.append(self)
+
+    download = Downloader.download
+
+    def failing_download(self, url, destination, size, checksum=None, client=None):
+        if url == "http://storage/beam":
+            raise OSError("Download failed")
+
+        return download(self, url, destination, size, checksum, client)
+
+    monkeypatch.setattr(product, "tqdm", RecordingBar)
+    monkeypatch.setattr(Downloader, "download", failing_download)
+
+    with pytest.raises(OSError):
+        product.cache_many(client=hippo_api, cache=cache, ids=PRODUCT_IDS)
+
+    (bar,) = bars
+
+    assert 0 < bar.n < bar.total
@@ -0,0 +1,68 @@
+"""
+Tests paging through search results, and the products of collections, against
+a mock hippo API.
+"""
+
+import httpx
+import pytest
+
+from hippoclient import collections, product
+from hipposerve.wire import PrefixPredicate
+
+# See the mock API in conftest.py.
+COLLECTION_ID = "6851be3dc869d741c82d6964"
+CHILD_COLLECTION_ID = "6851be3dc869d741c82d6967"
+PRODUCT_IDS = ["6851be3dc869d741c82d6965", "6851be3dc869d741c82d6966"]
+ALL_PRODUCT_IDS = PRODUCT_IDS + ["6851be3dc869d741c82d6968"]
+
+
+def test_iterate_search_pages(hippo_api):
+    results = collections.iterate_search(
+        client=hippo_api, name="collection", page_size=1
+    )
+
+    assert [str(x.id) for x in results] == [COLLECTION_ID, CHILD_COLLECTION_ID]
+
+
+def test_search_limit(hippo_api):
+    assert len(collections.search(client=hippo_api, name="collection")) == 2
+
+    results = collections.search(client=hippo_api, name="collection", limit=1)
+
+    assert [str(x.id) for x in results] == [COLLECTION_ID]
+
+
+def test_read_collection_follows_pages(hippo_api):
+    # The mock API returns one product per page by default.
+    collection = collections.read(client=hippo_api, id=COLLECTION_ID)
+
+    assert [str(x.id) for x in collection.products] == PRODUCT_IDS
+    assert collection.next_cursor is None
+
+
+def test_iterate_products(hippo_api):
+    products = collections.iterate_products(
+        client=hippo_api, id=COLLECTION_ID, page_size=1
+    )
+
+    assert [str(x.id) for x in products] == PRODUCT_IDS
+
+
+def test_query_pages(hippo_api):
+    results = product.iterate_query(client=hippo_api, metadata_type="simple")
+
+    assert [str(x.id) for x in results] == ALL_PRODUCT_IDS
+
+    results = product.query(
+        client=hippo_api,
+        metadata_type="simple",
+        predicates={"name": PrefixPredicate(prefix="product")},
+        limit=2,
+    )
+
+    assert [str(x.id) for x in results] == PRODUCT_IDS
+
+
+def test_query_invalid(hippo_api):
+    with pytest.raises(httpx.HTTPStatusError):
+        product.query(client=hippo_api, metadata_type="not-a-type")
@@ -0,0 +1,62 @@
+"""
+Guards the cold start time of the ``henry`` CLI. The client must not import
+the server's dependencies, or the editor's, just to start up.
+"""
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+# Heavy packages that only the server (or a single command) needs.
+FORBIDDEN_MODULES = [
+    "astropy",
+    "beanie",
+    "fastapi",
+    "loguru",
+    "minio",
+    "motor",
+    "soauth",
+    "textual",
+]
+
+# Generous, so that slow CI machines pass; importing takes ~0.3s locally.
+STARTUP_BUDGET = 1.5
+
+IMPORT_SCRIPT = """
+import json, sys, time
+
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+
+print(json.dumps({{"elapsed": elapsed, "modules": list(sys.modules)}}))
+"""
+
+
+def cold_import(module: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT.format(module=module)],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+
+    return json.loads(result.stdout)
+
+
+@pytest.mark.parametrize("module", ["hippoclient.cli", "henry"])
+def test_no_heavy_imports(module):
+    modules = cold_import(module)["modules"]
+
+    imported = [x for x in modules if x.split(".")[0] in FORBIDDEN_MODULES]
+
+    assert not imported
+
+
+def test_cli_startup_time():
+    # Best of three, to smooth over a cold disk cache.
+    elapsed = min(cold_import("hippoclient.cli")["elapsed"] for _ in range(3))
+
+    assert elapsed < STARTUP_BUDGET
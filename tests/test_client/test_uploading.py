@@ -0,0 +1,327 @@
+"""
+Tests the concurrent multipart upload engine against a mock storage server.
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+import xxhash
+
+from hippoclient import product
+from hippoclient.uploading import Uploader, UploadFailedError
+from hipposerve.wire import MultipartUpload, UploadedPart
+
+PART_SIZE = 1024
+PRODUCT_ID = "6553b1c0f0a1b2c3d4e5f601"
+
+
+def make_storage(fail_first: int = 0, status_code: int = 503):
+    """
+    A fake S3 server: stores each part by URL and returns an ETag.
+    The first ``fail_first`` requests fail with ``status_code``.
+    """
+
+    received = {}
+    lock = threading.Lock()
+    failures = {"remaining": fail_first}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        with lock:
+            if failures["remaining"] > 0:
+                failures["remaining"] -= 1
+                return httpx.Response(status_code)
+
+            received[str(request.url)] = request.content
+
+        return httpx.Response(200, headers={"ETag": f"etag-{request.url.path}"})
+
+    return httpx.Client(transport=httpx.MockTransport(handler)), received
+
+
+def write_file(path, size):
+    data = bytes(i % 251 for i in range(size))
+    path.write_bytes(data)
+    return data
+
+
+def test_concurrent_upload_ordering(tmp_path):
+    client, received = make_storage()
+
+    first = write_file(tmp_path / "first.bin", PART_SIZE * 5 + 17)
+    second = write_file(tmp_path / "second.bin", PART_SIZE * 2)
+
+    upload_urls = {
+        "first.bin": [f"http://storage/first/{i}" for i in range(6)],
+        "second.bin": [f"http://storage/second/{i}" for i in range(2)],
+    }
+
+    uploader = Uploader(workers=3, workers_per_file=2, part_size=PART_SIZE)
+
+    headers, sizes = uploader.upload(
+        client=client,
+        sources=[tmp_path / "first.bin", tmp_path / "second.bin"],
+        upload_urls=upload_urls,
+    )
+
+    assert sizes["first.bin"] == [PART_SIZE] * 5 + [17]
+    assert sizes["second.bin"] == [PART_SIZE] * 2
+
+    # ETags must come back in part order, regardless of completion order.
+    assert [x["etag"] for x in headers["first.bin"]] == [
+        f"etag-/first/{i}" for i in range(6)
+    ]
+
+    reassembled = b"".join(received[url] for url in upload_urls["first.bin"])
+    assert reassembled == first
+
+    reassembled = b"".join(received[url] for url in upload_urls["second.bin"])
+    assert reassembled == second
+
+
+def test_upload_fetches_part_urls(tmp_path):
+    client, received = make_storage()
+
+    data = write_file(tmp_path / "large.bin", PART_SIZE * 2 * 7 + 3)
+    urls = [f"http://storage/large/{i}" for i in range(8)]
+    fetched = []
+
+    def fetch_urls(name: str, start: int, count: int) -> list[str]:
+        fetched.append((name, start, count))
+        return urls[start : start + count]
+
+    # hippo chose larger parts than requested, and only sent the first URLs.
+    uploader = Uploader(
+        workers=2, workers_per_file=2, part_size=PART_SIZE, url_page_size=3
+    )
+
+    headers, sizes = uploader.upload(
+        client=client,
+        sources=[tmp_path / "large.bin"],
+        upload_urls={"large.bin": urls[:2]},
+        uploads={
+            "large.bin": MultipartUpload(part_size=PART_SIZE * 2, number_of_parts=8)
+        },
+        fetch_urls=fetch_urls,
+    )
+
+    assert sizes["large.bin"] == [PART_SIZE * 2] * 7 + [3]
+    assert [x["etag"] for x in headers["large.bin"]] == [
+        f"etag-/large/{i}" for i in range(8)
+    ]
+    assert fetched == [("large.bin", 2, 3), ("large.bin", 5, 3)]
+    assert b"".join(received[url] for url in urls) == data
+
+
+def test_upload_skips_uploaded_parts(tmp_path):
+    client, received = make_storage()
+
+    write_file(tmp_path / "data.bin", PART_SIZE * 3 + 5)
+
+    uploader = Uploader(workers=2, workers_per_file=2, part_size=PART_SIZE)
+
+    headers, sizes = uploader.upload(
+        client=client,
+        sources=[tmp_path / "data.bin"],
+        upload_urls={"data.bin": {1: "http://storage/data/1"}},
+        uploads={"data.bin": MultipartUpload(part_size=PART_SIZE, number_of_parts=4)},
+        fetch_urls=lambda name, start, count: [
+            f"http://storage/data/{i}" for i in range(start, min(start + count, 4))
+        ],
+        uploaded={
+            "data.bin": [
+                UploadedPart(part=0, etag="stored-0", size=PART_SIZE),
+                UploadedPart(part=2, etag="stored-2", size=PART_SIZE),
+            ]
+        },
+    )
+
+    # Only the missing parts are uploaded again.
+    assert sorted(received) == ["http://storage/data/1", "http://storage/data/3"]
+    assert sizes["data.bin"] == [PART_SIZE] * 3 + [5]
+    assert [
+        {k.lower(): v for k, v in x.items()}["etag"] for x in headers["data.bin"]
+    ] == [
+        "stored-0",
+        "etag-/data/1",
+        "stored-2",
+        "etag-/data/3",
+    ]
+
+
+def test_resume_product(tmp_path):
+    data = write_file(tmp_path / "data.bin", PART_SIZE * 2 + 5)
+    received = {}
+    completed = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+
+        if path == f"/product/{PRODUCT_ID}/resume":
+            return httpx.Response(
+                200,
+                json={
+                    "id": PRODUCT_ID,
+                    "uploads": {
+                        "data.bin": {
+                            "slug": "data",
+                            "size": len(data),
+                            "checksum": f"xxh64:{xxhash.xxh64(data).hexdigest()}",
+                            "part_size": PART_SIZE,
+                            "number_of_parts": 3,
+                            "parts": [
+                                {"part": 0, "etag": "stored-0", "size": PART_SIZE}
+                            ],
+                            "upload_urls": {"1": "http://storage/data/1"},
+                        }
+                    },
+                },
+            )
+
+        if path == f"/product/{PRODUCT_ID}/parts":
+            start = int(request.url.params["from"])
+
+            return httpx.Response(
+                200,
+                json={
+                    "slug": "data",
+                    "part_size": PART_SIZE,
+                    "number_of_parts": 3,
+                    "start": start,
+                    "urls": [f"http://storage/data/{i}" for i in range(start, 3)],
+                },
+            )
+
+        if path == f"/product/{PRODUCT_ID}/complete":
+            completed.update(json.loads(request.content))
+            return httpx.Response(200, json=True)
+
+        if path.startswith("/data/"):
+            received[path] = request.content
+            return httpx.Response(200, headers={"ETag": f"etag-{path}"})
+
+        return httpx.Response(404)
+
+    client = httpx.Client(
+        base_url="http://hippo", transport=httpx.MockTransport(handler)
+    )
+
+    assert (
+        product.resume(
+            client=client,
+            id=PRODUCT_ID,
+            sources={"data": tmp_path / "data.bin"},
+            uploader=Uploader(part_size=PART_SIZE),
+        )
+        == PRODUCT_ID
+    )
+
+    assert received == {
+        "/data/1": data[PART_SIZE : 2 * PART_SIZE],
+        "/data/2": data[2 * PART_SIZE :],
+    }
+    assert completed["sizes"] == {"data.bin": [PART_SIZE, PART_SIZE, 5]}
+    assert [
+        {k.lower(): v for k, v in x.items()}["etag"]
+        for x in completed["headers"]["data.bin"]
+    ] == ["stored-0", "etag-/data/1", "etag-/data/2"]
+
+    # The local file must be the one that was being uploaded.
+    with pytest.raises(ValueError):
+        product.resume(client=client, id=PRODUCT_ID, sources={})
+
+    # A different file of the same name and size.
+    (tmp_path / "other").mkdir()
+    (tmp_path / "other" / "data.bin").write_bytes(data[::-1])
+
+    with pytest.raises(ValueError):
+        product.resume(
+            client=client,
+            id=PRODUCT_ID,
+            sources={"data": tmp_path / "other" / "data.bin"},
+        )
+
+
+def test_concurrent_uploads_share_workers(tmp_path):
+    in_flight = {"now": 0, "most": 0}
+    lock = threading.Lock()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        with lock:
+            in_flight["now"] += 1
+            in_flight["most"] = max(in_flight["most"], in_flight["now"])
+
+        time.sleep(0.01)
+
+        with lock:
+            in_flight["now"] -= 1
+
+        return httpx.Response(200, headers={"ETag": f"etag-{request.url.path}"})
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    uploader = Uploader(workers=2, workers_per_file=2, part_size=PART_SIZE)
+
+    def upload(name: str):
+        write_file(tmp_path / name, PART_SIZE * 6)
+
+        return uploader.upload(
+            client=client,
+            sources=[tmp_path / name],
+            upload_urls={name: [f"http://storage/{name}/{i}" for i in range(6)]},
+        )
+
+    # e.g. several products pushed at once by the async client.
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        list(executor.map(upload, ["a.bin", "b.bin", "c.bin"]))
+
+    assert in_flight["most"] <= 2
+
+
+def test_upload_retries(tmp_path):
+    client, received = make_storage(fail_first=2)
+
+    write_file(tmp_path / "data.bin", PART_SIZE)
+
+    uploader = Uploader(retries=2, backoff=0.0, part_size=PART_SIZE)
+
+    _, sizes = uploader.upload(
+        client=client,
+        sources=[tmp_path / "data.bin"],
+        upload_urls={"data.bin": ["http://storage/data/0"]},
+    )
+
+    assert sizes["data.bin"] == [PART_SIZE]
+    assert "http://storage/data/0" in received
+
+
+def test_upload_gives_up(tmp_path):
+    client, _ = make_storage(fail_first=10)
+
+    write_file(tmp_path / "data.bin", PART_SIZE)
+
+    uploader = Uploader(retries=1, backoff=0.0, part_size=PART_SIZE)
+
+    with pytest.raises(UploadFailedError):
+        uploader.upload(
+            client=client,
+            sources=[tmp_path / "data.bin"],
+            upload_urls={"data.bin": ["http://storage/data/0"]},
+        )
+
+
+def test_upload_does_not_retry_client_errors(tmp_path):
+    client, _ = make_storage(fail_first=1, status_code=403)
+
+    write_file(tmp_path / "data.bin", PART_SIZE)
+
+    uploader = Uploader(retries=3, backoff=0.0, part_size=PART_SIZE)
+
+    with pytest.raises(UploadFailedError):
+        uploader.upload(
+            client=client,
+            sources=[tmp_path / "data.bin"],
+            upload_urls={"data.bin": ["http://storage/data/0"]},
+        )
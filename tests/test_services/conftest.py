@@ -15,13 +15,16 @@ from soauth.toolkit.fastapi import SOUser
 
 import hippometa
 from hipposerve.database import BEANIE_MODELS
+from hipposerve.database.monitoring import RoundTripCounter
 
 ### -- Dependency Injection Fixtures -- ###
 
 
 @pytest_asyncio.fixture(scope="session", autouse=True)
 async def database(database_container):
-    db = AsyncIOMotorClient(database_container["url"])
+    db = AsyncIOMotorClient(
+        database_container["url"], event_listeners=[RoundTripCounter()]
+    )
     await init_beanie(
         database=db.db_name,
         document_models=BEANIE_MODELS,
@@ -67,7 +70,7 @@ async def created_full_product(database, storage, created_user):
 
     PRODUCT_NAME = "My Favourite Product"
     PRODUCT_DESCRIPTION = "The best product ever."
-    FILE_CONTENTS = b"0x0" * 1024
+    FILE_CONTENTS = b"\x00" * 1024
     SOURCES = {
         "data": product.PreUploadFile(
             name="test_1.txt",
@@ -5,7 +5,8 @@ Tests for the collection service.
 import pytest
 from beanie import PydanticObjectId
 
-from hipposerve.service import acl, collection
+from hipposerve.database.monitoring import count_round_trips
+from hipposerve.service import acl, collection, product
 
 
 @pytest.mark.asyncio(loop_scope="session")
@@ -77,6 +78,60 @@ async def test_search(created_collection, created_user):
 
     assert read.name == created_collection.name
 
+    results, cursor = await collection.search_metadata_by_name(
+        name=created_collection.name, groups=created_user.groups, limit=1
+    )
+
+    assert results[0].id == created_collection.id
+    assert results[0].products is None
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_read_products(created_collection, created_full_product, created_user):
+    await product.add_collection(
+        product=created_full_product,
+        access_groups=created_user.groups,
+        collection=created_collection,
+    )
+
+    header = await collection.read_metadata(
+        id=created_collection.id, groups=created_user.groups, count_products=True
+    )
+
+    assert header.name == created_collection.name
+    assert header.products is None
+
+    # Passing the header on saves reading the collection again.
+    with count_round_trips() as round_trips:
+        products, cursor = await collection.read_products(
+            id=created_collection.id,
+            groups=created_user.groups,
+            limit=1,
+            collection=header,
+        )
+
+    assert round_trips.count == 1
+    assert [x.id for x in products] == [created_full_product.id]
+    assert products[0].version == created_full_product.version
+    assert cursor is None
+
+    await product.remove_collection(
+        product=created_full_product,
+        access_groups=created_user.groups,
+        collection=created_collection,
+    )
+
+    products, _ = await collection.read_products(
+        id=created_collection.id, groups=created_user.groups
+    )
+
+    assert products == []
+
+    with pytest.raises(collection.CollectionNotFound):
+        await collection.read_metadata(
+            id=PydanticObjectId("7" * 24), groups=created_user.groups
+        )
+
 
 @pytest.mark.asyncio(loop_scope="session")
 async def test_update_missing(created_user):
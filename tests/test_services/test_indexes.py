@@ -0,0 +1,105 @@
+"""
+Tests for the database indexes and the index audit.
+"""
+
+import pytest
+
+from hipposerve.database import metadata_indexes
+from hipposerve.database.indexes import (
+    AUDITED_QUERIES,
+    audit,
+    duplicate_current_names,
+)
+from hipposerve.service import product, versioning
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_service_queries_are_covered(database):
+    results = await audit(database.db_name)
+
+    assert [x.name for x in results if not x.covered] == []
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_metadata_queries_use_metadata_indexes(database):
+    # Each declared field is queried through its own partial index.
+    queries = [
+        x for x in AUDITED_QUERIES if x.name.startswith("product.query_metadata (")
+    ]
+    results = await audit(database.db_name, queries)
+
+    assert len(results) == len(metadata_indexes())
+    assert {x.name: x.indexes for x in results}[
+        "product.query_metadata (mapset.frequency)"
+    ] == ["metadata_mapset_frequency"]
+    assert all(x.indexes[0].startswith("metadata_") for x in results)
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_current_names_are_unique(database, created_user, storage):
+    created, _ = await product.create(
+        name="Unique Product",
+        description="Only one of me",
+        metadata=None,
+        sources={},
+        user_name=created_user.display_name,
+        storage=storage,
+    )
+
+    assert await product.exists(name="Unique Product")
+
+    with pytest.raises(product.ProductExists):
+        await product.create(
+            name="Unique Product",
+            description="An imposter",
+            metadata=None,
+            sources={},
+            user_name=created_user.display_name,
+            storage=storage,
+        )
+
+    # Older versions share the name, but are not current.
+    new = await product.update_metadata(
+        created,
+        name=None,
+        description=None,
+        metadata=None,
+        level=versioning.VersionRevision.MAJOR,
+    )
+
+    current = await product.read_by_name(
+        name="Unique Product", version=None, groups=created_user.groups
+    )
+
+    assert current.id == new.id
+
+    await product.delete_one(current, created_user.groups, storage=storage)
+
+    current = await product.read_by_name(
+        name="Unique Product", version=None, groups=created_user.groups
+    )
+
+    assert current.id == created.id
+    assert current.current
+
+    await product.delete_tree(current, created_user.groups, storage=storage)
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_duplicate_current_names(database):
+    # The Product collection has the unique index, so use a stand-in for a
+    # database from before it.
+    collection = database.db_name["DuplicateProducts"]
+
+    await collection.insert_many(
+        [
+            {"name": "Twin", "current": True},
+            {"name": "Twin", "current": True},
+            {"name": "Single", "current": True},
+            {"name": "Single", "current": False},
+        ]
+    )
+
+    assert await duplicate_current_names(collection) == ["Twin"]
+
+    await collection.drop()
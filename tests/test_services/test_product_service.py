@@ -2,6 +2,7 @@
 Tests for just the product service.
 """
 
+import asyncio
 import datetime
 import io
 
@@ -11,7 +12,11 @@ from beanie import PydanticObjectId
 from beanie.odm.fields import Link
 
 import hippometa
+from hipposerve.database import Product, ProductLineage
+from hipposerve.database.monitoring import count_round_trips
 from hipposerve.service import acl, product, versioning
+from hipposerve.service.query import InvalidQuery
+from hipposerve.wire import ProductQuery
 
 
 @pytest.mark.asyncio(loop_scope="session")
@@ -64,7 +69,7 @@ async def test_create_file_with_multiple_sources(database, created_user, storage
 
     assert len(created_product.sources) == 2
 
-    FILE_CONTENTS = b"0x0" * 128
+    FILE_CONTENTS = b"\x00" * 128
 
     responses = {}
     sizes = {}
@@ -80,6 +85,10 @@ async def test_create_file_with_multiple_sources(database, created_user, storage
 
     # Not ready yet - must be completed!
     assert not await product.confirm(created_product, storage=storage)
+    assert await product.confirm_sources(created_product, storage=storage) == {
+        "coadd": False,
+        "split": False,
+    }
 
     await product.complete(
         created_product, storage=storage, headers=responses, sizes=sizes
@@ -87,11 +96,67 @@ async def test_create_file_with_multiple_sources(database, created_user, storage
 
     assert await product.confirm(created_product, storage=storage)
 
+    # The sources are closed in the database, so are not completed again.
+    completed = await product.read_by_id(created_product.id, created_user.groups)
+
+    assert all(x.multipart_closed for x in completed.sources.values())
+    assert await product.complete(completed, storage=storage, headers={}, sizes={})
+
+    # Sources stored with a different size than was declared are not confirmed.
+    created_product.sources["split"].size += 1
+
+    assert await product.confirm_sources(created_product, storage=storage) == {
+        "coadd": True,
+        "split": False,
+    }
+
+    created_product.sources["split"].size -= 1
+
     await product.delete_one(
         created_product, created_user.groups, storage=storage, data=True
     )
 
 
+@pytest.mark.asyncio(loop_scope="session")
+async def test_partially_failed_complete(database, created_user, storage):
+    sources = {
+        "coadd": product.PreUploadFile(name="file3.txt", size=128, checksum="not_real"),
+        "split": product.PreUploadFile(name="file4.txt", size=128, checksum="not_real"),
+    }
+
+    created_product, uploads = await product.create(
+        name="Partially Completed Product",
+        description="A product with a source that fails to complete",
+        metadata=None,
+        sources=sources,
+        user_name=created_user.display_name,
+        storage=storage,
+    )
+
+    responses = {}
+    sizes = {}
+
+    for file_name, put in uploads.items():
+        responses[file_name] = [requests.put(put[0], b"\x00" * 128).headers]
+        sizes[file_name] = [128]
+
+    # The storage server will refuse to complete with the wrong ETag.
+    responses["file4.txt"] = [{"ETag": "not-a-real-etag"}]
+
+    with pytest.raises(Exception):
+        await product.complete(
+            created_product, storage=storage, headers=responses, sizes=sizes
+        )
+
+    # The source that did complete is recorded as closed.
+    completed = await product.read_by_id(created_product.id, created_user.groups)
+
+    assert completed.sources["coadd"].multipart_closed
+    assert not completed.sources["split"].multipart_closed
+
+    await product.delete_one(completed, created_user.groups, storage=storage, data=True)
+
+
 @pytest.mark.asyncio(loop_scope="session")
 async def test_presign_read(created_full_product, storage):
     sources = await product.read_files(created_full_product, storage)
@@ -158,6 +223,10 @@ async def test_update_access_control(created_full_product, created_user):
     assert updated_product.version == existing_version
     assert set(updated_product.readers) == (existing_readers | {"fake_reader"})
     assert set(updated_product.writers) == (existing_writers | {"fake_writer"})
+    assert {"fake_reader", "fake_writer", "admin"} <= set(updated_product.acl)
+
+    found = await product.read_most_recent(["fake_reader"], current_only=True)
+    assert updated_product.id in [x.id for x in found]
 
     updated_product = await acl.update_access_control(
         created_full_product,
@@ -168,6 +237,10 @@ async def test_update_access_control(created_full_product, created_user):
     assert updated_product.version == existing_version
     assert set(updated_product.readers) == existing_readers
     assert set(updated_product.writers) == existing_writers
+    assert "fake_reader" not in updated_product.acl
+
+    found = await product.read_most_recent(["fake_reader"])
+    assert updated_product.id not in [x.id for x in found]
 
     return
 
@@ -238,7 +311,7 @@ async def test_update_sources(created_full_product, database, storage, created_u
 
     assert created_full_product.current
 
-    FILE_CONTENTS = b"0x0" * 128
+    FILE_CONTENTS = b"\x00" * 128
 
     new = {
         "coadd": product.PreUploadFile(
@@ -502,6 +575,52 @@ async def test_add_relationships(database, created_user, created_full_product, s
     )
 
 
+@pytest.mark.asyncio(loop_scope="session")
+async def test_concurrent_relationships(database, created_user, storage):
+    created = []
+
+    for name in ["Child Product", "First Parent", "Second Parent"]:
+        item, _ = await product.create(
+            name=name,
+            description="Concurrent relationship edits",
+            metadata=None,
+            sources={},
+            user_name=created_user.display_name,
+            storage=storage,
+        )
+        created.append(item)
+
+    child, first, second = created
+
+    # Two independent (and soon stale) copies of the child, as two requests
+    # would have; neither edit should clobber the other.
+    await asyncio.gather(
+        product.add_relationship(
+            source=await product.read_by_id(child.id, created_user.groups),
+            destination=first,
+            access_groups=created_user.groups,
+            type="child",
+        ),
+        product.add_relationship(
+            source=await product.read_by_id(child.id, created_user.groups),
+            destination=second,
+            access_groups=created_user.groups,
+            type="child",
+        ),
+    )
+
+    child = await product.read_by_id(child.id, created_user.groups)
+
+    assert {x.id for x in child.child_of} == {first.id, second.id}
+
+    for item in created:
+        await product.delete_tree(
+            await product.read_by_id(item.id, created_user.groups),
+            access_groups=created_user.groups,
+            storage=storage,
+        )
+
+
 @pytest.mark.asyncio(loop_scope="session")
 async def test_product_middle_deletion(database, created_user, storage):
     initial, _ = await product.create(
@@ -532,7 +651,7 @@ async def test_product_middle_deletion(database, created_user, storage):
 
     # Upload that file.
 
-    FILE_CONTENTS = b"0x0" * 128
+    FILE_CONTENTS = b"\x00" * 128
 
     headers = {}
     sizes = {}
@@ -626,12 +745,118 @@ async def test_text_name_search(database, created_user, storage):
 
     assert {x.id for x in results} == {product_A.id, product_B.id}
 
+    # Page through them, one at a time.
+    paged = []
+    cursor = None
+
+    for _ in range(2):
+        page, cursor = await product.search_metadata_by_name(
+            "my favorite", created_user.groups, limit=1, cursor=cursor
+        )
+        paged += page
+
+    assert cursor is None
+    assert [x.id for x in paged] == [x.id for x in results]
+
+    page, cursor = await product.search_by_owner(
+        created_user.display_name, created_user.groups, limit=1
+    )
+    next_page, _ = await product.search_by_owner(
+        created_user.display_name, created_user.groups, limit=1, cursor=cursor
+    )
+
+    assert len(page) == len(next_page) == 1
+    assert next_page[0].id > page[0].id
+
     # Clean up.
 
     await product.delete_one(product_A, created_user.groups, storage=storage, data=True)
     await product.delete_one(product_B, created_user.groups, storage=storage, data=True)
 
 
+@pytest.mark.asyncio(loop_scope="session")
+async def test_query_metadata(database, created_user, storage):
+    products = []
+
+    for frequency, split in [("f090", 1), ("f150", 2), ("f220", None)]:
+        created, _ = await product.create(
+            name=f"Query Map {frequency}",
+            description="A map",
+            metadata=hippometa.MapSet(
+                pixelisation="healpix", frequency=frequency, split=split
+            ),
+            sources={},
+            user_name=created_user.display_name,
+            storage=storage,
+        )
+        products.append(created)
+
+    numeric, _ = await product.create(
+        name="Query Number",
+        description="A number",
+        metadata=hippometa.NumericMetadata(value=1.5),
+        sources={},
+        user_name=created_user.display_name,
+        storage=storage,
+    )
+
+    async def query(metadata_type, **predicates):
+        results, _ = await product.query_metadata(
+            ProductQuery(metadata_type=metadata_type, predicates=predicates),
+            created_user.groups,
+        )
+
+        return {x.name for x in results}
+
+    assert await query("mapset", frequency={"op": "prefix", "prefix": "f0"}) == {
+        "Query Map f090"
+    }
+    # Prefixes are case sensitive.
+    assert await query("mapset", frequency={"op": "prefix", "prefix": "F0"}) == set()
+    assert await query(
+        "mapset", frequency={"op": "in", "values": ["f150", "f220"]}
+    ) == {
+        "Query Map f150",
+        "Query Map f220",
+    }
+    assert await query("mapset", split={"op": "exists", "exists": False}) == {
+        "Query Map f220"
+    }
+    # Bounds are converted to the field's type, so compare as numbers.
+    assert await query(
+        "numeric", value={"op": "range", "minimum": "1", "maximum": 2}
+    ) == {"Query Number"}
+    assert await query("numeric", value={"op": "range", "minimum": 10}) == set()
+
+    # Page through them, one at a time.
+    paged = []
+    cursor = None
+
+    for _ in range(3):
+        page, cursor = await product.query_metadata(
+            ProductQuery(metadata_type="mapset"),
+            created_user.groups,
+            limit=1,
+            cursor=cursor,
+        )
+        paged += page
+
+    assert cursor is None
+    assert [x.id for x in paged] == [x.id for x in products]
+
+    with pytest.raises(InvalidQuery):
+        await query("mapset", not_a_field={"op": "eq", "value": 1})
+
+    with pytest.raises(InvalidQuery):
+        await query("numeric", value={"op": "prefix", "prefix": "1"})
+
+    with pytest.raises(InvalidQuery):
+        await query("numeric", value={"op": "eq", "value": "one"})
+
+    for created in products + [numeric]:
+        await product.delete_one(created, created_user.groups, storage=storage)
+
+
 @pytest.mark.asyncio(loop_scope="session")
 async def test_product_with_five_versions(database, created_user, storage):
     # Create a new product
@@ -671,3 +896,266 @@ async def test_product_with_five_versions(database, created_user, storage):
         storage=storage,
         data=True,
     )
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_read_tree(database, created_user, storage):
+    first, _ = await product.create(
+        name="Tree Product",
+        description="A product with a few versions",
+        metadata=None,
+        sources={},
+        user_name=created_user.display_name,
+        storage=storage,
+    )
+
+    latest = first
+
+    for i in range(3):
+        latest, _ = await product.update(
+            product=latest,
+            access_groups=created_user.groups,
+            description=f"Version {i + 1} of the product",
+            storage=storage,
+            level=versioning.VersionRevision.MINOR,
+        )
+
+    # Reading from the middle finds versions in both directions.
+    middle = await product.read_by_name(
+        name="Tree Product", version="1.1.0", groups=created_user.groups
+    )
+
+    tree = await product.read_tree(middle)
+
+    assert list(tree.keys()) == ["1.3.0", "1.2.0", "1.1.0", "1.0.0"]
+    assert [x.version for x in tree.values() if x.current] == ["1.3.0"]
+    assert tree["1.2.0"].replaces == "1.1.0"
+    assert tree["1.0.0"].replaces is None
+
+    assert list((await product.walk_history(middle)).keys()) == ["1.1.0", "1.0.0"]
+
+    current = await product.walk_to_current(first, created_user.groups)
+
+    assert current.id == latest.id
+
+    await product.delete_tree(
+        product=current,
+        access_groups=created_user.groups,
+        storage=storage,
+        data=True,
+    )
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_product_lineage(database, created_user, storage):
+    first, _ = await product.create(
+        name="Lineage Product",
+        description="A product with a lineage",
+        metadata=None,
+        sources={},
+        user_name=created_user.display_name,
+        storage=storage,
+    )
+
+    lineage = await ProductLineage.get(first.lineage)
+
+    assert lineage.current == first.id
+    assert lineage.versions == [first.id]
+
+    second = await product.update_metadata(
+        first,
+        name=None,
+        description=None,
+        metadata=None,
+        level=versioning.VersionRevision.MAJOR,
+    )
+
+    assert second.lineage == first.lineage
+
+    lineage = await ProductLineage.get(first.lineage)
+
+    assert lineage.current == second.id
+    assert lineage.versions == [first.id, second.id]
+
+    current = await product.walk_to_current(first, created_user.groups)
+
+    assert current.id == second.id
+
+    # Deleting the head makes the previous version current again.
+    await product.delete_one(current, created_user.groups, storage=storage)
+
+    lineage = await ProductLineage.get(first.lineage)
+
+    assert lineage.current == first.id
+    assert lineage.versions == [first.id]
+
+    current = await product.walk_to_current(first, created_user.groups)
+
+    await product.delete_tree(current, created_user.groups, storage=storage)
+
+    assert await ProductLineage.get(first.lineage) is None
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_failed_lineage_removes_product(
+    database, created_user, storage, monkeypatch
+):
+    async def insert(self, *args, **kwargs):
+        raise RuntimeError("Lost the connection")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(ProductLineage, "insert", insert)
+
+        with pytest.raises(RuntimeError):
+            await product.create(
+                name="Failed Lineage Product",
+                description="A product whose lineage is never written",
+                metadata=None,
+                sources={},
+                user_name=created_user.display_name,
+                storage=storage,
+            )
+
+    assert not await product.exists(name="Failed Lineage Product")
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_failed_update_keeps_current(
+    database, created_user, storage, monkeypatch
+):
+    first, _ = await product.create(
+        name="Failed Update Product",
+        description="A product whose update fails",
+        metadata=None,
+        sources={},
+        user_name=created_user.display_name,
+        storage=storage,
+    )
+
+    async def insert(self, *args, **kwargs):
+        raise RuntimeError("Lost the connection")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(Product, "insert", insert)
+
+        with pytest.raises(RuntimeError):
+            await product.update_metadata(
+                first,
+                name=None,
+                description="Never written",
+                metadata=None,
+                level=versioning.VersionRevision.MAJOR,
+            )
+
+    current = await product.read_by_name(
+        name="Failed Update Product", version=None, groups=created_user.groups
+    )
+
+    assert current.id == first.id
+    assert current.current
+
+    await product.delete_tree(current, created_user.groups, storage=storage)
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_update_access_control_all_versions(database, created_user, storage):
+    first, _ = await product.create(
+        name="Access Controlled Product",
+        description="A product with many versions",
+        metadata=None,
+        sources={},
+        user_name=created_user.display_name,
+        storage=storage,
+    )
+
+    current = first
+
+    for _ in range(3):
+        current = await product.update_metadata(
+            current,
+            name=None,
+            description=None,
+            metadata=None,
+            level=versioning.VersionRevision.MINOR,
+        )
+
+    lineage = current.lineage
+
+    # Through the lineage: read it, update the versions, re-read the head.
+    with count_round_trips() as round_trips:
+        current = await acl.update_access_control(current, add_readers=["bulk"])
+
+    assert round_trips.count == 3
+
+    versions = await Product.find(Product.lineage == lineage).to_list()
+
+    assert len(versions) == 4
+    assert all("bulk" in x.readers and "bulk" in x.acl for x in versions)
+
+    # Products from before lineages follow the replaces chain instead.
+    await Product.find(Product.lineage == lineage).update({"$set": {"lineage": None}})
+    current = await product.read_by_id(current.id, created_user.groups)
+
+    with count_round_trips() as round_trips:
+        current = await acl.update_access_control(current, remove_readers=["bulk"])
+
+    assert round_trips.count == 3
+
+    versions = await Product.find({"_id": {"$in": [x.id for x in versions]}}).to_list()
+
+    assert len(versions) == 4
+    assert not any("bulk" in x.readers or "bulk" in x.acl for x in versions)
+
+    # A lineage that has gone missing falls back to the replaces chain too.
+    await Product.find({"_id": {"$in": [x.id for x in versions]}}).update(
+        {"$set": {"lineage": PydanticObjectId()}}
+    )
+    current = await product.read_by_id(current.id, created_user.groups)
+    current = await acl.update_access_control(current, add_readers=["bulk"])
+
+    versions = await Product.find({"_id": {"$in": [x.id for x in versions]}}).to_list()
+
+    assert all("bulk" in x.readers for x in versions)
+
+    await product.delete_tree(current, created_user.groups, storage=storage)
+    await ProductLineage.find_one(ProductLineage.id == lineage).delete()
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_read_metadata_in_one_round_trip(created_full_product, created_user):
+    with count_round_trips() as round_trips:
+        metadata = await product.read_metadata_by_id(
+            created_full_product.id, created_user.groups
+        )
+
+    assert round_trips.count == 1
+
+    assert metadata.id == created_full_product.id
+    assert metadata.name == created_full_product.name
+    assert metadata.sources.keys() == created_full_product.sources.keys()
+
+    with count_round_trips() as round_trips:
+        results, _ = await product.search_metadata_by_name(
+            created_full_product.name, created_user.groups
+        )
+
+    assert round_trips.count == 1
+    assert created_full_product.id in [x.id for x in results]
+
+    with pytest.raises(product.ProductNotFound):
+        await product.read_metadata_by_id("abcdefghijk", created_user.groups)
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_backfill_access_control(created_full_product, created_user):
+    await Product.find(Product.id == created_full_product.id).update(
+        {"$unset": {"acl": ""}}
+    )
+
+    await acl.backfill_access_control(Product)
+
+    backfilled = await product.read_by_id(created_full_product.id, created_user.groups)
+
+    assert set(backfilled.acl) == (
+        set(backfilled.readers) | set(backfilled.writers) | {"admin"}
+    )
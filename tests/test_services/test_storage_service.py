@@ -6,6 +6,36 @@ import requests
 from hipposerve.service import storage as storage_service
 
 
+def test_part_size():
+    mebibyte = 1024 * 1024
+
+    # Small requests are raised to S3's minimum part size.
+    assert storage_service.part_size(10, 1024) == storage_service.MINIMUM_PART_SIZE
+    assert storage_service.part_size(100 * mebibyte, 50 * mebibyte) == 50 * mebibyte
+
+    # Very large sources use larger parts, to keep the number of parts down,
+    # but only for clients that read the part size back.
+    size = 400 * 1024 * mebibyte
+    part = storage_service.part_size(size, 50 * mebibyte, grow=True)
+
+    assert part % mebibyte == 0
+    assert size / part <= storage_service.TARGET_PARTS
+    assert storage_service.part_size(size, 50 * mebibyte) == 50 * mebibyte
+
+    # Other clients only get larger parts when S3 would need them to.
+    size = 1024 * 1024 * mebibyte
+    part = storage_service.part_size(size, 50 * mebibyte)
+
+    assert part % mebibyte == 0
+    assert storage_service.TARGET_PARTS < size / part <= storage_service.MAXIMUM_PARTS
+
+    with pytest.raises(storage_service.SourceTooLarge):
+        storage_service.part_size(
+            storage_service.MAXIMUM_PART_SIZE * storage_service.MAXIMUM_PARTS + 1,
+            50 * mebibyte,
+        )
+
+
 @pytest.mark.asyncio(loop_scope="session")
 async def test_create_storage_item(storage, created_user, database):
     MULTIPART_SIZE = 50 * 1024 * 1024
@@ -114,3 +144,53 @@ async def test_create_storage_item_large(storage, created_user, database):
         file=file,
         storage=storage,
     )
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_resume_storage_item(storage, created_user, database):
+    PART_SIZE = storage_service.MINIMUM_PART_SIZE
+    FILE_CONTENT = b"1" * PART_SIZE + b"2" * PART_SIZE + b"3" * 1024
+
+    file, put = await storage_service.create(
+        name="test_resume_file.txt",
+        description=None,
+        uploader=created_user.display_name,
+        slug="data",
+        size=len(FILE_CONTENT),
+        checksum="FakeChecksum",
+        storage=storage,
+        multipart_size=PART_SIZE,
+    )
+
+    def segment(part: int) -> bytes:
+        return FILE_CONTENT[part * PART_SIZE : (part + 1) * PART_SIZE]
+
+    # Upload the first and last parts, then "crash".
+    for part in [0, 2]:
+        requests.put(put[part], segment(part)).raise_for_status()
+
+    parts, upload_urls = await storage_service.resume(
+        file=file, storage=storage, count=10
+    )
+
+    assert [(x.part, x.size) for x in parts] == [(0, PART_SIZE), (2, 1024)]
+    assert list(upload_urls) == [1]
+
+    response = requests.put(upload_urls[1], segment(1))
+    response.raise_for_status()
+
+    headers = {x.part: {"etag": x.etag} for x in parts}
+    headers[1] = dict(response.headers)
+
+    await storage_service.complete(
+        file=file,
+        storage=storage,
+        response_headers=[headers[x] for x in range(3)],
+        sizes=[len(segment(x)) for x in range(3)],
+    )
+
+    get = await storage_service.read(file=file, storage=storage)
+
+    assert requests.get(get).content == FILE_CONTENT
+
+    await storage_service.delete(file=file, storage=storage)
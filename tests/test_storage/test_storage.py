@@ -2,8 +2,12 @@
 Individual (fully synchronous) storage tests.
 """
 
+from types import SimpleNamespace
+
 import pytest
 import requests
+from minio.api import Part
+from minio.datatypes import Object
 
 from hipposerve.storage import Storage
 
@@ -77,3 +81,89 @@ def test_storage_url_replacement(simple_uploaded_file, storage):
 
     assert "example.com" in get
     assert "https://" in get
+
+
+def test_get_reuses_signed_urls(monkeypatch):
+    storage = Storage(url="localhost:9000", access_key="key", secret_key="secret")
+    calls = {"bucket_exists": 0, "presigned_get_object": 0}
+
+    def bucket_exists(name):
+        calls["bucket_exists"] += 1
+        return True
+
+    def presigned_get_object(bucket_name, object_name, **kwargs):
+        calls["presigned_get_object"] += 1
+        return f"http://localhost:9000/{bucket_name}/{object_name}?n={calls['presigned_get_object']}"
+
+    monkeypatch.setattr(storage.client, "bucket_exists", bucket_exists)
+    monkeypatch.setattr(storage.client, "presigned_get_object", presigned_get_object)
+
+    file_info = {
+        "name": "test_file.txt",
+        "uploader": "test_uploader",
+        "uuid": "1234-1234-1234",
+        "bucket": "testbucket",
+    }
+
+    assert storage.cached_get(**file_info) is None
+
+    url = storage.get(**file_info)
+
+    assert storage.get(**file_info) == url
+    assert storage.cached_get(**file_info) == url
+    # Another object in the same bucket needs a new URL, but the bucket is known.
+    assert storage.get(**{**file_info, "name": "test_image.png"}) != url
+    assert calls == {"bucket_exists": 1, "presigned_get_object": 2}
+
+    # Once the URL has been around for long enough, a new one is signed.
+    storage.url_reuse_fraction = 0.0
+
+    assert storage.get(**file_info) != url
+    assert calls["presigned_get_object"] == 3
+
+
+def test_sizes_lists_prefix(monkeypatch):
+    storage = Storage(url="localhost:9000", access_key="key", secret_key="secret")
+    listed = []
+
+    def list_objects(bucket_name, prefix, recursive):
+        listed.append((bucket_name, prefix))
+        return [Object(bucket_name, f"{prefix}test_file.txt", size=1234)]
+
+    monkeypatch.setattr(storage.client, "bucket_exists", lambda name: True)
+    monkeypatch.setattr(storage.client, "list_objects", list_objects)
+
+    sizes = storage.sizes(
+        uploader="test_uploader", uuid="1234-1234-1234", bucket="testbucket"
+    )
+
+    assert sizes == {"test_uploader/1234-1234-1234/test_file.txt": 1234}
+    assert listed == [("testbucket", "test_uploader/1234-1234-1234/")]
+
+
+def test_parts_lists_every_page(monkeypatch):
+    storage = Storage(url="localhost:9000", access_key="key", secret_key="secret")
+    markers = []
+
+    def list_parts(bucket_name, object_name, upload_id, part_number_marker=None):
+        markers.append(part_number_marker)
+        first = part_number_marker is None
+
+        return SimpleNamespace(
+            parts=[Part(1 if first else 2, f"etag-{1 if first else 2}", size=5)],
+            is_truncated=first,
+            next_part_number_marker="1" if first else None,
+        )
+
+    monkeypatch.setattr(storage.client, "_list_parts", list_parts)
+
+    parts = storage.parts(
+        name="test_file.txt",
+        uploader="test_uploader",
+        uuid="1234-1234-1234",
+        bucket="testbucket",
+        upload_id="upload",
+    )
+
+    assert [(x.part_number, x.etag) for x in parts] == [(1, "etag-1"), (2, "etag-2")]
+    assert markers == [None, "1"]